@@ -62,11 +62,11 @@ class _Part4State extends State<Part4> {
 
       final merge_request = http.MultipartRequest(
         'POST',
-        Uri.parse('${Config.serverUrl}/merge-documents-part-iv'),
+        Uri.parse('${Config.serverUrl}/merge-documents'),
       );
 
-      merge_request.files.add(http.MultipartFile.fromBytes('part_iv_a', iv_a_bytes, filename: 'part_iv_a.docx'));
-      merge_request.files.add(http.MultipartFile.fromBytes('part_iv_b', iv_b_bytes, filename: 'part_iv_b.docx'));
+      merge_request.files.add(http.MultipartFile.fromBytes('files', iv_a_bytes, filename: 'part_iv_a.docx'));
+      merge_request.files.add(http.MultipartFile.fromBytes('files', iv_b_bytes, filename: 'part_iv_b.docx'));
 
       final response = await merge_request.send();
       if (response.statusCode != 200) {
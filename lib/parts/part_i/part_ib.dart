@@ -552,18 +552,21 @@ class _PartIBFormPageState extends State<PartIBFormPage> {
           'foTotal': foTotalCtl.text.trim(),
           'otrFund': otherFundsText,
           'currDate': currDateCtl.text.trim(),
-          'organizationalStructure': _orgStructureImage != null 
-              ? base64Encode(_orgStructureImage!)
-              : null,
           'yearRange': formattedYearRange,
         };
 
         final url = Uri.parse('http://localhost:8000/generate-ib-docx/');
-        final response = await http.post(
-          url,
-          headers: {'Content-Type': 'application/json'},
-          body: jsonEncode(data),
-        );
+        // The chart goes as a raw file part rather than base64 inside the JSON
+        final request = http.MultipartRequest('POST', url)
+          ..fields['data'] = jsonEncode(data);
+        if (_orgStructureImage != null) {
+          request.files.add(http.MultipartFile.fromBytes(
+            'organizationalStructure',
+            _orgStructureImage!,
+            filename: 'org_structure.png',
+          ));
+        }
+        final response = await http.Response.fromStream(await request.send());
         if (response.statusCode != 200) {
           throw Exception('Failed to generate DOCX: ${response.statusCode}');
         }
@@ -6,7 +6,6 @@ import 'package:file_saver/file_saver.dart';
 import 'package:firebase_auth/firebase_auth.dart';
 import 'package:flutter/foundation.dart' show Uint8List, kIsWeb;
 import 'package:flutter/material.dart';
-import 'package:flutter/services.dart' show rootBundle;
 import 'package:path_provider/path_provider.dart';
 import 'package:image_picker/image_picker.dart';
 import 'package:firebase_storage/firebase_storage.dart';
@@ -37,14 +36,7 @@ Future<Uint8List> generateDocxWithImages({
       Uri.parse('${Config.serverUrl}/generate-docx'),
     );
 
-    final templateBytes = await rootBundle.load('assets/II_a.docx');
-    request.files.add(
-      http.MultipartFile.fromBytes(
-        'template',
-        templateBytes.buffer.asUint8List(),
-        filename: 'II_a.docx',
-      ),
-    );
+    request.fields['templateId'] = 'II_a.docx';
 
     request.files.add(
       http.MultipartFile.fromBytes(
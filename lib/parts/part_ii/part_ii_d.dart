@@ -9,7 +9,6 @@ import 'package:firebase_storage/firebase_storage.dart';
 import 'package:file_saver/file_saver.dart';
 import 'package:path_provider/path_provider.dart';
 import 'package:http/http.dart' as http;
-import 'package:flutter/services.dart' show rootBundle;
 import '../../config.dart';
 import 'package:test_project/main_part.dart';
 import '../../utils/user_utils.dart';
@@ -26,14 +25,7 @@ Future<Uint8List> generateDocxWithImages({
       Uri.parse('${Config.serverUrl}/generate-docx'),
     );
 
-    final templateBytes = await rootBundle.load('assets/II_d.docx');
-    request.files.add(
-      http.MultipartFile.fromBytes(
-        'template',
-        templateBytes.buffer.asUint8List(),
-        filename: 'II_d.docx',
-      ),
-    );
+    request.fields['templateId'] = 'II_d.docx';
 
     request.files.add(
       http.MultipartFile.fromBytes(
@@ -6,7 +6,6 @@ import 'package:file_saver/file_saver.dart';
 import 'package:firebase_auth/firebase_auth.dart';
 import 'package:flutter/foundation.dart' show Uint8List, kIsWeb;
 import 'package:flutter/material.dart';
-import 'package:flutter/services.dart' show rootBundle;
 import 'package:path_provider/path_provider.dart';
 import 'package:image_picker/image_picker.dart';
 import 'package:firebase_storage/firebase_storage.dart';
@@ -40,14 +39,7 @@ Future<Uint8List> generateDocxWithImages({
     final formattedYearRange = formatYearRange(yearRange);
     request.headers['yearrange'] = formattedYearRange;
 
-    final templateBytes = await rootBundle.load('assets/IV_b.docx');
-    request.files.add(
-      http.MultipartFile.fromBytes(
-        'template',
-        templateBytes.buffer.asUint8List(),
-        filename: 'IV_b.docx',
-      ),
-    );
+    request.fields['templateId'] = 'IV_b.docx';
 
     request.files.add(
       http.MultipartFile.fromBytes(
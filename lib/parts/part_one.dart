@@ -137,15 +137,15 @@ class _Part1State extends State<Part1> with TickerProviderStateMixin {
       // Create multipart request for merging
       var request = http.MultipartRequest(
         'POST',
-        Uri.parse('${Config.serverUrl}/merge-documents-part-i-all'),
+        Uri.parse('${Config.serverUrl}/merge-documents'),
       );
 
       // Add all documents
-      request.files.add(http.MultipartFile.fromBytes('part_ia', iaBytes, filename: 'part_ia.docx'));
-      request.files.add(http.MultipartFile.fromBytes('part_ib', ibBytes, filename: 'part_ib.docx'));
-      request.files.add(http.MultipartFile.fromBytes('part_ic', icBytes, filename: 'part_ic.docx'));
-      request.files.add(http.MultipartFile.fromBytes('part_id', idBytes, filename: 'part_id.docx'));
-      request.files.add(http.MultipartFile.fromBytes('part_ie', ieBytes, filename: 'part_ie.docx'));
+      request.files.add(http.MultipartFile.fromBytes('files', iaBytes, filename: 'part_ia.docx'));
+      request.files.add(http.MultipartFile.fromBytes('files', ibBytes, filename: 'part_ib.docx'));
+      request.files.add(http.MultipartFile.fromBytes('files', icBytes, filename: 'part_ic.docx'));
+      request.files.add(http.MultipartFile.fromBytes('files', idBytes, filename: 'part_id.docx'));
+      request.files.add(http.MultipartFile.fromBytes('files', ieBytes, filename: 'part_ie.docx'));
 
       // Send merge request
       var response = await request.send();
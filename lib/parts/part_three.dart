@@ -199,12 +199,12 @@ class _Part3State extends State<Part3> {
 
       final merge_request = http.MultipartRequest(
         'POST',
-        Uri.parse('${Config.serverUrl}/merge-documents-part-iii'),
+        Uri.parse('${Config.serverUrl}/merge-documents'),
       );
 
-      merge_request.files.add(http.MultipartFile.fromBytes('part_iii_a', iii_a_bytes, filename: 'part_iii_a.docx'));
-      merge_request.files.add(http.MultipartFile.fromBytes('part_iii_b', iii_b_bytes, filename: 'part_iii_b.docx'));
-      merge_request.files.add(http.MultipartFile.fromBytes('part_iii_c', iii_c_bytes, filename: 'part_iii_c.docx'));
+      merge_request.files.add(http.MultipartFile.fromBytes('files', iii_a_bytes, filename: 'part_iii_a.docx'));
+      merge_request.files.add(http.MultipartFile.fromBytes('files', iii_b_bytes, filename: 'part_iii_b.docx'));
+      merge_request.files.add(http.MultipartFile.fromBytes('files', iii_c_bytes, filename: 'part_iii_c.docx'));
 
       final merge_response = await merge_request.send();
       if (merge_response.statusCode != 200) {
@@ -76,13 +76,13 @@ class _Part2State extends State<Part2> {
 
       final merge_request = http.MultipartRequest(
         'POST',
-        Uri.parse('${Config.serverUrl}/merge-documents-part-ii'),
+        Uri.parse('${Config.serverUrl}/merge-documents'),
       );
 
-      merge_request.files.add(http.MultipartFile.fromBytes('part_ii_a', ii_a_bytes, filename: 'part_ii_a.docx'));
-      merge_request.files.add(http.MultipartFile.fromBytes('part_ii_b', ii_b_bytes, filename: 'part_ii_b.docx'));
-      merge_request.files.add(http.MultipartFile.fromBytes('part_ii_c', ii_c_bytes, filename: 'part_ii_c.docx'));
-      merge_request.files.add(http.MultipartFile.fromBytes('part_ii_d', ii_d_bytes, filename: 'part_ii_d.docx'));
+      merge_request.files.add(http.MultipartFile.fromBytes('files', ii_a_bytes, filename: 'part_ii_a.docx'));
+      merge_request.files.add(http.MultipartFile.fromBytes('files', ii_b_bytes, filename: 'part_ii_b.docx'));
+      merge_request.files.add(http.MultipartFile.fromBytes('files', ii_c_bytes, filename: 'part_ii_c.docx'));
+      merge_request.files.add(http.MultipartFile.fromBytes('files', ii_d_bytes, filename: 'part_ii_d.docx'));
 
       final merge_response = await merge_request.send();
       if (merge_response.statusCode != 200) {
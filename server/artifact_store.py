@@ -0,0 +1,298 @@
+import os
+import re
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'artifacts'))
+DEFAULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_OBJECT_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+_ARTIFACT_ID = re.compile(r'[0-9a-f]{64}')
+_NAME = re.compile(r'[A-Za-z0-9][A-Za-z0-9._-]*')
+
+
+class ArtifactTooLarge(ValueError):
+    """An artifact larger than the store accepts (ARTIFACT_MAX_OBJECT_BYTES)."""
+
+
+def is_artifact_id(value):
+    return isinstance(value, str) and _ARTIFACT_ID.fullmatch(value) is not None
+
+
+def year_range_key(year_range):
+    """
+    Canonical form of a yearRange, so the client's storage code ('2729') and the
+    label sent to the generate endpoints ('2027 - 2029') name the same plan.
+    """
+    year_range = re.sub(r'\s+', '', year_range)
+    if re.fullmatch(r'\d{4}', year_range):
+        return f'20{year_range[:2]}-20{year_range[2:]}'
+    return year_range
+
+
+class ArtifactStore:
+    """
+    Documents and images the server generated or received, kept on the local
+    filesystem.
+
+    An artifact's ID is the SHA-256 of its bytes (generated output is deterministic,
+    so regenerating a part gives back the same ID), and it is stored once under
+    ``objects/``. Clients can ask which IDs are missing and upload only those.
+    ``refs/<yearRange>/<part>`` names the latest artifact stored for a part of a plan,
+    so merges can refer to parts by name.
+
+    Artifacts and refs expire ``ttl`` seconds after they were last stored. A single
+    artifact may be at most ``max_object_bytes`` (ARTIFACT_MAX_OBJECT_BYTES), and
+    ``objects/`` is kept within ``max_bytes`` (ARTIFACT_STORE_MAX_BYTES) by deleting
+    the least recently stored artifacts first. Reads go through an in-memory LRU of at
+    most ``cache_max_bytes`` (ARTIFACT_CACHE_MAX_BYTES, 0 disables it).
+    """
+
+    def __init__(self, root=None, cache_max_bytes=None, ttl=None, max_object_bytes=None, max_bytes=None):
+        if root is None:
+            root = os.environ.get('ARTIFACT_DIR', DEFAULT_DIR)
+        if cache_max_bytes is None:
+            cache_max_bytes = int(os.environ.get('ARTIFACT_CACHE_MAX_BYTES', DEFAULT_CACHE_MAX_BYTES))
+        if ttl is None:
+            ttl = float(os.environ.get('ARTIFACT_TTL', DEFAULT_TTL))
+        if max_object_bytes is None:
+            max_object_bytes = int(os.environ.get('ARTIFACT_MAX_OBJECT_BYTES', DEFAULT_MAX_OBJECT_BYTES))
+        if max_bytes is None:
+            max_bytes = int(os.environ.get('ARTIFACT_STORE_MAX_BYTES', DEFAULT_MAX_BYTES))
+        self.root = root
+        self.cache_max_bytes = cache_max_bytes
+        self.ttl = ttl
+        self.max_object_bytes = min(max_object_bytes, max_bytes)
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        # Bytes under objects/, counted on first use and kept up to date after that
+        self._disk_bytes = None
+        self._disk_lock = threading.RLock()
+        self._last_sweep = 0.0
+
+    def put(self, data, year_range=None, part=None):
+        """
+        Store `data` and return its artifact ID.
+
+        Args:
+            data: The document as bytes
+            year_range, part: If both are given, also point the part's ref at it
+
+        Raises:
+            ArtifactTooLarge: If `data` is larger than max_object_bytes
+            ValueError: If `year_range` or `part` is not a valid name
+        """
+        data = bytes(data)
+        if len(data) > self.max_object_bytes:
+            raise ArtifactTooLarge(f"Artifact of {len(data)} bytes exceeds the limit of {self.max_object_bytes}")
+        artifact_id = hashlib.sha256(data).hexdigest()
+        ref = self._ref_path(year_range, part) if year_range and part else None
+        path = self._object_path(artifact_id)
+        with self._disk_lock:
+            if os.path.exists(path):
+                os.utime(path)
+            else:
+                self._make_room(len(data))
+                self._write(path, data)
+                self._disk_bytes += len(data)
+        if ref is not None:
+            self._write(ref, artifact_id.encode('ascii'))
+        self._cache(artifact_id, data, time.time() + self.ttl)
+        logger.debug(f"[ARTIFACTS] Stored {artifact_id[:12]} ({len(data)} bytes)"
+                     + (f" as {year_range}/{part}" if ref else ""))
+        self._maybe_sweep()
+        return artifact_id
+
+    def get(self, artifact_id):
+        """Return the artifact's bytes, or None if it is unknown or expired."""
+        if not is_artifact_id(artifact_id):
+            return None
+        with self._lock:
+            entry = self._entries.get(artifact_id)
+            if entry is not None:
+                expires, data = entry
+                if expires >= time.time():
+                    self._entries.move_to_end(artifact_id)
+                    return data
+                self._uncache(artifact_id)
+        path = self._object_path(artifact_id)
+        expires = self._expiry(path)
+        if expires is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        self._cache(artifact_id, data, expires)
+        return data
+
+    def missing(self, artifact_ids):
+        """
+        Return the IDs among `artifact_ids` that are not stored, in order.
+
+        Stored ones have their expiry pushed back, so they are still there when the
+        request that refers to them arrives.
+        """
+        absent = []
+        for artifact_id in artifact_ids:
+            path = self._object_path(artifact_id) if is_artifact_id(artifact_id) else None
+            if path is not None and self._expiry(path) is not None:
+                try:
+                    os.utime(path)
+                    continue
+                except FileNotFoundError:
+                    pass
+            absent.append(artifact_id)
+        return absent
+
+    def resolve(self, year_range, part):
+        """
+        Return the ID of the artifact stored for `part` of `year_range`, or None.
+
+        Raises:
+            ValueError: If `year_range` or `part` is not a valid name
+        """
+        path = self._ref_path(year_range, part)
+        if self._expiry(path) is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                artifact_id = f.read().decode('ascii').strip()
+        except FileNotFoundError:
+            return None
+        if not is_artifact_id(artifact_id) or self._expiry(self._object_path(artifact_id)) is None:
+            return None
+        return artifact_id
+
+    def sweep(self):
+        """Delete expired artifacts and refs."""
+        self._last_sweep = time.monotonic()
+        removed = 0
+        for base in (os.path.join(self.root, 'objects'), os.path.join(self.root, 'refs')):
+            for directory, _, names in os.walk(base):
+                for name in names:
+                    path = os.path.join(directory, name)
+                    if self._expiry(path) is None:
+                        removed += 1
+        if removed:
+            logger.debug(f"[ARTIFACTS] Swept {removed} expired files")
+
+    def _maybe_sweep(self):
+        if time.monotonic() - self._last_sweep >= min(self.ttl, 3600):
+            self.sweep()
+
+    def _expiry(self, path):
+        # Removes the file once expired, so a sweep is just an _expiry of every file
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        expires = stat.st_mtime + self.ttl
+        if expires < time.time():
+            self._remove(path, stat.st_size)
+            return None
+        return expires
+
+    def _make_room(self, size):
+        # Called with _disk_lock held, before writing an object of `size` bytes
+        if self._disk_usage() + size <= self.max_bytes:
+            return
+        self.sweep()
+        if self._disk_bytes + size <= self.max_bytes:
+            return
+        objects = []
+        for directory, _, names in os.walk(os.path.join(self.root, 'objects')):
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                objects.append((stat.st_mtime, path, stat.st_size))
+        evicted = 0
+        for _, path, object_size in sorted(objects):
+            if self._disk_bytes + size <= self.max_bytes:
+                break
+            self._remove(path, object_size)
+            evicted += 1
+        logger.warning(f"[ARTIFACTS] Over the {self.max_bytes} byte limit, evicted {evicted} least recently stored artifacts")
+
+    def _disk_usage(self):
+        with self._disk_lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = 0
+                for directory, _, names in os.walk(os.path.join(self.root, 'objects')):
+                    for name in names:
+                        try:
+                            self._disk_bytes += os.stat(os.path.join(directory, name)).st_size
+                        except FileNotFoundError:
+                            pass
+            return self._disk_bytes
+
+    def _remove(self, path, size):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        name = os.path.basename(path)
+        if os.path.dirname(os.path.dirname(path)) == os.path.join(self.root, 'objects'):
+            with self._disk_lock:
+                if self._disk_bytes is not None:
+                    self._disk_bytes -= size
+            with self._lock:
+                self._uncache(name)
+
+    def _object_path(self, artifact_id):
+        return os.path.join(self.root, 'objects', artifact_id[:2], artifact_id)
+
+    def _ref_path(self, year_range, part):
+        if not isinstance(year_range, str) or _NAME.fullmatch(year_range_key(year_range)) is None:
+            raise ValueError(f"Invalid yearRange: {year_range!r}")
+        if not isinstance(part, str) or _NAME.fullmatch(part) is None:
+            raise ValueError(f"Invalid part name: {part!r}")
+        return os.path.join(self.root, 'refs', year_range_key(year_range), part)
+
+    def _write(self, path, data):
+        # Written beside the target and renamed over it, so readers never see a partial file
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def _cache(self, artifact_id, data, expires):
+        if self.cache_max_bytes <= 0 or len(data) > self.cache_max_bytes:
+            return
+        with self._lock:
+            self._uncache(artifact_id)
+            self._entries[artifact_id] = (expires, data)
+            self._total_bytes += len(data)
+            while self._total_bytes > self.cache_max_bytes:
+                self._uncache(next(iter(self._entries)))
+
+    def _uncache(self, artifact_id):
+        entry = self._entries.pop(artifact_id, None)
+        if entry is not None:
+            self._total_bytes -= len(entry[1])
+
+
+artifact_store = ArtifactStore()
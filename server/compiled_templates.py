@@ -0,0 +1,247 @@
+import os
+import io
+import re
+import uuid
+import zlib
+import base64
+import logging
+import zipfile
+from xml.sax.saxutils import escape
+from docx.image.image import Image
+from docx.opc.part import XmlPart
+from docx.opc.spec import default_content_types
+from server.template_registry import template_registry
+from server.placeholders import index_placeholders
+from server.doc_properties import DOCUMENT_PROPERTIES
+from server.deterministic import deflate, member_order, normalize_member, write_zip
+
+logger = logging.getLogger(__name__)
+
+COMPILED_TEMPLATES_ENABLED = os.environ.get('COMPILED_TEMPLATES', '1') != '0'
+
+# 1x1 PNG used to reserve the picture part of an image slot at compile time
+PLACEHOLDER_PNG = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=='
+)
+
+_NONCE = uuid.uuid4().hex[:12]
+_SLOT_PATTERN = re.compile(rb'@@' + _NONCE.encode() + rb':(\w+)@@')
+_INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_IMAGE_EXT_SLOT = '_image_ext'
+_IMAGE_DEFAULT_SLOT = '_image_default'
+
+
+def sentinel(name):
+    return f'@@{_NONCE}:{name}@@'
+
+
+class CompiledTemplate:
+    """
+    A .docx template reduced to static zip members plus XML byte chunks with slots.
+
+    Static members keep their deflated bytes and CRC from compile time and are copied
+    into every rendered package unchanged. Members that contain slots are stored as
+    alternating byte chunks and slot names; rendering joins the chunks with the escaped
+    slot values and deflates the result.
+    """
+
+    def __init__(self, members, slot_types, image_member=None, default_extensions=()):
+        self.members = members
+        self.slots = {
+            slot for member in members for slot in member.get('slots', ())
+            if slot not in (_IMAGE_EXT_SLOT, _IMAGE_DEFAULT_SLOT)
+        }
+        self.slot_types = slot_types
+        self.image_member = image_member
+        self.default_extensions = set(default_extensions)
+
+    def render(self, values, image=None):
+        """
+        Assemble a .docx package.
+
+        Args:
+            values: Mapping of slot name to value; missing names render as their
+                original ${name} token (render_compiled_template leaves such requests
+                to the python-docx path, which keeps the token's runs as they are)
+            image: Bytes for the image slot, if the template has one
+
+        Returns:
+            bytes: The rendered .docx file
+        """
+        slot_values = {}
+        for name, value in values.items():
+            slot_values[name] = _render_slot(value, self.slot_types.get(name, 'text'))
+
+        image_name = self.image_member
+        image_info = None
+        if self.image_member is not None:
+            if image is None:
+                raise ValueError("Template has an image slot but no image was provided")
+            image_info = Image.from_blob(image)
+            stem = self.image_member.rsplit('.', 1)[0]
+            image_name = f'{stem}.{image_info.ext}'
+            slot_values[_IMAGE_EXT_SLOT] = image_info.ext.encode()
+            if image_info.ext.lower() in self.default_extensions:
+                content_type = ''
+            elif (image_info.ext.lower(), image_info.content_type) in default_content_types:
+                content_type = f'<Default Extension="{image_info.ext}" ContentType="{image_info.content_type}"/>'
+            else:
+                content_type = f'<Override PartName="/{image_name}" ContentType="{image_info.content_type}"/>'
+            slot_values[_IMAGE_DEFAULT_SLOT] = content_type.encode()
+
+        entries = []
+        for member in self.members:
+            name = member['name']
+            if name == self.image_member:
+                # Deflated as python-docx saves it
+                entries.append((image_name, zlib.crc32(image), deflate(image), len(image), zipfile.ZIP_DEFLATED))
+            elif 'chunks' in member:
+                raw = normalize_member(name, _join(member['chunks'], member['slots'], slot_values))
+                entries.append((name, zlib.crc32(raw), deflate(raw), len(raw), zipfile.ZIP_DEFLATED))
+            else:
+                entries.append((name, member['crc'], member['data'], member['size'], zipfile.ZIP_DEFLATED))
+        # Laid out like normalize_docx, so both paths give the same bytes
+        return write_zip(sorted(entries, key=lambda entry: member_order(entry[0])))
+
+
+def compile_template(template_path, fill, slot_types=None, image_slot=None):
+    """
+    Compile `template_path` by running its python-docx fill function once with sentinels.
+
+    Args:
+        template_path: Path to the .docx template
+        fill: Callable(doc, values, image_stream) that fills a Document the same way
+            the python-docx path does
+        slot_types: Optional mapping of slot name to 'text' (escaped into the
+            surrounding w:t) or 'run' (tabs and line breaks become w:tab/w:br, as
+            python-docx's add_run does); defaults to 'text'
+        image_slot: Name of the placeholder replaced by a picture, if any
+
+    Returns:
+        CompiledTemplate
+    """
+    doc = template_registry.open(template_path)
+    names = set(DOCUMENT_PROPERTIES)
+    for _, _, _, found in index_placeholders(doc):
+        names |= found
+    names.discard(image_slot)
+    fill(doc, {name: sentinel(name) for name in names},
+         io.BytesIO(PLACEHOLDER_PNG) if image_slot else None)
+
+    xml_space = '{http://www.w3.org/XML/1998/namespace}space'
+    for part in doc.part.package.iter_parts():
+        if isinstance(part, XmlPart):
+            for t in part.element.xpath(f'.//w:t[contains(., "@@{_NONCE}:")]'):
+                t.set(xml_space, 'preserve')
+
+    image_member = None
+    if image_slot:
+        for part in doc.part.package.iter_parts():
+            if part.blob == PLACEHOLDER_PNG:
+                image_member = part.partname.lstrip('/')
+                break
+        if image_member is None:
+            raise ValueError(f"Image slot ${{{image_slot}}} not found in {template_path}")
+        # python-docx names a picture added from a stream image.<ext>
+        for part in doc.part.package.iter_parts():
+            if not isinstance(part, XmlPart):
+                continue
+            for r_id, rel in part.rels.items():
+                if not rel.is_external and rel.target_part.partname.lstrip('/') == image_member:
+                    for c_nv_pr in part.element.xpath(
+                        f'.//pic:pic[pic:blipFill/a:blip/@r:embed="{r_id}"]/pic:nvPicPr/pic:cNvPr'
+                    ):
+                        c_nv_pr.set('name', f'image.{sentinel(_IMAGE_EXT_SLOT)}')
+
+    stream = io.BytesIO()
+    doc.save(stream)
+    members = []
+    default_extensions = set()
+    with zipfile.ZipFile(stream) as zf:
+        for info in zf.infolist():
+            data = zf.read(info.filename)
+            if image_member is not None:
+                stem = image_member.rsplit('.', 1)[0]
+                if info.filename.endswith('.rels'):
+                    data = data.replace(
+                        f'/{os.path.basename(image_member)}"'.encode(),
+                        f'/{os.path.basename(stem)}.{sentinel(_IMAGE_EXT_SLOT)}"'.encode(),
+                    )
+                elif info.filename == '[Content_Types].xml':
+                    default_extensions = {
+                        ext.decode().lower() for ext in re.findall(rb'<Default Extension="([^"]+)"', data)
+                    }
+                    data = data.replace(b'</Types>', sentinel(_IMAGE_DEFAULT_SLOT).encode() + b'</Types>')
+
+            pieces = _SLOT_PATTERN.split(data)
+            if len(pieces) > 1:
+                members.append({
+                    'name': info.filename,
+                    'chunks': pieces[0::2],
+                    'slots': [slot.decode() for slot in pieces[1::2]],
+                })
+            else:
+                data = normalize_member(info.filename, data)
+                members.append({
+                    'name': info.filename,
+                    'crc': zlib.crc32(data),
+                    'data': deflate(data),
+                    'size': len(data),
+                })
+
+    slot_types = dict(slot_types or {})
+    slot_types[_IMAGE_EXT_SLOT] = 'raw'
+    slot_types[_IMAGE_DEFAULT_SLOT] = 'raw'
+    logger.debug(f"[COMPILED] Compiled {template_path}: {sum('chunks' in m for m in members)} dynamic members")
+    return CompiledTemplate(members, slot_types, image_member, default_extensions)
+
+
+def render_compiled_template(template_path, name, fill, values, slot_types=None, image_slot=None, image=None):
+    """
+    Render `template_path` through its compiled form, compiling it on first use.
+
+    The compiled template is memoized per template version. Its output is normalized
+    like normalize_docx output, so it is byte-identical to the python-docx path's.
+    Returns None when compiled rendering is disabled (COMPILED_TEMPLATES=0), the
+    template cannot be compiled or `values` lacks one of its slots, in which case the
+    caller should use its python-docx path.
+    """
+    if not COMPILED_TEMPLATES_ENABLED or not template_registry.is_cacheable(template_path):
+        return None
+    try:
+        compiled = template_registry.memoize(
+            template_path,
+            ('compiled', name),
+            lambda: compile_template(template_path, fill, slot_types, image_slot),
+        )
+    except Exception as e:
+        logger.warning(f"[COMPILED] Could not compile {template_path}, using python-docx: {e}")
+        return None
+    missing = compiled.slots - values.keys()
+    if missing:
+        logger.debug(f"[COMPILED] No values for {sorted(missing)}, using python-docx")
+        return None
+    return compiled.render(values, image=image)
+
+
+def _render_slot(value, slot_type):
+    if slot_type == 'raw':
+        return value
+    text = _INVALID_XML_CHARS.sub('', str(value))
+    text = escape(text)
+    if slot_type == 'run':
+        text = text.replace('\t', '</w:t><w:tab/><w:t xml:space="preserve">')
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+        text = text.replace('\n', '</w:t><w:br/><w:t xml:space="preserve">')
+    return text.encode('utf-8')
+
+
+def _join(chunks, slots, slot_values):
+    out = [chunks[0]]
+    for slot, chunk in zip(slots, chunks[1:]):
+        value = slot_values.get(slot)
+        if value is None:
+            value = escape(f'${{{slot}}}').encode('utf-8')
+        out.append(value)
+        out.append(chunk)
+    return b''.join(out)
@@ -0,0 +1,175 @@
+import io
+import os
+import time
+import zlib
+import struct
+import logging
+import zipfile
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+# Normalize every generated or merged package so equal inputs give equal bytes
+DETERMINISTIC_DOCX = os.environ.get('DETERMINISTIC_DOCX', '1') != '0'
+
+
+def _fixed_time():
+    # SOURCE_DATE_EPOCH (the reproducible-builds convention) or 1980-01-01, the
+    # earliest timestamp a zip entry can carry
+    epoch = os.environ.get('SOURCE_DATE_EPOCH')
+    return time.gmtime(max(int(epoch), 315532800) if epoch else 315532800)
+
+
+_FIXED = _fixed_time()
+ZIP_DATE_TIME = tuple(_FIXED[:6])
+ZIP_DATE = ((_FIXED.tm_year - 1980) << 9) | (_FIXED.tm_mon << 5) | _FIXED.tm_mday
+ZIP_TIME = (_FIXED.tm_hour << 11) | (_FIXED.tm_min << 5) | (_FIXED.tm_sec // 2)
+FIXED_TIMESTAMP = time.strftime('%Y-%m-%dT%H:%M:%SZ', _FIXED)
+
+_LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+_W = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+_DCTERMS = 'http://purl.org/dc/terms/'
+_CT = 'http://schemas.openxmlformats.org/package/2006/content-types'
+
+
+def deflate(data):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush()
+
+
+def write_zip(entries):
+    """
+    Write a zip archive from (name, crc, data, size, method) entries, with `data`
+    already compressed by `method`, so deflated members can be copied through as-is.
+    Every entry carries the same fixed timestamp.
+    """
+    out = io.BytesIO()
+    central = []
+    for name, crc, data, size, method in entries:
+        encoded = name.encode('utf-8')
+        offset = out.tell()
+        out.write(_LOCAL_HEADER.pack(
+            0x04034b50, 20, 0, method, ZIP_TIME, ZIP_DATE,
+            crc, len(data), size, len(encoded), 0,
+        ))
+        out.write(encoded)
+        out.write(data)
+        central.append(struct.pack(
+            '<IHHHHHHIIIHHHHHII', 0x02014b50, 20, 20, 0, method, ZIP_TIME, ZIP_DATE,
+            crc, len(data), size, len(encoded), 0, 0, 0, 0, 0, offset,
+        ) + encoded)
+    directory_offset = out.tell()
+    for record in central:
+        out.write(record)
+    directory_size = out.tell() - directory_offset
+    out.write(struct.pack(
+        '<IHHHHIIH', 0x06054b50, 0, 0, len(entries), len(entries),
+        directory_size, directory_offset, 0,
+    ))
+    return out.getvalue()
+
+
+def _normalize_core_properties(xml):
+    root = etree.fromstring(xml)
+    created = root.find(f'{{{_DCTERMS}}}created')
+    modified = root.find(f'{{{_DCTERMS}}}modified')
+    # python-docx stamps "now" as the modification time of packages it creates
+    if modified is None:
+        return xml
+    modified.text = created.text if created is not None and created.text else FIXED_TIMESTAMP
+    return etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True)
+
+
+def _normalize_numbering(xml):
+    # docxcompose gives every copied list definition a random nsid; derive it from
+    # the definition itself instead, which keeps distinct lists distinct
+    root = etree.fromstring(xml)
+    changed = False
+    for abstract_num in root.iterchildren(f'{{{_W}}}abstractNum'):
+        nsid = abstract_num.find(f'{{{_W}}}nsid')
+        if nsid is None:
+            continue
+        content = b''.join(etree.tostring(child) for child in abstract_num if child is not nsid)
+        abstract_id = abstract_num.get(f'{{{_W}}}abstractNumId', '')
+        value = f'{zlib.crc32(abstract_id.encode() + b":" + content):08X}'
+        if nsid.get(f'{{{_W}}}val') != value:
+            nsid.set(f'{{{_W}}}val', value)
+            changed = True
+    if not changed:
+        return xml
+    return etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True)
+
+
+def _normalize_content_types(xml):
+    # Defaults by extension, then overrides by part name, the order python-docx writes
+    # them in; a type added to a package afterwards would otherwise just be appended
+    root = etree.fromstring(xml)
+    children = list(root)
+    ordered = sorted(children, key=lambda child: (
+        child.tag != f'{{{_CT}}}Default', child.get('Extension', ''), child.get('PartName', ''),
+    ))
+    if ordered == children:
+        return xml
+    root[:] = ordered
+    return etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True)
+
+
+_NORMALIZERS = {
+    '[Content_Types].xml': _normalize_content_types,
+    'docProps/core.xml': _normalize_core_properties,
+    'word/numbering.xml': _normalize_numbering,
+}
+
+
+def member_order(name):
+    """Sort key for package members: [Content_Types].xml first, then by name."""
+    return (name != '[Content_Types].xml', name)
+
+
+def normalize_member(name, data):
+    """
+    Normalize the uncompressed bytes of one package member the way normalize_docx
+    does, for packages assembled without going through it.
+    """
+    normalize = _NORMALIZERS.get(name)
+    if normalize is None or not DETERMINISTIC_DOCX:
+        return data
+    return normalize(data)
+
+
+def normalize_docx(data):
+    """
+    Rewrite a .docx package so its bytes depend only on its content.
+
+    Entries are ordered ([Content_Types].xml first, then by name) and get a fixed
+    timestamp; the modification time in docProps/core.xml, list nsids and the order of
+    content types are made reproducible. Other members keep their compressed bytes.
+    Returns `data` unchanged when DETERMINISTIC_DOCX=0.
+
+    Args:
+        data: The .docx file as bytes
+
+    Returns:
+        bytes: The normalized .docx file
+    """
+    if not DETERMINISTIC_DOCX:
+        return data
+    data = bytes(data)
+    entries = []
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        infos = sorted(zf.infolist(), key=lambda info: member_order(info.filename))
+        for info in infos:
+            normalize = _NORMALIZERS.get(info.filename)
+            if normalize is not None or info.compress_type not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+                raw = zf.read(info.filename)
+                if normalize is not None:
+                    raw = normalize(raw)
+                entries.append((info.filename, zlib.crc32(raw), deflate(raw), len(raw), zipfile.ZIP_DEFLATED))
+                continue
+            fields = _LOCAL_HEADER.unpack_from(data, info.header_offset)
+            start = info.header_offset + _LOCAL_HEADER.size + fields[9] + fields[10]
+            entries.append((
+                info.filename, info.CRC, data[start:start + info.compress_size],
+                info.file_size, info.compress_type,
+            ))
+    return write_zip(entries)
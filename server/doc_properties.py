@@ -0,0 +1,129 @@
+import logging
+from docx.opc.constants import CONTENT_TYPE as CT
+from docx.oxml.ns import qn
+from docxcompose.properties import ComplexField, CustomProperties, InvalidComplexField, SimpleField
+from server.template_registry import template_registry
+from server.xml_paths import element_path, resolve_path
+
+logger = logging.getLogger(__name__)
+
+# Document-wide values a template may bind with { DOCPROPERTY "<name>" \* MERGEFORMAT }
+# instead of a ${name} text placeholder.
+DOCUMENT_PROPERTIES = ('yearRange', 'currDate')
+STORY_TYPES = (CT.WML_DOCUMENT_MAIN, CT.WML_HEADER, CT.WML_FOOTER)
+FIELD_KINDS = (
+    ('simple', ".//w:fldSimple[contains(@w:instr, 'DOCPROPERTY ')]", SimpleField),
+    ('complex', ".//w:instrText[contains(., 'DOCPROPERTY ')]", ComplexField),
+)
+FIELD_TAGS = {'simple': qn('w:fldSimple'), 'complex': qn('w:instrText')}
+
+
+def index_docprop_fields(doc):
+    """
+    Locate the DOCPROPERTY fields of `doc` that bind DOCUMENT_PROPERTIES.
+
+    Fields are searched in the main document, headers and footers with one XPath per
+    kind of field and part.
+
+    Returns:
+        list: (partname, path, kind, name) tuples, where `path` is the chain of child
+        indexes from the part's root element to the field's w:fldSimple ('simple') or
+        w:instrText ('complex') node
+    """
+    index = []
+    for part in doc.part.package.iter_parts():
+        if part.content_type not in STORY_TYPES:
+            continue
+        root = part.element
+        for kind, xpath, field_type in FIELD_KINDS:
+            for node in root.xpath(xpath):
+                try:
+                    name = field_type(node).name
+                except InvalidComplexField:
+                    continue
+                if name in DOCUMENT_PROPERTIES:
+                    index.append((part.partname, element_path(root, node), kind, name))
+    return index
+
+
+def set_document_properties(doc, values):
+    """
+    Store document-wide values in docProps/custom.xml for templates that bind them
+    through DOCPROPERTY fields.
+
+    The fields are indexed once per template version through the template registry;
+    a template without any (every shipped asset) returns here without touching the
+    package. Only names referenced by at least one field are written. The cached
+    result of each such field is refreshed as well, so viewers that do not recalculate
+    fields (mammoth, Word until the next field update) show the new value. ${name}
+    text placeholders are left untouched, so callers still pass every value to the
+    regular placeholder fill; a template may use both for the same name.
+
+    Args:
+        doc: The Document to update
+        values: Mapping of property name to value; names outside DOCUMENT_PROPERTIES
+            are ignored
+
+    Returns:
+        set: Names bound to DOCPROPERTY fields
+    """
+    values = {
+        name: value for name, value in values.items()
+        if name in DOCUMENT_PROPERTIES and value is not None
+    }
+    if not values:
+        return set()
+
+    index = template_registry.derive(doc, 'docprops', index_docprop_fields)
+    index = [entry for entry in index if entry[3] in values]
+    if not index:
+        return set()
+    fields = _locate(doc, index)
+    if fields is None:
+        logger.debug("[DOCPROPS] Index does not match document, re-indexing")
+        fields = _locate(doc, [entry for entry in index_docprop_fields(doc) if entry[3] in values])
+
+    props = CustomProperties(doc)
+    bound = {field.name for field in fields}
+    for name in bound:
+        props[name] = str(values[name])
+    for field in fields:
+        field.update(str(values[field.name]), language=props.language)
+    logger.debug(f"[DOCPROPS] Set {sorted(bound)} on {len(fields)} fields")
+    return bound
+
+
+def _locate(doc, index):
+    # Fields for index entries, or None if the index was built from another layout
+    parts = {part.partname: part for part in doc.part.package.iter_parts()}
+    fields = []
+    for partname, path, kind, name in index:
+        part = parts.get(partname)
+        node = resolve_path(part.element, path) if part is not None else None
+        if node is None or node.tag != FIELD_TAGS[kind]:
+            return None
+        fields.append(SimpleField(node) if kind == 'simple' else ComplexField(node))
+    return fields
+
+
+def carry_document_properties(master, docs):
+    """
+    Copy the DOCUMENT_PROPERTIES set on merged-in documents into `master`.
+
+    docxcompose keeps only the master's docProps, so a merge whose first part was built
+    from a legacy template would otherwise lose yearRange/currDate. Values already on
+    the master win.
+
+    Args:
+        master: The Document the others were appended to
+        docs: The appended Documents, in merge order
+    """
+    props = CustomProperties(master)
+    added = False
+    for doc in docs:
+        for name, value in CustomProperties(doc).items():
+            if name in DOCUMENT_PROPERTIES and name not in props:
+                props[name] = value
+                added = True
+    if added:
+        props.update_all()
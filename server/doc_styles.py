@@ -0,0 +1,104 @@
+import logging
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+
+logger = logging.getLogger(__name__)
+
+LABEL_STYLE = 'SOIDLabel'
+VALUE_STYLE = 'SOIDValue'
+QUOTE_STYLE = 'SOIDQuote'
+COLUMN_HEADER_STYLE = 'SOIDColumnHeader'
+HEADER_STAMP_STYLE = 'SOIDHeaderStamp'
+FOOTER_STAMP_STYLE = 'SOIDFooterStamp'
+BULLET_STYLE = 'SOIDBullet'
+
+_PALATINO = '<w:rFonts w:ascii="Palatino Linotype" w:hAnsi="Palatino Linotype"/>'
+
+# style ID -> (name, type, pPr, rPr). Character styles carry what used to be set on
+# every run; the bullet style replaces the empty spacer paragraph after each item.
+STYLES = {
+    LABEL_STYLE: ('SOID Label', 'character', '', f'{_PALATINO}<w:b/><w:sz w:val="24"/>'),
+    VALUE_STYLE: ('SOID Value', 'character', '', f'{_PALATINO}<w:sz w:val="24"/>'),
+    QUOTE_STYLE: ('SOID Quote', 'character', '', f'{_PALATINO}<w:i/><w:sz w:val="24"/>'),
+    COLUMN_HEADER_STYLE: ('SOID Column Header', 'character', '', '<w:b/><w:sz w:val="22"/>'),
+    HEADER_STAMP_STYLE: (
+        'SOID Header Stamp', 'character', '',
+        f'{_PALATINO}<w:b/><w:color w:val="000000"/><w:sz w:val="28"/>',
+    ),
+    FOOTER_STAMP_STYLE: (
+        'SOID Footer Stamp', 'character', '',
+        f'{_PALATINO}<w:color w:val="000000"/><w:sz w:val="24"/>',
+    ),
+    BULLET_STYLE: (
+        'SOID Bullet', 'paragraph',
+        '<w:contextualSpacing w:val="0"/><w:spacing w:after="240"/>', '',
+    ),
+}
+
+# Run properties each character style defines; direct values of these would
+# otherwise win over the style and are dropped when the style is applied
+_STYLE_PROPERTIES = {
+    style_id: tuple(child.tag for child in parse_xml(f'<w:rPr {nsdecls("w")}>{rpr}</w:rPr>'))
+    for style_id, (_, _, _, rpr) in STYLES.items()
+}
+
+# mammoth ignores character style formatting unless told how to map it
+MAMMOTH_STYLE_MAP = '\n'.join([
+    f"r[style-name='{STYLES[LABEL_STYLE][0]}'] => strong",
+    f"r[style-name='{STYLES[QUOTE_STYLE][0]}'] => em",
+    f"r[style-name='{STYLES[COLUMN_HEADER_STYLE][0]}'] => strong",
+    f"r[style-name='{STYLES[HEADER_STAMP_STYLE][0]}'] => strong",
+    f"p[style-name='{STYLES[BULLET_STYLE][0]}'] => ul > li:fresh",
+])
+
+
+def _style_element(style_id, name, style_type, ppr, rpr):
+    based_on = '<w:basedOn w:val="ListBullet"/>' if style_id == BULLET_STYLE else ''
+    return parse_xml(
+        f'<w:style {nsdecls("w")} w:type="{style_type}" w:customStyle="1" w:styleId="{style_id}">'
+        f'<w:name w:val="{name}"/>{based_on}<w:qFormat/>'
+        + (f'<w:pPr>{ppr}</w:pPr>' if ppr else '')
+        + (f'<w:rPr>{rpr}</w:rPr>' if rpr else '')
+        + '</w:style>'
+    )
+
+
+def ensure_styles(doc):
+    """
+    Add the SOID styles to `doc`'s styles part if they are not there yet.
+
+    Generated content references these styles by ID instead of repeating fonts, sizes
+    and bold/italic flags on every run. Cheap to call repeatedly: a document that
+    already has them (e.g. a clone of a template prepared earlier) is left untouched.
+
+    Args:
+        doc: The Document to update
+    """
+    styles = doc.styles.element
+    existing = set(styles.xpath('w:style/@w:styleId'))
+    missing = [style_id for style_id in STYLES if style_id not in existing]
+    for style_id in missing:
+        styles.append(_style_element(style_id, *STYLES[style_id]))
+    if missing:
+        logger.debug(f"[STYLES] Added {missing}")
+
+
+def style_run(run, style_id, replace=True):
+    """
+    Point `run` at character style `style_id`.
+
+    Direct properties the style defines (font, size, bold, ...) are removed so the
+    style takes effect; other direct formatting on the run is kept.
+
+    Args:
+        run: A python-docx Run
+        style_id: One of the character style IDs above
+        replace: When False, runs already carrying one of the SOID styles keep it
+    """
+    rPr = run._r.get_or_add_rPr()
+    if not replace and rPr.style in STYLES:
+        return
+    for tag in _STYLE_PROPERTIES[style_id]:
+        for element in rPr.findall(tag):
+            rPr.remove(element)
+    rPr.style = style_id
@@ -0,0 +1,171 @@
+import io
+import re
+import logging
+from typing import NamedTuple, Optional, Tuple
+from docx.opc.constants import CONTENT_TYPE as CT
+from docx.oxml import OxmlElement
+from docx.oxml.ns import nsmap, qn
+from docx.shared import Length
+from docx.text.paragraph import Paragraph
+from docx.text.run import Run
+from server.images import normalize_image
+from server.template_registry import template_registry
+from server.xml_paths import element_path, resolve_path
+
+logger = logging.getLogger(__name__)
+
+# {Name} tokens; ${name} text placeholders are left to server.placeholders
+TOKEN_PATTERN = re.compile(r'(?<!\$)\{(\w+)\}')
+STORY_TYPES = (CT.WML_DOCUMENT_MAIN, CT.WML_HEADER, CT.WML_FOOTER)
+
+
+class ImageSlot(NamedTuple):
+    """A picture in a template: the {name} token or picture content control it
+    replaces (matched on the control's tag or title) and its printed size."""
+    name: str
+    width: Length
+    height: Optional[Length] = None
+
+
+class ImageTemplate(NamedTuple):
+    """The image slots of a template, in the order its images are sent, and whether
+    its ${yearRange} is stamped."""
+    label: str
+    slots: Tuple[ImageSlot, ...]
+    year_range: bool = False
+
+
+def index_image_slots(doc):
+    """
+    Locate the image slots of `doc`.
+
+    Paragraphs holding {Name} tokens and picture content controls are found in the
+    main document, headers and footers (tables included) with one XPath per part.
+
+    Returns:
+        list: (partname, path, kind, names) tuples, where `path` is the chain of child
+        indexes from the part's root element, `kind` is 'token' for a paragraph (with
+        `names` its tokens in order) or 'control' for a w:sdt (with `names` holding its
+        tag or title, '' if it has neither)
+    """
+    index = []
+    for part in doc.part.package.iter_parts():
+        if part.content_type not in STORY_TYPES:
+            continue
+        root = part.element
+        for p in root.xpath('.//w:p[contains(string(.), "{")]'):
+            names = tuple(TOKEN_PATTERN.findall(''.join(p.xpath('./w:r/w:t/text()'))))
+            if names:
+                index.append((part.partname, element_path(root, p), 'token', names))
+        for sdt in root.xpath('.//w:sdt[w:sdtPr/w:picture or w:sdtContent//w:drawing or w:sdtContent//w:pict]'):
+            name = (sdt.xpath('string(w:sdtPr/w:tag/@w:val)', namespaces=nsmap)
+                    or sdt.xpath('string(w:sdtPr/w:alias/@w:val)', namespaces=nsmap))
+            index.append((part.partname, element_path(root, sdt), 'control', (name,)))
+    return index
+
+
+def fill_image_slots(doc, slots, images):
+    """
+    Put images into the slots of `doc` in one pass.
+
+    The slot index is built once per template version through the template registry.
+    A token paragraph is emptied and gets the pictures of its tokens; a picture
+    content control gets its picture in place of its content. Images are normalized
+    for the slot size (see server.images).
+
+    Args:
+        doc: The Document to fill
+        slots: The template's ImageSlots
+        images: Mapping of slot name to image bytes; slots without an image are left
+            as they are
+
+    Returns:
+        int: Number of slots filled
+    """
+    pictures = {
+        slot.name: (slot, normalize_image(images[slot.name], slot.width, slot.height))
+        for slot in slots if images.get(slot.name)
+    }
+    if not pictures:
+        return 0
+    located = _locate(doc, template_registry.derive(doc, 'image_slots', index_image_slots))
+    if located is None:
+        logger.debug("[IMAGE SLOTS] Index does not match document, re-indexing")
+        located = _locate(doc, index_image_slots(doc))
+
+    filled = 0
+    for part, element, kind, names in located:
+        names = [name for name in names if name in pictures]
+        if not names:
+            continue
+        if kind == 'token':
+            paragraph = Paragraph(element, part)
+            paragraph.clear()
+            for name in names:
+                _add_picture(paragraph.add_run(), *pictures[name])
+        else:
+            _fill_control(part, element, *pictures[names[0]])
+        filled += len(names)
+    return filled
+
+
+def fill_picture_control(doc, image, width, height=None):
+    """
+    Put `image` into the first picture content control of the main document.
+
+    Returns:
+        bool: Whether the document has a picture content control
+    """
+    index = template_registry.derive(doc, 'image_slots', index_image_slots)
+    index = [entry for entry in index if entry[0] == doc.part.partname and entry[2] == 'control']
+    located = _locate(doc, sorted(index, key=lambda entry: entry[1])[:1])
+    if located is None:
+        located = _locate(doc, [
+            entry for entry in index_image_slots(doc)
+            if entry[0] == doc.part.partname and entry[2] == 'control'
+        ][:1])
+    if not located:
+        return False
+    part, sdt, _, _ = located[0]
+    slot = ImageSlot('', width, height)
+    _fill_control(part, sdt, slot, normalize_image(image, width, height))
+    return True
+
+
+def _locate(doc, index):
+    # Elements for index entries, or None if the index was built from another layout
+    parts = {part.partname: part for part in doc.part.package.iter_parts()}
+    located = []
+    for partname, path, kind, names in index:
+        part = parts.get(partname)
+        element = resolve_path(part.element, path) if part is not None else None
+        if element is None or element.tag != (qn('w:p') if kind == 'token' else qn('w:sdt')):
+            return None
+        located.append((part, element, kind, names))
+    return located
+
+
+def _fill_control(part, sdt, slot, picture):
+    sdt_pr = sdt.find(qn('w:sdtPr'))
+    if sdt_pr is not None:
+        # Otherwise Word keeps presenting the picture as placeholder content
+        for showing in sdt_pr.findall(qn('w:showingPlcHdr')):
+            sdt_pr.remove(showing)
+    content = sdt.find(qn('w:sdtContent'))
+    for child in list(content):
+        content.remove(child)
+    parent = sdt.getparent()
+    if parent.tag == qn('w:p'):
+        # An inline control holds runs
+        r = OxmlElement('w:r')
+        content.append(r)
+        run = Run(r, Paragraph(parent, part))
+    else:
+        p = OxmlElement('w:p')
+        content.append(p)
+        run = Paragraph(p, part).add_run()
+    _add_picture(run, slot, picture)
+
+
+def _add_picture(run, slot, picture):
+    run.add_picture(io.BytesIO(picture), width=slot.width, height=slot.height)
@@ -0,0 +1,113 @@
+import io
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from docx.shared import Length
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Without Pillow images are embedded as uploaded
+    Image = ImageOps = None
+
+logger = logging.getLogger(__name__)
+
+# Resolution pictures are kept at for their printed size; 0 disables normalization
+IMAGE_DPI = int(os.environ.get('IMAGE_DPI', 200))
+JPEG_QUALITY = int(os.environ.get('IMAGE_JPEG_QUALITY', 85))
+# Images with more distinct colours than this are treated as photos and stored as JPEG
+_PHOTO_COLOURS = 4096
+_CACHE_SIZE = 64
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+if Image is None and IMAGE_DPI:
+    logger.warning("Pillow is not installed; images will be embedded unchanged")
+
+
+def normalize_image(data, width, height=None):
+    """
+    Prepare an image for a picture of `width` x `height`.
+
+    The image is turned upright according to its EXIF orientation and downsampled
+    to IMAGE_DPI at the printed size. Photos are re-encoded as JPEG and everything
+    else (line art, screenshots, transparency) as optimized PNG. EXIF and other
+    metadata are dropped; an ICC profile is kept. The output only depends on the
+    input, so an image used in several parts of a plan is stored once when they are
+    merged. Results are memoized per process by content hash.
+
+    Args:
+        data: The image as bytes or any buffer
+        width: Printed width (a docx Length, e.g. Inches(6))
+        height: Printed height, if the picture is stretched to a fixed box
+
+    Returns:
+        bytes: The normalized image, or `data` as bytes if it cannot be read or would
+        not get smaller
+    """
+    # The memo outlives the call, so it must not hold on to the caller's buffer
+    data = bytes(data)
+    if Image is None or not IMAGE_DPI:
+        return data
+    key = (hashlib.sha256(data).digest(), int(width), int(height or 0))
+    with _lock:
+        result = _cache.get(key)
+        if result is not None:
+            _cache.move_to_end(key)
+            return result
+    try:
+        result = _normalize(data, Length(width).inches, Length(height).inches if height else None)
+    except Exception as e:
+        logger.warning(f"[IMAGES] Embedding image unchanged, could not normalize it: {e}")
+        return data
+    with _lock:
+        _cache[key] = result
+        # Normalizing the result again (e.g. a part rendered from a normalized image)
+        # gives it back unchanged
+        _cache[(hashlib.sha256(result).digest(),) + key[1:]] = result
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
+
+
+def _normalize(data, width_in, height_in):
+    image = Image.open(io.BytesIO(data))
+    source_format = image.format
+    has_metadata = any(key in image.info for key in ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment'))
+    # A CMYK profile would not describe the RGB image written out
+    icc_profile = image.info.get('icc_profile') if image.mode != 'CMYK' else None
+    image = ImageOps.exif_transpose(image)
+
+    # Enough pixels on both axes for a picture stretched to its box
+    scale = width_in * IMAGE_DPI / image.width
+    if height_in:
+        scale = max(scale, height_in * IMAGE_DPI / image.height)
+    resized = scale < 1
+    if resized:
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(size, Image.LANCZOS, reducing_gap=3.0)
+
+    if image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        if image.getchannel('A').getextrema() == (255, 255):
+            image = image.convert('RGB')
+    elif image.mode not in ('1', 'L', 'P', 'RGB'):
+        image = image.convert('RGB')
+
+    photo = image.mode in ('RGB', 'L') and (
+        source_format == 'JPEG' or image.getcolors(_PHOTO_COLOURS) is None
+    )
+    output = io.BytesIO()
+    options = {'icc_profile': icc_profile} if icc_profile else {}
+    if photo:
+        image.save(output, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True, **options)
+    else:
+        image.save(output, 'PNG', optimize=True, **options)
+    result = output.getvalue()
+
+    if not resized and not has_metadata and len(result) >= len(data):
+        return data
+    logger.debug(f"[IMAGES] {len(data)} -> {len(result)} bytes ({image.width}x{image.height} {'JPEG' if photo else 'PNG'})")
+    return result
@@ -0,0 +1,211 @@
+import os
+import uuid
+import asyncio
+import logging
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+# 'process' (default), 'thread' or 'inline' (run on the event loop, as before)
+JOB_EXECUTOR = os.environ.get('JOB_EXECUTOR', 'process')
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '0')) or os.cpu_count() or 1
+# 'spawn' keeps workers independent of the server's threads; 'fork' starts faster
+JOB_START_METHOD = os.environ.get('JOB_START_METHOD', 'spawn')
+# Byte payloads at least this large travel to and from process workers through
+# shared memory instead of being pickled through the pool's pipe; 0 disables
+SHARED_MEMORY_MIN_BYTES = int(os.environ.get('SHARED_MEMORY_MIN_BYTES', 64 * 1024))
+
+
+class JobError(Exception):
+    """
+    Failure inside a job that should reach the client with a specific status code.
+
+    HTTPException cannot cross a process boundary (it does not survive pickling), so
+    jobs raise this instead and run_job turns it back into an HTTPException.
+    """
+
+    def __init__(self, status_code, detail):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class SharedBytes:
+    """
+    Picklable handle to a byte payload held in a multiprocessing.shared_memory segment.
+
+    Segments are unlinked by the server process only (see JobRunner._run_shared), so
+    a worker that dies mid-job cannot leak them.
+    """
+
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+
+
+def _segment_name():
+    # Short enough for the 31-character POSIX shm name limit on macOS
+    return f'soid_{uuid.uuid4().hex[:20]}'
+
+
+def _share(value, segments):
+    # Replace large bytes, also inside nested lists, tuples and dicts, with handles
+    if isinstance(value, (list, tuple)):
+        return type(value)(_share(item, segments) for item in value)
+    if isinstance(value, dict):
+        return {key: _share(item, segments) for key, item in value.items()}
+    if isinstance(value, (bytes, bytearray, memoryview)) and len(value) >= SHARED_MEMORY_MIN_BYTES:
+        segment = shared_memory.SharedMemory(name=_segment_name(), create=True, size=len(value))
+        segment.buf[:len(value)] = value
+        segments.append(segment)
+        return SharedBytes(segment.name, len(value))
+    return value
+
+
+def _attach(value):
+    # Worker side of _share: handles become bytes copied out of the segment, which is
+    # closed again at once, so jobs may keep, return or memoize their inputs
+    if isinstance(value, (list, tuple)):
+        return type(value)(_attach(item) for item in value)
+    if isinstance(value, dict):
+        return {key: _attach(item) for key, item in value.items()}
+    if isinstance(value, SharedBytes):
+        segment = shared_memory.SharedMemory(name=value.name)
+        try:
+            return bytes(segment.buf[:value.size])
+        finally:
+            segment.close()
+    return value
+
+
+def _run_shared(fn, args, result_name):
+    """
+    Run a job in a worker with shared-memory arguments.
+
+    A bytes result large enough is copied into a new segment named `result_name`
+    (chosen by the server, which also unlinks it) and returned as a SharedBytes handle.
+    """
+    result = fn(*_attach(args))
+    if isinstance(result, (bytes, bytearray)) and len(result) >= SHARED_MEMORY_MIN_BYTES:
+        segment = shared_memory.SharedMemory(name=result_name, create=True, size=len(result))
+        segment.buf[:len(result)] = result
+        segment.close()
+        return SharedBytes(result_name, len(result))
+    return result
+
+
+def _unlink(name):
+    try:
+        segment = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    segment.close()
+    segment.unlink()
+
+
+class JobRunner:
+    """
+    Runs CPU-bound document jobs (generation, merging, conversion) off the event loop.
+
+    Jobs are plain module-level functions taking and returning picklable values, so
+    the same job runs unchanged on a process pool, a thread pool or inline. Process
+    workers run `initializer` once at start-up, which is where templates are pre-loaded.
+    A pool whose worker died is replaced on the next job.
+
+    With a process pool, bytes arguments and results of SHARED_MEMORY_MIN_BYTES or
+    more (uploaded parts, images, generated documents) are passed through shared
+    memory segments instead of the pool's pipe. Workers copy arguments out of their
+    segment before the job runs, so in every mode jobs receive ordinary bytes.
+    """
+
+    def __init__(self, kind=JOB_EXECUTOR, workers=JOB_WORKERS, initializer=None,
+                 start_method=JOB_START_METHOD):
+        if kind not in ('process', 'thread', 'inline'):
+            raise ValueError(f"Unknown job executor: {kind}")
+        self.kind = kind
+        self.workers = workers
+        self.initializer = initializer
+        self.start_method = start_method
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._executor is None and self.kind != 'inline':
+                if self.kind == 'process':
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context(self.start_method),
+                        initializer=self.initializer,
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix='docjob'
+                    )
+                logger.debug(f"[JOBS] Started {self.kind} executor with {self.workers} workers")
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, fn, *args):
+        """
+        Run `fn(*args)` on the executor and return its result.
+
+        Raises:
+            HTTPException: For a JobError raised by the job, or 503 when a worker
+                process died while running it
+        """
+        try:
+            if self.kind == 'inline':
+                return fn(*args)
+            executor = self.start()
+            loop = asyncio.get_running_loop()
+            if self.kind != 'process' or SHARED_MEMORY_MIN_BYTES <= 0:
+                return await loop.run_in_executor(executor, fn, *args)
+            return await self._run_shared(loop, executor, fn, args)
+        except JobError as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        except BrokenProcessPool:
+            logger.error(f"[JOBS] Worker died while running {fn.__name__}, restarting pool")
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise HTTPException(status_code=503, detail="Document worker crashed, please retry")
+
+    async def _run_shared(self, loop, executor, fn, args):
+        segments = []
+        result_name = _segment_name()
+        try:
+            shared_args = _share(args, segments)
+            result = await loop.run_in_executor(executor, _run_shared, fn, shared_args, result_name)
+            if isinstance(result, SharedBytes):
+                segment = shared_memory.SharedMemory(name=result.name)
+                try:
+                    return bytes(segment.buf[:result.size])
+                finally:
+                    segment.close()
+            return result
+        finally:
+            for segment in segments:
+                segment.close()
+                segment.unlink()
+            # Also covers a worker that died after creating the result segment
+            _unlink(result_name)
+
+
+job_runner = JobRunner()
+
+
+async def run_job(fn, *args):
+    """Run a document job on the shared JobRunner."""
+    return await job_runner.run(fn, *args)
@@ -1,22 +1,43 @@
 import os
 import io
+import json
 import base64
-import tempfile
+import asyncio
+import binascii
+import zipfile
 import logging
 import traceback
-from typing import List, Dict, Any
-from fastapi import FastAPI, File, UploadFile, HTTPException, Request
+from collections import defaultdict
+from typing import List
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, FileResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from docx import Document
 from docxcompose.composer import Composer
-from docx.shared import Inches, Pt, RGBColor
+from docx.shared import Inches
 import uvicorn
-import uuid
-from server.tables import create_iii_b_docx, create_iii_a_docx, create_iiic_logframe_table
+from server.tables import (
+    create_iib_docx, create_iic_docx, create_iii_b_docx, create_iii_a_docx, create_iiic_logframe_table,
+)
 import argparse
 import mammoth
 from server.part_ib_handler import generate_part_ib_docx, process_part_ib_data
+from server.template_registry import ASSETS_DIR, open_template, template_registry
+from server.doc_styles import (
+    ensure_styles, style_run, MAMMOTH_STYLE_MAP, FOOTER_STAMP_STYLE, HEADER_STAMP_STYLE,
+    LABEL_STYLE, QUOTE_STYLE, VALUE_STYLE,
+)
+from server.doc_properties import set_document_properties, carry_document_properties
+from server.placeholders import XML_SPACE, fill_placeholders as fill_document_placeholders
+from server.compiled_templates import render_compiled_template
+from server.deterministic import ZIP_DATE_TIME, normalize_docx
+from server.image_slots import ImageSlot, ImageTemplate, fill_image_slots
+from server.jobs import JobError, job_runner, run_job
+from server.section_merge import MERGE_BACKEND, MERGE_BACKENDS, MERGE_FAN_IN, SectionMerger
+from server.merge_cache import merge_cache
+from server.response_cache import etag_matches, response_cache
+from server.single_flight import single_flight
+from server.artifact_store import ArtifactTooLarge, artifact_store, is_artifact_id
 from datetime import datetime
 
 logging.basicConfig(
@@ -33,561 +54,647 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Artifact-Id"],
 )
 
-def append_docx_with_section_break(master, doc_to_append):
-    while master.paragraphs and not master.paragraphs[-1].text.strip():
-        p = master.paragraphs[-1]._element
-        p.getparent().remove(p)
-
-    from docx.oxml import OxmlElement
-    from docx.oxml.ns import qn
-
-    p = master.paragraphs[-1]._element
-    pPr = p.get_or_add_pPr()
-    sectPr = OxmlElement('w:sectPr')
-    type_ = OxmlElement('w:type')
-    type_.set(qn('w:val'), 'nextPage')
-    sectPr.append(type_)
-    pPr.append(sectPr)
-
-    if hasattr(doc_to_append, 'part'):
-        if hasattr(doc_to_append.part, 'styles_part'):
-            if not hasattr(master.part, 'styles_part'):
-                master.part.styles_part = doc_to_append.part.styles_part
-            else:
-                for style in doc_to_append.part.styles_part.element:
-                    existing_style = master.part.styles_part.element.find(
-                        f'.//w:style[@w:styleId="{style.get(qn("w:styleId"))}"]',
-                        {'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'}
-                    )
-                    if existing_style is None:
-                        master.part.styles_part.element.append(style)
-
-        if hasattr(doc_to_append.part, 'numbering_part'):
-            if not hasattr(master.part, 'numbering_part'):
-                master.part.numbering_part = doc_to_append.part.numbering_part
-            else:
-                for num in doc_to_append.part.numbering_part.element:
-                    master.part.numbering_part.element.append(num)
-
-    for element in doc_to_append.element.body:
-        master.element.body.append(element)
-
-    for paragraph in master.paragraphs:
-        if hasattr(paragraph, '_element'):
-            p = paragraph._element
-            if hasattr(paragraph, 'style') and paragraph.style:
-                pPr = p.get_or_add_pPr()
-                pStyle = OxmlElement('w:pStyle')
-                pStyle.set(qn('w:val'), paragraph.style.name)
-                pPr.append(pStyle)
-
-def insert_bullet_list_at_placeholder(doc_path, output_path, placeholder, items):
-    from docx import Document
-    doc = Document(doc_path)
-    for para in doc.paragraphs:
-        if placeholder in para.text:
-            parent = para._element.getparent()
-            idx = list(parent).index(para._element)
-            p = para._element
-            p.getparent().remove(p)
-            for item in items:
-                new_para = doc.add_paragraph(item, style='List Bullet')
-                parent.insert(idx, new_para._element)
-                idx += 1
-            break
-    doc.save(output_path)
+DOCX_MEDIA_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
 
-async def generate_docx_II_a(template_file, images):
-    try:
-        doc = Document(template_file)
-        sorted_images = sorted(images, key=lambda x: x.filename)
-        image_map = {
-            'ISI': None,
-            'ISII': None,
-            'ISIII': None,
-        }
-        
-        for i, img in enumerate(sorted_images):
-            if i == 0:
-                image_map['ISI'] = img
-            elif i == 1:
-                image_map['ISII'] = img
-            elif i == 2:
-                image_map['ISIII'] = img
-        
-        for paragraph in doc.paragraphs:
-            if '{ISI}' in paragraph.text:
-                if image_map['ISI']:
-                    img_content = await image_map['ISI'].read()
-                    img_stream = io.BytesIO(img_content)
-                    paragraph.clear()
-                    run = paragraph.add_run()
-                    run.add_picture(img_stream, width=Inches(8.52), height=Inches(5.69))
-            elif '{ISII}' in paragraph.text:
-                if image_map['ISII']:
-                    img_content = await image_map['ISII'].read()
-                    img_stream = io.BytesIO(img_content)
-                    paragraph.clear()
-                    run = paragraph.add_run()
-                    run.add_picture(img_stream, width=Inches(8.52), height=Inches(5.69))
-            elif '{ISIII}' in paragraph.text:
-                if image_map['ISIII']:
-                    img_content = await image_map['ISIII'].read()
-                    img_stream = io.BytesIO(img_content)
-                    paragraph.clear()
-                    run = paragraph.add_run()
-                    run.add_picture(img_stream, width=Inches(8.52), height=Inches(5.69))
-        
-        docx_bytes = io.BytesIO()
-        doc.save(docx_bytes)
-        docx_bytes.seek(0)
-        
-        return docx_bytes.getvalue()
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to generate Part II.A document: {str(e)}")
+def docx_response(docx_bytes, filename=None, disposition=None, etag=None):
+    """
+    Stream a generated .docx from memory.
+
+    Args:
+        docx_bytes: The document
+        filename: Optional download name, sent as an attachment
+        disposition: Optional Content-Disposition value overriding `filename`
+        etag: Optional ETag; clients are asked to revalidate with it before reuse
+    """
+    headers = {}
+    if etag is not None:
+        headers['ETag'] = etag
+        headers['Cache-Control'] = 'no-cache'
+    if disposition is not None:
+        headers['Content-Disposition'] = disposition
+    elif filename is not None:
+        headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return StreamingResponse(io.BytesIO(docx_bytes), media_type=DOCX_MEDIA_TYPE, headers=headers)
+
+class _ChunkSink:
+    # Write-only file object that hands its contents over in chunks
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
 
-async def generate_docx_II_d(template_file, images):
+def iter_zip(entries):
+    """
+    Yield an uncompressed zip archive of (name, bytes) entries chunk by chunk.
+
+    .docx files are already deflated, so entries are stored as-is and each one is
+    handed to the client as soon as it is written.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_STORED) as zf:
+        for name, data in entries:
+            zf.writestr(zipfile.ZipInfo(name, date_time=ZIP_DATE_TIME), data)
+            yield sink.drain()
+    yield sink.drain()
+
+# Per-endpoint counts of cached responses: every request, and those answered with a
+# 304 or from the response cache; the rest show up in single_flight's counts
+response_stats = defaultdict(lambda: {'requests': 0, 'not_modified': 0, 'cache_hits': 0})
+
+async def run_cached_job(cache, key, fn, *args):
+    result = await run_job(fn, *args)
+    cache.put(key, result)
+    return result
+
+def store_requested(request):
+    """Whether the request asks for its document to be kept in the artifact store (?store=1)."""
+    return request.query_params.get('store', '').lower() in ('1', 'true', 'yes')
+
+async def store_artifact(data, year_range=None, part=None):
+    """Put `data` in the artifact store off the event loop and return its ID."""
     try:
-        doc = Document(r'C:/Users/User/Documents/SOIDProject/assets/II_d.docx')
-        sorted_images = sorted(images, key=lambda x: x.filename)
-        image_map = {
-            'NLC': None,
-            'PNL': None,
-        }
-        
-        for i, img in enumerate(sorted_images):
-            if i == 0:
-                image_map['NLC'] = img
-            elif i == 1:
-                image_map['PNL'] = img
-        
-        for paragraph in doc.paragraphs:
-            if '{NLC}' in paragraph.text:
-                if image_map['NLC']:
-                    img_content = await image_map['NLC'].read()
-                    img_stream = io.BytesIO(img_content)
-                    paragraph.clear()
-                    run = paragraph.add_run()
-                    run.add_picture(img_stream, width=Inches(6))
-            elif '{PNL}' in paragraph.text:
-                if image_map['PNL']:
-                    img_content = await image_map['PNL'].read()
-                    img_stream = io.BytesIO(img_content)
-                    paragraph.clear()
-                    run = paragraph.add_run()
-                    run.add_picture(img_stream, width=Inches(6))
-        
-        docx_bytes = io.BytesIO()
-        doc.save(docx_bytes)
-        docx_bytes.seek(0)
-        
-        return docx_bytes.getvalue()
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to generate Part II.D document: {str(e)}")
+        return await asyncio.to_thread(artifact_store.put, data, year_range or None, part)
+    except ArtifactTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def cached_docx_response(
+    request, templates, fn, *args, filename=None, disposition=None, part=None, year_range='',
+):
+    """
+    Respond with the document `fn(*args)` generates, through the response cache.
+
+    The cache key covers the endpoint, the job's arguments and the current version of
+    each of `templates`, and is sent as the ETag. A request whose If-None-Match
+    carries it gets a 304 before any document work; a cached document is returned
+    without running the job, and concurrent identical requests share one job.
+
+    With ?store=1 the document is also kept in the artifact store, as `part` of
+    `year_range` when both are known, and its ID is sent as X-Artifact-Id.
+
+    Args:
+        request: The incoming Request
+        templates: Paths of the registry templates the job reads
+        fn, args: The document job and its arguments
+        filename, disposition: See docx_response
+        part: Plan part key the document is stored under (see PLAN_GROUPS)
+        year_range: Plan the document belongs to
+    """
+    key = response_cache.key(
+        request.url.path,
+        [template_registry.version(template) for template in templates],
+        [fn, list(args)],
+    )
+    etag = f'"{key}"'
+    store = store_requested(request)
+    stats = response_stats[request.url.path]
+    stats['requests'] += 1
+    not_modified = etag_matches(request.headers.get('if-none-match'), etag)
+    if not_modified and not store:
+        stats['not_modified'] += 1
+        logger.debug(f"[CACHE] {request.url.path} not modified")
+        return Response(status_code=304, headers={'ETag': etag, 'Cache-Control': 'no-cache'})
+    docx_bytes = response_cache.get(key)
+    if docx_bytes is None:
+        docx_bytes = await single_flight.run(
+            request.url.path, key, lambda: run_cached_job(response_cache, key, fn, *args)
+        )
+    else:
+        stats['cache_hits'] += 1
+        logger.debug(f"[CACHE] {request.url.path} served from cache")
+    if not store:
+        return docx_response(docx_bytes, filename=filename, disposition=disposition, etag=etag)
+    artifact_id = await store_artifact(docx_bytes, year_range, part)
+    if not_modified:
+        stats['not_modified'] += 1
+        return Response(status_code=304, headers={
+            'ETag': etag, 'Cache-Control': 'no-cache', 'X-Artifact-Id': artifact_id,
+        })
+    response = docx_response(docx_bytes, filename=filename, disposition=disposition, etag=etag)
+    response.headers['X-Artifact-Id'] = artifact_id
+    return response
+
+PART_IVB_TEMPLATE = os.path.join(ASSETS_DIR, 'IV_b.docx')
 
-async def generate_docx_IV_b(template_file, images):
+# Templates filled with uploaded images; adding one only takes an entry here
+IMAGE_TEMPLATES = {
+    'II_a.docx': ImageTemplate('II.A', (
+        ImageSlot('ISI', Inches(8.52), Inches(5.69)),
+        ImageSlot('ISII', Inches(8.52), Inches(5.69)),
+        ImageSlot('ISIII', Inches(8.52), Inches(5.69)),
+    )),
+    'II_d.docx': ImageTemplate('II.D', (
+        ImageSlot('NLC', Inches(6)),
+        ImageSlot('PNL', Inches(6)),
+    )),
+    'IV_b.docx': ImageTemplate('IV.B', (
+        ImageSlot('Existing', Inches(6)),
+        ImageSlot('Proposed', Inches(6)),
+        ImageSlot('Placement', Inches(6)),
+    ), year_range=True),
+}
+
+def generate_image_docx(template_name, template_bytes, images, year_range):
+    """
+    Fill image template `template_name`, a key of IMAGE_TEMPLATES.
+
+    Args:
+        template_bytes: A custom template to fill instead of the server's copy, or None
+        images: The images, in slot order
+        year_range: Stamped into templates that take it
+    """
+    template = IMAGE_TEMPLATES[template_name]
     try:
-        doc = Document(template_file)
-        sorted_images = sorted(images, key=lambda x: x.filename)
-        image_map = {
-            'Existing': None,
-            'Proposed': None,
-            'Placement': None,
-        }
-        
-        for i, img in enumerate(sorted_images):
-            if i == 0:
-                image_map['Existing'] = img
-            elif i == 1:
-                image_map['Proposed'] = img
-            elif i == 2:
-                image_map['Placement'] = img
-        
-        for paragraph in doc.paragraphs:
-            if '{Existing}' in paragraph.text:
-                if image_map['Existing']:
-                    img_content = await image_map['Existing'].read()
-                    img_stream = io.BytesIO(img_content)
-                    paragraph.clear()
-                    run = paragraph.add_run()
-                    run.add_picture(img_stream, width=Inches(6))
-            elif '{Proposed}' in paragraph.text:
-                if image_map['Proposed']:
-                    img_content = await image_map['Proposed'].read()
-                    img_stream = io.BytesIO(img_content)
-                    paragraph.clear()
-                    run = paragraph.add_run()
-                    run.add_picture(img_stream, width=Inches(6))
-            elif '{Placement}' in paragraph.text:
-                if image_map['Placement']:
-                    img_content = await image_map['Placement'].read()
-                    img_stream = io.BytesIO(img_content)
-                    paragraph.clear()
-                    run = paragraph.add_run()
-                    run.add_picture(img_stream, width=Inches(6))
-        
+        if template_bytes is None:
+            doc = open_year_range_template(
+                os.path.join(ASSETS_DIR, template_name), year_range if template.year_range else ''
+            )
+        else:
+            doc = template_registry.open_bytes(template_bytes)
+            if template.year_range and year_range:
+                fill_placeholders(doc, {"${yearRange}": year_range})
+        fill_image_slots(doc, template.slots, {slot.name: image for slot, image in zip(template.slots, images)})
         docx_bytes = io.BytesIO()
         doc.save(docx_bytes)
-        docx_bytes.seek(0)
-        
-        return docx_bytes.getvalue()
+        return normalize_docx(docx_bytes.getvalue())
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to generate Part IV.B document: {str(e)}")
+        raise JobError(500, f"Failed to generate Part {template.label} document: {str(e)}")
+
+def image_template_name(name):
+    """The IMAGE_TEMPLATES key `name` (a template ID or uploaded file name) refers to."""
+    for template_name in IMAGE_TEMPLATES:
+        if template_name in name:
+            return template_name
+    return None
+
+def image_template_part(template_name):
+    for key, template in PLAN_IMAGE_PARTS.items():
+        if template == template_name:
+            return key
+    return None
+
+def slot_ordered_uploads(slots, images):
+    """
+    Uploaded images in slot order: by file name when each one is named after its
+    slot (e.g. existing.png), otherwise in file name order.
+    """
+    by_stem = {os.path.splitext(image.filename or '')[0].lower(): image for image in images}
+    names = [slot.name.lower() for slot in slots]
+    if sorted(by_stem) == sorted(names):
+        return [by_stem[name] for name in names]
+    return sorted(images, key=lambda x: x.filename)
 
 @app.post("/generate-docx")
 async def generate_docx(
-    template: UploadFile = File(...),
-    images: List[UploadFile] = File(...),
+    template_id: str = Form(None, alias='templateId'),
+    template: UploadFile = File(None),
+    custom_template: bool = Form(False, alias='customTemplate'),
+    images: List[UploadFile] = File(None),
+    template_artifact: str = Form(None, alias='templateArtifact'),
+    template_name: str = Form(None, alias='templateName'),
+    image_artifacts: List[str] = Form(None, alias='imageArtifacts'),
     request: Request = None,
 ):
-    template_file = None
+    """
+    Fill an image template (II_a.docx, II_d.docx or IV_b.docx) with its images.
+
+    `templateId` names the template, which is taken from the server's template
+    registry. A custom template is an explicit opt-in: upload it as `template` with
+    customTemplate=true, or give a stored artifact ID in `templateArtifact`. Without
+    customTemplate an uploaded `template` only names the template by its filename.
+    Images are uploaded as `images` (placed in filename order) or given as artifact
+    IDs in `imageArtifacts` (placed in the order given).
+    """
     try:
-        if not template.filename:
-            raise HTTPException(status_code=400, detail="Template filename is required")
+        template_name = template_id or template_name or (template.filename if template is not None else None)
+        if not template_name:
+            raise HTTPException(status_code=400, detail="templateId is required")
         
         # Get yearRange from headers
         year_range = request.headers.get('yearrange', '') if request else ''
         logger.debug(f"[GENERATE DOCX] Received yearRange: '{year_range}'")
         
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        template_file = f"temp_template_{timestamp}.docx"
-        
-        try:
-            with open(template_file, "wb") as f:
-                f.write(await template.read())
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to save template file: {str(e)}")
+        template_bytes = None
+        if template_artifact:
+            template_bytes = (await load_artifacts([template_artifact]))[0]
+        elif template is not None and custom_template:
+            try:
+                template_bytes = await template.read()
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Failed to read template file: {str(e)}")
         
-        if not images:
+        if not images and not image_artifacts:
             raise HTTPException(status_code=400, detail="At least one image is required")
+        if images and image_artifacts:
+            raise HTTPException(status_code=400, detail="Send either images or imageArtifacts")
+        image_count = len(images or image_artifacts)
         
         try:
-            if "II_a.docx" in template.filename:
-                if len(images) != 3:
-                    raise HTTPException(status_code=400, detail="Part II.A requires exactly 3 images")
-                docx_bytes = await generate_docx_II_a(template_file, images)
-            elif "II_d.docx" in template.filename:
-                if len(images) != 2:
-                    raise HTTPException(status_code=400, detail="Part II.D requires exactly 2 images")
-                docx_bytes = await generate_docx_II_d(template_file, images)
-            elif "IV_b.docx" in template.filename:
-                if len(images) != 3:
-                    raise HTTPException(status_code=400, detail="Part IV.B requires exactly 3 images")
-                # Apply yearRange replacements for IV.B if provided
-                if year_range:
-                    temp_template_with_year = f"temp_iv_b_with_year_{timestamp}.docx"
-                    template_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'assets', 'IV_b.docx')
-                    replacements = {"${yearRange}": year_range}
-                    fill_placeholders_and_bullets(template_path, temp_template_with_year, replacements)
-                    template_file = temp_template_with_year
-                docx_bytes = await generate_docx_IV_b(template_file, images)
+            template_id = image_template_name(template_name)
+            if template_id is None:
+                raise HTTPException(status_code=400, detail=f"Invalid template file: {template_name}")
+            template = IMAGE_TEMPLATES[template_id]
+            if image_count != len(template.slots):
+                raise HTTPException(
+                    status_code=400, detail=f"Part {template.label} requires exactly {len(template.slots)} images"
+                )
+            if image_artifacts:
+                image_blobs = await load_artifacts(image_artifacts)
             else:
-                raise HTTPException(status_code=400, detail=f"Invalid template file: {template.filename}")
+                image_blobs = await asyncio.gather(*(
+                    image.read() for image in slot_ordered_uploads(template.slots, images)
+                ))
+            is_iv_b = template_id == 'IV_b.docx'
+            return await cached_docx_response(
+                request,
+                [os.path.join(ASSETS_DIR, template_id)] if template_bytes is None else [],
+                generate_image_docx, template_id, template_bytes, image_blobs, year_range,
+                filename="document.docx" if is_iv_b else None,
+                part=image_template_part(template_id), year_range=year_range,
+            )
         except HTTPException:
             raise
         except Exception as e:
             print("Exception in /generate-docx:", e)
             traceback.print_exc()
             raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
-        
-        if "IV_b.docx" in template.filename:
-            return StreamingResponse(
-                io.BytesIO(docx_bytes),
-                media_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-                headers={'Content-Disposition': 'attachment; filename="document.docx"'}
-            )
-        else:
-            return StreamingResponse(
-                io.BytesIO(docx_bytes),
-                media_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-            )
     except HTTPException:
         raise
     except Exception as e:
         print("Exception in /generate-docx:", e)
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
-    finally:
-        if template_file and os.path.exists(template_file):
-            try:
-                os.remove(template_file)
-            except Exception as e:
-                print(f"Warning: Failed to remove temporary file {template_file}: {str(e)}")
-
-@app.post("/merge-documents-part-i-all")
-async def merge_documents_part_i_all(
-    part_ia: UploadFile = File(...),
-    part_ib: UploadFile = File(...),
-    part_ic: UploadFile = File(...),
-    part_id: UploadFile = File(...),
-    part_ie: UploadFile = File(...),
-):
-    try:
-        try:
-            ia_bytes = io.BytesIO(await part_ia.read())
-            ib_bytes = io.BytesIO(await part_ib.read())
-            ic_bytes = io.BytesIO(await part_ic.read())
-            id_bytes = io.BytesIO(await part_id.read())
-            ie_bytes = io.BytesIO(await part_ie.read())
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Failed to read uploaded files: {str(e)}")
 
-        try:
-            ia_doc = Document(ia_bytes)
-            ib_doc = Document(ib_bytes)
-            ic_doc = Document(ic_bytes)
-            id_doc = Document(id_bytes)
-            ie_doc = Document(ie_bytes)
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Failed to parse DOCX files: {str(e)}")
+def merge_documents(blobs, backend=MERGE_BACKEND):
+    """
+    Merge .docx files in order.
 
-        def add_page_break(doc):
-            try:
-                p = doc.add_paragraph()
-                run = p.add_run()
-                run.add_break()
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"Failed to add page break: {str(e)}")
+    Args:
+        blobs: The .docx files as bytes
+        backend: 'composer' appends with docxcompose, with a page break after every
+            part but the last; 'section' uses SectionMerger, which starts each part in
+            a new section that keeps its own page setup, headers and footers
 
-        try:
-            add_page_break(ia_doc)
-            add_page_break(ib_doc)
-            add_page_break(ic_doc)
-            add_page_break(id_doc)
-        except HTTPException:
-            raise
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to add page breaks: {str(e)}")
+    Returns:
+        bytes: The merged .docx file
+    """
+    try:
+        docs = [Document(io.BytesIO(blob)) for blob in blobs]
+    except Exception as e:
+        raise JobError(400, f"Failed to parse DOCX files: {str(e)}")
 
+    if backend == 'section':
         try:
-            composer = Composer(ia_doc)
-            composer.append(ib_doc)
-            composer.append(ic_doc)
-            composer.append(id_doc)
-            composer.append(ie_doc)
+            merger = SectionMerger(docs[0])
+            for doc in docs[1:]:
+                merger.append(doc)
+            carry_document_properties(docs[0], docs[1:])
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to merge documents: {str(e)}")
-
+            raise JobError(500, f"Failed to merge documents: {str(e)}")
         try:
             output = io.BytesIO()
-            composer.save(output)
-            output.seek(0)
+            merger.save(output)
+            return normalize_docx(output.getvalue())
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to save merged document: {str(e)}")
+            raise JobError(500, f"Failed to save merged document: {str(e)}")
 
-        return StreamingResponse(
-            output,
-            media_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-        )
-    except HTTPException:
-        raise
+    try:
+        for doc in docs[:-1]:
+            p = doc.add_paragraph()
+            run = p.add_run()
+            run.add_break()
     except Exception as e:
-        print(f"Unexpected error in merge_documents_part_i_all: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+        raise JobError(500, f"Failed to add page breaks: {str(e)}")
 
-@app.post("/merge-documents-part-ii")
-async def merge_documents_part_ii(
-    part_ii_a: UploadFile = File(...),
-    part_ii_b: UploadFile = File(...),
-    part_ii_c: UploadFile = File(...),
-    part_ii_d: UploadFile = File(...),
-):
     try:
-        try:
-            ii_a_bytes = io.BytesIO(await part_ii_a.read())
-            ii_b_bytes = io.BytesIO(await part_ii_b.read())
-            ii_c_bytes = io.BytesIO(await part_ii_c.read())
-            ii_d_bytes = io.BytesIO(await part_ii_d.read())
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Failed to read uploaded files: {str(e)}")
-
-        try:
-            ii_a_doc = Document(ii_a_bytes)
-            ii_b_doc = Document(ii_b_bytes)
-            ii_c_doc = Document(ii_c_bytes)
-            ii_d_doc = Document(ii_d_bytes)
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Failed to parse DOCX files: {str(e)}")
+        composer = Composer(docs[0])
+        for doc in docs[1:]:
+            composer.append(doc)
+        carry_document_properties(composer.doc, docs[1:])
+    except Exception as e:
+        raise JobError(500, f"Failed to merge documents: {str(e)}")
 
-        def add_page_break(doc):
-            try:
-                p = doc.add_paragraph()
-                run = p.add_run()
-                run.add_break()
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"Failed to add page break: {str(e)}")
+    try:
+        output = io.BytesIO()
+        composer.save(output)
+        return normalize_docx(output.getvalue())
+    except Exception as e:
+        raise JobError(500, f"Failed to save merged document: {str(e)}")
 
-        try:
-            add_page_break(ii_a_doc)
-            add_page_break(ii_b_doc)
-            add_page_break(ii_c_doc)
-        except HTTPException:
-            raise
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to add page breaks: {str(e)}")
+def leaf_nodes(blobs):
+    return [(merge_cache.digest(blob), blob) for blob in blobs]
 
-        try:
-            composer = Composer(ii_a_doc)
-            composer.append(ii_b_doc)
-            composer.append(ii_c_doc)
-            composer.append(ii_d_doc)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to merge documents: {str(e)}")
-        
-        try:
-            output = io.BytesIO()
-            composer.save(output)
-            output.seek(0)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to save merged document: {str(e)}")
+async def merge_group(nodes, backend, label='merge'):
+    """
+    Merge tree nodes, each an (ID, bytes) pair, into one node.
 
-        return StreamingResponse(
-            output,
-            media_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+    A document's ID is its SHA-256 and a merged node's ID is its merge_cache key, so
+    the result is cached under the content of every document it covers and the shape
+    of the tree that combined them. A later merge of the same subtree reuses it
+    without a job; identical merges already running are joined rather than repeated.
+    """
+    if len(nodes) == 1:
+        return nodes[0]
+    key = merge_cache.key(backend, [node_id for node_id, _ in nodes])
+    merged = merge_cache.get(key)
+    if merged is None:
+        blobs = [blob for _, blob in nodes]
+        merged = await single_flight.run(
+            label, key, lambda: run_cached_job(merge_cache, key, merge_documents, blobs, backend)
         )
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"Unexpected error in merge_documents_part_ii: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+    else:
+        logger.debug(f"[MERGE] Reusing merge of {len(nodes)} nodes")
+    return key, merged
 
-@app.post("/merge-documents-part-iii")
-async def merge_documents_part_iii(
-    part_iii_a: UploadFile = File(...),
-    part_iii_b: UploadFile = File(...),
-    part_iii_c: UploadFile = File(...),
-):
-    try:
-        try:
-            iii_a_bytes = io.BytesIO(await part_iii_a.read())
-            iii_b_bytes = io.BytesIO(await part_iii_b.read())
-            iii_c_bytes = io.BytesIO(await part_iii_c.read())
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Failed to read uploaded files: {str(e)}")
+async def merge_tree(blobs, backend=MERGE_BACKEND, fan_in=MERGE_FAN_IN, label='merge'):
+    """
+    Merge .docx files in order as a tree of merge jobs.
 
-        try:
-            iii_a_doc = Document(iii_a_bytes)
-            iii_b_doc = Document(iii_b_bytes)
-            iii_c_doc = Document(iii_c_bytes)
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Failed to parse DOCX files: {str(e)}")
+    Runs of `fan_in` adjacent documents are merged concurrently on the job runner, then
+    runs of those results, and so on until one document is left. Adjacent merges keep
+    part order and each level adds the same breaks a single merge would.
 
-        def add_page_break(doc):
-            try:
-                p = doc.add_paragraph()
-                run = p.add_run()
-                run.add_break()
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"Failed to add page break: {str(e)}")
+    Every node of the tree is cached by the content hashes of the documents below it
+    and the shape of its subtree, which depends only on the number of documents and
+    `fan_in`. When one document changes, only the nodes on its path to the root are
+    merged again.
 
-        try:
-            add_page_break(iii_a_doc)
-            add_page_break(iii_b_doc)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to add page breaks: {str(e)}")
+    Args:
+        blobs: The .docx files as bytes
+        backend: See merge_documents
+        fan_in: Documents per merge job
+        label: Name merges are counted under in /metrics
 
-        try:
-            composer = Composer(iii_a_doc)
-            composer.append(iii_b_doc)
-            composer.append(iii_c_doc)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to merge documents: {str(e)}")
+    Returns:
+        bytes: The merged .docx file
+    """
+    return (await reduce_nodes(leaf_nodes(blobs), backend, fan_in, label))[1]
 
-        try:
-            output = io.BytesIO()
-            composer.save(output)
-            output.seek(0)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to save merged document: {str(e)}")
+async def reduce_nodes(nodes, backend=MERGE_BACKEND, fan_in=MERGE_FAN_IN, label='merge'):
+    """merge_tree over (ID, bytes) nodes; returns the root node."""
+    if not merge_cache.enabled and (job_runner.kind == 'inline' or job_runner.workers < 2):
+        # Without concurrent workers or cached nodes a tree would only add re-parsing
+        return await merge_group(nodes, backend, label)
+    level = 0
+    while len(nodes) > 1:
+        groups = [nodes[i:i + fan_in] for i in range(0, len(nodes), fan_in)]
+        nodes = await asyncio.gather(*(merge_group(group, backend, label) for group in groups))
+        level += 1
+        logger.debug(f"[MERGE] Level {level}: {len(groups)} merges")
+    return nodes[0]
 
-        return StreamingResponse(
-            output,
-            media_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-        )
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"Unexpected error in merge_documents_part_iii: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
-    
-@app.post("/merge-documents-part-iv")
-async def merge_documents_part_iv(
-    part_iv_a: UploadFile = File(...),
-    part_iv_b: UploadFile = File(...),
-):
+async def load_artifacts(artifact_ids):
+    """
+    Read stored artifacts, in order.
+
+    Raises:
+        HTTPException: 404 naming any IDs that are unknown or expired
+    """
+    blobs = await asyncio.to_thread(lambda: [artifact_store.get(artifact_id) for artifact_id in artifact_ids])
+    missing = [artifact_id for artifact_id, blob in zip(artifact_ids, blobs) if blob is None]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired artifacts: {missing}")
+    return blobs
+
+async def artifact_nodes(artifact_ids):
+    """
+    Merge tree leaves for stored artifacts.
+
+    An artifact ID is the SHA-256 of its bytes, the same digest merge_cache keys on,
+    so stored parts go into the tree without being hashed again.
+    """
+    blobs = await load_artifacts(artifact_ids)
+    return [(artifact_id, blob) for artifact_id, blob in zip(artifact_ids, blobs)]
+
+async def stored_part_ids(year_range, parts):
+    """
+    Map each of `parts` to the ID of the artifact last stored for it in `year_range`;
+    parts with nothing stored are left out.
+
+    Raises:
+        HTTPException: 400 for an invalid yearRange or part name
+    """
+    unknown = [part for part in parts if part not in PLAN_PARTS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown plan parts: {unknown}")
     try:
-        try:
-            iv_a_bytes = io.BytesIO(await part_iv_a.read())
-            iv_b_bytes = io.BytesIO(await part_iv_b.read())
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Failed to read uploaded files: {str(e)}")
+        ids = await asyncio.to_thread(lambda: [artifact_store.resolve(year_range, part) for part in parts])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {part: artifact_id for part, artifact_id in zip(parts, ids) if artifact_id is not None}
 
-        try:
-            iv_a_doc = Document(iv_a_bytes)
-            iv_b_doc = Document(iv_b_bytes)
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Failed to parse DOCX files: {str(e)}")
+async def merged_response(request, output, filename):
+    """docx_response for a merge, also stored as an artifact with ?store=1."""
+    response = docx_response(output, filename=filename)
+    if store_requested(request):
+        response.headers['X-Artifact-Id'] = await store_artifact(output)
+    return response
+
+@app.post("/merge-documents")
+async def merge_documents_endpoint(
+    request: Request,
+    files: List[UploadFile] = File(None),
+    artifacts: List[str] = Form(None),
+    year_range: str = Form(None, alias='yearRange'),
+    parts: List[str] = Form(None),
+    backend: str = MERGE_BACKEND,
+):
+    """
+    Merge any number of .docx files, in order.
+
+    The documents come from one of:
+        files: Uploads, repeated under the 'files' form field
+        artifacts: IDs from the artifact store, repeated under 'artifacts'
+        yearRange and parts: The artifacts last stored for these plan parts
+            ('ia', 'iib', ...), repeated under 'parts'
 
-        def add_page_break(doc):
+    Args:
+        backend: 'composer' or 'section', see merge_documents
+    """
+    if backend not in MERGE_BACKENDS:
+        raise HTTPException(status_code=400, detail=f"Unknown merge backend: {backend}")
+    if sum(1 for source in (files, artifacts, parts) if source) > 1:
+        raise HTTPException(status_code=400, detail="Send either files, artifacts, or yearRange and parts")
+    try:
+        if artifacts:
+            nodes = await artifact_nodes(artifacts)
+        elif parts:
+            if not year_range:
+                raise HTTPException(status_code=400, detail="yearRange is required with parts")
+            stored = await stored_part_ids(year_range, parts)
+            missing = [part for part in parts if part not in stored]
+            if missing:
+                raise HTTPException(status_code=404, detail=f"No stored document for parts {missing} of {year_range}")
+            nodes = await artifact_nodes([stored[part] for part in parts])
+        else:
             try:
-                p = doc.add_paragraph()
-                run = p.add_run()
-                run.add_break()
+                nodes = leaf_nodes([await file.read() for file in files or []])
             except Exception as e:
-                raise HTTPException(status_code=500, detail=f"Failed to add page break: {str(e)}")
+                raise HTTPException(status_code=400, detail=f"Failed to read uploaded files: {str(e)}")
+        if not nodes:
+            raise HTTPException(status_code=400, detail="No files provided")
 
-        try:
-            add_page_break(iv_a_doc)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to add page breaks: {str(e)}")
+        _, output = await reduce_nodes(nodes, backend, label='/merge-documents')
 
-        try:
-            composer = Composer(iv_a_doc)
-            composer.append(iv_b_doc)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to merge documents: {str(e)}")
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        return await merged_response(request, output, f"merged_document_{timestamp}.docx")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in merge_documents_endpoint: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-        try:
-            output = io.BytesIO()
-            composer.save(output)
-            output.seek(0)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to save merged document: {str(e)}")
+@app.post("/compile-plan")
+async def compile_plan(
+    request: Request,
+    part_i: List[UploadFile] = File(None),
+    part_ii: List[UploadFile] = File(None),
+    part_iii: List[UploadFile] = File(None),
+    part_iv: List[UploadFile] = File(None),
+    year_range: str = Form(None, alias='yearRange'),
+    backend: str = MERGE_BACKEND,
+):
+    """
+    Compile the full plan: merge each Part I-IV group, then chain the merged groups.
 
-        return StreamingResponse(
-            output,
-            media_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-        )
+    Each field repeats the part's documents in order (part_i: I.A ... I.E and so on).
+    With yearRange, a group that is not uploaded is made of the parts stored for that
+    plan in the artifact store; absent groups are skipped. Group merges and the final
+    merge are keyed by the content of the individual documents, so recompiling after
+    editing one part only re-merges that part's path through its group and the final
+    chain.
+    """
+    if backend not in MERGE_BACKENDS:
+        raise HTTPException(status_code=400, detail=f"Unknown merge backend: {backend}")
+    try:
+        uploads = {'part_i': part_i, 'part_ii': part_ii, 'part_iii': part_iii, 'part_iv': part_iv}
+        groups = []
+        for name, keys in PLAN_GROUPS:
+            if uploads[name]:
+                try:
+                    groups.append(leaf_nodes([await file.read() for file in uploads[name]]))
+                except Exception as e:
+                    raise HTTPException(status_code=400, detail=f"Failed to read uploaded files: {str(e)}")
+            elif year_range:
+                stored = await stored_part_ids(year_range, keys)
+                if stored:
+                    groups.append(await artifact_nodes([stored[key] for key in keys if key in stored]))
+        if not groups:
+            raise HTTPException(status_code=400, detail="No files provided")
+
+        merged = await asyncio.gather(*(reduce_nodes(group, backend, label='/compile-plan') for group in groups))
+        _, output = await reduce_nodes(list(merged), backend, label='/compile-plan')
+
+        return await merged_response(request, output, "plan.docx")
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Unexpected error in merge_documents_part_iv: {str(e)}")
+        logger.error(f"Unexpected error in compile_plan: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
-    
+
+@app.post("/artifacts")
+async def create_artifact(
+    file: UploadFile = File(...),
+    year_range: str = Form(None, alias='yearRange'),
+    part: str = Form(None),
+):
+    """
+    Store an uploaded .docx, e.g. a part that is not generated on the server, for
+    later merges. With yearRange and part it is also stored as that plan part.
+    """
+    if part is not None and part not in PLAN_PARTS:
+        raise HTTPException(status_code=400, detail=f"Unknown plan part: {part}")
+    if file.size is not None and file.size > artifact_store.max_object_bytes:
+        raise HTTPException(status_code=413, detail=f"Artifacts are limited to {artifact_store.max_object_bytes} bytes")
+    data = await file.read()
+    if not zipfile.is_zipfile(io.BytesIO(data)):
+        raise HTTPException(status_code=400, detail="Not a DOCX file")
+    return {"id": await store_artifact(data, year_range, part)}
+
+@app.post("/artifacts/missing")
+async def missing_artifacts(request: Request):
+    """
+    First step of an upload: the client sends {"ids": [<sha256>, ...]} for the
+    documents and images it is about to refer to, and gets back {"missing": [...]},
+    the ones to PUT before the request. The rest are kept from expiring meanwhile.
+    """
+    try:
+        data = await request.json()
+        artifact_ids = data['ids']
+    except Exception:
+        raise HTTPException(status_code=400, detail='Expected {"ids": [...]}')
+    if not isinstance(artifact_ids, list) or not all(is_artifact_id(artifact_id) for artifact_id in artifact_ids):
+        raise HTTPException(status_code=400, detail="IDs must be lowercase hex SHA-256 digests")
+    return {"missing": await asyncio.to_thread(artifact_store.missing, artifact_ids)}
+
+async def read_limited_body(request, limit):
+    """
+    Read the request body, refusing with 413 as soon as it is known to exceed `limit`
+    bytes rather than buffering all of it.
+    """
+    too_large = HTTPException(status_code=413, detail=f"Artifacts are limited to {limit} bytes")
+    content_length = request.headers.get('content-length', '')
+    if content_length.isdigit() and int(content_length) > limit:
+        raise too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            raise too_large
+    return bytes(body)
+
+@app.put("/artifacts/{artifact_id}")
+async def put_artifact(artifact_id: str, request: Request):
+    """Store the raw request body under its SHA-256, which must equal `artifact_id`."""
+    if not is_artifact_id(artifact_id):
+        raise HTTPException(status_code=400, detail="IDs must be lowercase hex SHA-256 digests")
+    data = await read_limited_body(request, artifact_store.max_object_bytes)
+    if merge_cache.digest(data) != artifact_id:
+        raise HTTPException(status_code=400, detail="Content does not match its ID")
+    await store_artifact(data)
+    return {"id": artifact_id}
+
+@app.get("/artifacts/{artifact_id}")
+async def get_artifact(artifact_id: str, request: Request):
+    if not is_artifact_id(artifact_id):
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    # The ID is the content hash, so it is also a strong ETag
+    etag = f'"{artifact_id}"'
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        # Only a stored (unexpired) artifact is not modified; checked without reading it
+        if await asyncio.to_thread(artifact_store.missing, [artifact_id]):
+            raise HTTPException(status_code=404, detail="Artifact not found")
+        return Response(status_code=304, headers={'ETag': etag, 'Cache-Control': 'no-cache'})
+    data = await asyncio.to_thread(artifact_store.get, artifact_id)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    if not zipfile.is_zipfile(io.BytesIO(data)):
+        return Response(data, media_type='application/octet-stream', headers={'ETag': etag, 'Cache-Control': 'no-cache'})
+    return docx_response(data, etag=etag)
+
 @app.post("/generate-ia-docx/")
 async def generate_ia_docx_endpoint(request: Request):
     data = await request.json()
     year_range = request.headers.get('yearrange', '')
     logger.debug(f"[IA DOCX] Received yearRange from headers: '{year_range}'")
-    replacements = {
-        "${documentName}": data.get('documentName', ''),
-        "${legalBasis}": data.get('legalBasis', ''),
-        "${visionStatement}": data.get('visionStatement', ''),
-        "${missionStatement}": data.get('missionStatement', ''),
-        "${framework}": data.get('framework', ''),
-        "${pillar}": data.get('pillar', ''),
-        "${yearRange}": year_range,
-    }
-    import tempfile, uuid, os
-    temp_dir = tempfile.gettempdir()
-    filename = f"ia_{uuid.uuid4().hex}.docx"
-    output_path = os.path.join(temp_dir, filename)
-    template_path = 'assets/a.docx'
-    fill_placeholders_and_bullets(template_path, output_path, replacements)
-    from fastapi.responses import FileResponse
-    return FileResponse(output_path, filename="document.docx", media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+    return await cached_docx_response(
+        request, [PART_IA_TEMPLATE], generate_part_ia, part_ia_replacements(data, year_range),
+        filename="document.docx", part='ia', year_range=year_range,
+    )
     
 @app.post("/generate-iib-docx/")
 async def generate_iib_docx_endpoint(request: Request):
@@ -596,29 +703,11 @@ async def generate_iib_docx_endpoint(request: Request):
     year_range = data.get('yearRange', '')  
     logger.debug(f"[IIB DOCX] Received yearRange: '{year_range}'")
     
-    import tempfile, uuid, os
-    temp_dir = tempfile.gettempdir()
-    filename = f"iib_{uuid.uuid4().hex}.docx"
-    output_path = os.path.join(temp_dir, filename)
-    
     template_path = 'assets/II_b.docx'
-    if year_range:
-        temp_template_path = os.path.join(temp_dir, f"temp_iib_template_{uuid.uuid4().hex}.docx")
-        replacements = {"${yearRange}": year_range}
-        fill_placeholders_and_bullets(template_path, temp_template_path, replacements)
-        template_path = temp_template_path
-    
-    from server.tables import create_iib_docx
-    create_iib_docx(systems, output_path, template_path)
-    
-    if year_range and os.path.exists(temp_template_path):
-        try:
-            os.remove(temp_template_path)
-        except Exception as e:
-            logger.warning(f"Failed to remove temporary template file: {e}")
-    
-    from fastapi.responses import FileResponse
-    return FileResponse(output_path, filename="document.docx", media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+    return await cached_docx_response(
+        request, [template_path], generate_table_part, create_iib_docx, template_path, systems, year_range,
+        filename="document.docx", part='iib', year_range=year_range,
+    )
     
 @app.post("/generate-iic-docx/")
 async def generate_iic_docx_endpoint(request: Request):
@@ -627,29 +716,11 @@ async def generate_iic_docx_endpoint(request: Request):
     year_range = data.get('yearRange', '')  
     logger.debug(f"[IIC DOCX] Received yearRange: '{year_range}'")
     
-    import tempfile, uuid, os
-    temp_dir = tempfile.gettempdir()
-    filename = f"iic_{uuid.uuid4().hex}.docx"
-    output_path = os.path.join(temp_dir, filename)
-    
     template_path = 'assets/II_c.docx'
-    if year_range:
-        temp_template_path = os.path.join(temp_dir, f"temp_iic_template_{uuid.uuid4().hex}.docx")
-        replacements = {"${yearRange}": year_range}
-        fill_placeholders_and_bullets(template_path, temp_template_path, replacements)
-        template_path = temp_template_path
-    
-    from server.tables import create_iic_docx
-    create_iic_docx(databases, output_path, template_path)
-    
-    if year_range and os.path.exists(temp_template_path):
-        try:
-            os.remove(temp_template_path)
-        except Exception as e:
-            logger.warning(f"Failed to remove temporary template file: {e}")
-    
-    from fastapi.responses import FileResponse
-    return FileResponse(output_path, filename="document.docx", media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+    return await cached_docx_response(
+        request, [template_path], generate_table_part, create_iic_docx, template_path, databases, year_range,
+        filename="document.docx", part='iic', year_range=year_range,
+    )
     
 @app.post("/generate-iii-a-docx/")
 async def generate_iii_a_docx_endpoint(request: Request):
@@ -657,29 +728,11 @@ async def generate_iii_a_docx_endpoint(request: Request):
     year_range = request.headers.get('yearrange', '')
     logger.debug(f"[IIIA DOCX] Received yearRange: '{year_range}'")
     
-    import tempfile, uuid, os
-    temp_dir = tempfile.gettempdir()
-    filename = f"iii_a_{uuid.uuid4().hex}.docx"
-    output_path = os.path.join(temp_dir, filename)
-    
     template_path = 'assets/III_a.docx'
-    if year_range:
-        temp_template_path = os.path.join(temp_dir, f"temp_iii_a_template_{uuid.uuid4().hex}.docx")
-        replacements = {"${yearRange}": year_range}
-        fill_placeholders_and_bullets(template_path, temp_template_path, replacements)
-        template_path = temp_template_path
-    
-    from server.tables import create_iii_a_docx
-    create_iii_a_docx(projects, output_path, template_path)
-    
-    if year_range and os.path.exists(temp_template_path):
-        try:
-            os.remove(temp_template_path)
-        except Exception as e:
-            logger.warning(f"Failed to remove temporary template file: {e}")
-    
-    from fastapi.responses import FileResponse
-    return FileResponse(output_path, filename="document.docx", media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+    return await cached_docx_response(
+        request, [template_path], generate_table_part, create_iii_a_docx, template_path, projects, year_range,
+        filename="document.docx", part='iiia', year_range=year_range,
+    )
 
 @app.post("/generate-iii-b-docx/")
 async def generate_iii_b_docx_endpoint(request: Request):
@@ -687,131 +740,274 @@ async def generate_iii_b_docx_endpoint(request: Request):
     year_range = request.headers.get('yearrange', '')
     logger.debug(f"[IIIB DOCX] Received yearRange: '{year_range}'")
     
-    import tempfile, uuid, os
-    temp_dir = tempfile.gettempdir()
-    filename = f"iii_b_{uuid.uuid4().hex}.docx"
-    output_path = os.path.join(temp_dir, filename)
-    
     template_path = 'assets/III_b.docx'
-    if year_range:
-        temp_template_path = os.path.join(temp_dir, f"temp_iii_b_template_{uuid.uuid4().hex}.docx")
-        replacements = {"${yearRange}": year_range}
-        fill_placeholders_and_bullets(template_path, temp_template_path, replacements)
-        template_path = temp_template_path
-    
-    from server.tables import create_iii_b_docx
-    create_iii_b_docx(projects, output_path, template_path)
-    
-    if year_range and os.path.exists(temp_template_path):
-        try:
-            os.remove(temp_template_path)
-        except Exception as e:
-            logger.warning(f"Failed to remove temporary template file: {e}")
-    
-    from fastapi.responses import FileResponse
-    return FileResponse(output_path, filename="document.docx", media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+    return await cached_docx_response(
+        request, [template_path], generate_table_part, create_iii_b_docx, template_path, projects, year_range,
+        filename="document.docx", part='iiib', year_range=year_range,
+    )
 
 @app.post("/convert-docx")
-async def convert_docx(file: UploadFile = File(...)):
-    if not file.filename:
+async def convert_docx(
+    request: Request,
+    file: UploadFile = File(None),
+    artifact: str = Form(None),
+):
+    """
+    Convert a .docx, uploaded as `file` or stored under the ID `artifact`, to HTML.
+
+    The HTML is kept in the response cache under the document's content and the
+    mammoth style map, and the key is sent as the ETag, so reopening a document is
+    answered from memory (or with a 304) and concurrent conversions of the same
+    document share one job.
+    """
+    if artifact:
+        contents = (await load_artifacts([artifact]))[0]
+    elif file is not None and file.filename:
+        contents = await file.read()
+    else:
         raise HTTPException(status_code=400, detail="No selected file")
+    key = response_cache.key(request.url.path, [], [convert_docx_to_html, contents, MAMMOTH_STYLE_MAP])
+    headers = {'ETag': f'"{key}"', 'Cache-Control': 'no-cache'}
+    stats = response_stats[request.url.path]
+    stats['requests'] += 1
+    if etag_matches(request.headers.get('if-none-match'), headers['ETag']):
+        stats['not_modified'] += 1
+        logger.debug(f"[CACHE] {request.url.path} not modified")
+        return Response(status_code=304, headers=headers)
     try:
-        contents = await file.read()
-        with open("temp_upload.docx", "wb") as f:
-            f.write(contents)
-        with open("temp_upload.docx", "rb") as docx_file:
-            result = mammoth.convert_to_html(docx_file)
-            html = result.value
-        os.remove("temp_upload.docx")
-        return {"html": html}
+        html = response_cache.get(key)
+        if html is None:
+            html = await single_flight.run(
+                request.url.path, key, lambda: run_cached_job(response_cache, key, convert_docx_to_html, contents)
+            )
+        else:
+            stats['cache_hits'] += 1
+            logger.debug(f"[CACHE] {request.url.path} served from cache")
+        return JSONResponse({"html": html}, headers=headers)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to convert DOCX: {str(e)}")
 
+def convert_docx_to_html(contents):
+    # Converted from memory: a shared scratch file would collide between workers
+    result = mammoth.convert_to_html(io.BytesIO(contents), style_map=MAMMOTH_STYLE_MAP)
+    return result.value
+
 @app.get("/")
 async def root():
     return {"message": "Document Merge Server is running"}
 
+@app.get("/templates")
+async def list_templates():
+    """Version (SHA-256) of each server-side template, by the ID /generate-docx takes."""
+    def versions():
+        names = sorted(name for name in os.listdir(ASSETS_DIR) if name.endswith('.docx'))
+        return {name: template_registry.version(os.path.join(ASSETS_DIR, name)) for name in names}
+    return await asyncio.to_thread(versions)
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Per-endpoint counts.
+
+    `responses` covers the endpoints answered through the response cache: requests,
+    304s and cache hits. `singleFlight` covers the work those and the merges actually
+    had to compute: computations, jobs executed and computations coalesced into a
+    running job.
+    """
+    return {
+        "responses": {path: dict(stats) for path, stats in response_stats.items()},
+        "singleFlight": single_flight.metrics(),
+    }
+
+@app.get("/health")
+async def health_check():
+    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+
+PART_IA_TEMPLATE = os.path.join(ASSETS_DIR, 'a.docx')
+
+def part_ia_replacements(data, year_range):
+    return {
+        "${documentName}": data.get('documentName', ''),
+        "${legalBasis}": data.get('legalBasis', ''),
+        "${visionStatement}": data.get('visionStatement', ''),
+        "${missionStatement}": data.get('missionStatement', ''),
+        "${framework}": data.get('framework', ''),
+        "${pillar}": data.get('pillar', ''),
+        "${yearRange}": year_range,
+    }
+
+def generate_part_ia(replacements):
+    template_path = PART_IA_TEMPLATE
+    docx_bytes = render_compiled_template(
+        template_path,
+        'part_ia',
+        fill_part_ia,
+        {ph[2:-1]: val for ph, val in replacements.items()},
+        slot_types=PART_IA_SLOT_TYPES,
+    )
+    if docx_bytes is None:
+        output = io.BytesIO()
+        fill_placeholders_and_bullets(template_path, output, replacements)
+        docx_bytes = normalize_docx(output.getvalue())
+    return docx_bytes
+
+def generate_table_part(build, template_path, records, year_range):
+    doc = open_year_range_template(template_path, year_range)
+    output = io.BytesIO()
+    build(records, output, template_path, doc=doc)
+    return normalize_docx(output.getvalue())
+
 def fill_placeholders_and_bullets(template_path, output_path, replacements):
-    from docx import Document
-    from docx.shared import Pt
-    doc = Document(template_path)
+    doc = open_template(template_path)
+    fill_placeholders(doc, replacements)
+    doc.save(output_path)
+
+def add_value_run(para, text):
+    # Same markup as a compiled 'run' slot: tabs and line breaks become w:tab/w:br
+    # and every w:t keeps its whitespace, so both paths produce identical bytes
+    run = para.add_run()
+    text = str(text).replace('\r\n', '\n').replace('\r', '\n')
+    for i, line in enumerate(text.split('\n')):
+        if i:
+            run._r.add_br()
+        for j, piece in enumerate(line.split('\t')):
+            if j:
+                run._r.add_tab()
+            run._r.add_t(piece).set(XML_SPACE, 'preserve')
+    return run
+
+def fill_placeholders(doc, replacements):
+    # Values bound to DOCPROPERTY fields are also set in docProps/custom.xml; any
+    # ${name} tokens for them are still filled below
+    values = {ph[2:-1]: val for ph, val in replacements.items()}
+    set_document_properties(doc, values)
+
+    ensure_styles(doc)
+
+    def format_paragraph(para, kind, names):
+        if kind == 'body':
+            if 'framework' in names:
+                para.clear()
+                style_run(add_value_run(para, values['framework']), LABEL_STYLE)
+            elif names & {'visionStatement', 'missionStatement'}:
+                name = 'visionStatement' if 'visionStatement' in names else 'missionStatement'
+                para.clear()
+                style_run(add_value_run(para, f'"{values[name]}"'), QUOTE_STYLE)
+        elif kind == 'header':
+            for run in para.runs:
+                style_run(run, HEADER_STAMP_STYLE)
+        elif kind == 'footer':
+            for run in para.runs:
+                style_run(run, FOOTER_STAMP_STYLE)
+
+    fill_document_placeholders(doc, values, kinds=('body', 'header', 'footer'), on_fill=format_paragraph)
 
     for para in doc.paragraphs:
-        for ph, val in replacements.items():
-            if ph in para.text:
-                if ph == "${framework}":
-                    para.clear()
-                    run = para.add_run(val)
-                    run.bold = True
-                    run.font.name = 'Palatino Linotype'
-                    run.font.size = Pt(12)
-                elif ph in ["${visionStatement}", "${missionStatement}"]:
-                    para.clear()
-                    run = para.add_run(f'"{val}"')
-                    run.italic = True
-                    run.font.name = 'Palatino Linotype'
-                    run.font.size = Pt(12)
-                else:
-                    para.text = para.text.replace(ph, val)
-                    for run in para.runs:
-                        run.font.name = 'Palatino Linotype'
-                        run.font.size = Pt(12)
-    
-    for para in doc.paragraphs:
-        replace_placeholder_in_paragraph(para, "${pillar}", replacements.get("${pillar}", ""))
         for run in para.runs:
-            run.font.name = 'Palatino Linotype'
-            run.font.size = Pt(12)
-    for section in doc.sections:
-        for header in [section.header, section.first_page_header, section.even_page_header]:
-            for para in header.paragraphs:
-                for ph, val in replacements.items():
-                    if ph in para.text:
-                        para.text = para.text.replace(ph, val)
-                        for run in para.runs:
-                            run.font.name = 'Palatino Linotype'
-                            run.font.size = Pt(14)
-                            run.bold = True
-                            run.font.color.rgb = RGBColor(0, 0, 0)
-        for footer in [section.footer, section.first_page_footer, section.even_page_footer]:
-            for para in footer.paragraphs:
-                for ph, val in replacements.items():
-                    if ph in para.text:
-                        para.text = para.text.replace(ph, val)
-                        for run in para.runs:
-                            run.font.name = 'Palatino Linotype'
-                            run.font.size = Pt(12)
-                            run.font.color.rgb = RGBColor(0, 0, 0)
-    doc.save(output_path)
+            style_run(run, VALUE_STYLE, replace=False)
 
-def replace_placeholder_in_paragraph(para, placeholder, replacement):
-    full_text = ''.join(run.text for run in para.runs)
-    if placeholder in full_text:
-        new_text = full_text.replace(placeholder, replacement)
-        for run in para.runs:
-            run.text = ''
-        if para.runs:
-            para.runs[0].text = new_text
-        else:
-            para.add_run(new_text)
+# framework and the vision/mission statements are written with add_value_run, which
+# turns tabs and line breaks into w:tab/w:br
+PART_IA_SLOT_TYPES = {'framework': 'run', 'visionStatement': 'run', 'missionStatement': 'run'}
+
+def fill_part_ia(doc, values, image_stream=None):
+    fill_placeholders(doc, {f'${{{name}}}': value for name, value in values.items()})
+
+def open_year_range_template(template_path, year_range):
+    if not year_range:
+        return open_template(template_path)
+    replacements = {"${yearRange}": year_range}
+    return template_registry.open_variant(
+        template_path,
+        ('yearRange', year_range),
+        lambda doc: fill_placeholders(doc, replacements),
+    )
+
+YEAR_RANGE_TEMPLATES = ['II_b.docx', 'II_c.docx', 'III_a.docx', 'III_b.docx', 'III_c.docx', 'IV_b.docx']
+
+def prewarm_templates():
+    """Parse every template in assets/ and build the PREWARM_YEAR_RANGES variants."""
+    for name in sorted(os.listdir(ASSETS_DIR)):
+        if name.endswith('.docx'):
+            try:
+                template_registry.preload(os.path.join(ASSETS_DIR, name))
+            except Exception as e:
+                logger.warning(f"Failed to pre-load template {name}: {e}")
+    # PREWARM_YEAR_RANGES is a comma-separated list, e.g. "2025-2027"
+    year_ranges = [yr.strip() for yr in os.environ.get('PREWARM_YEAR_RANGES', '').split(',') if yr.strip()]
+    for year_range in year_ranges:
+        for name in YEAR_RANGE_TEMPLATES:
+            template_path = os.path.join(ASSETS_DIR, name)
+            try:
+                open_year_range_template(template_path, year_range)
+            except Exception as e:
+                logger.warning(f"Failed to pre-warm {name} for yearRange '{year_range}': {e}")
+        logger.debug(f"[TEMPLATES] Pre-warmed yearRange '{year_range}'")
+
+# Process workers pre-load templates once at start-up
+job_runner.initializer = prewarm_templates
+
+@app.on_event("startup")
+async def start_job_runner():
+    if job_runner.kind == 'process':
+        job_runner.start()
+    else:
+        prewarm_templates()
+
+@app.on_event("shutdown")
+async def stop_job_runner():
+    job_runner.shutdown()
+
+PART_IB_TEMPLATE = os.path.join(ASSETS_DIR, 'b.docx')
+
+def part_ib_data(data, year_range):
+    current_date = data.get('currDate', '')
+    if not current_date:
+        current_date = datetime.now().strftime('%B %d, %Y')
+    data['currDate'] = current_date
+    
+    processed_data = process_part_ib_data(data)
+    processed_data['yearRange'] = year_range
+    logger.debug(f"Processed data: { {key: value for key, value in processed_data.items() if key != 'organizationalStructure'} }")
+    if isinstance(processed_data.get('organizationalStructure'), str):
+        # As bytes the base64 image can go to the worker through shared memory
+        processed_data['organizationalStructure'] = processed_data['organizationalStructure'].encode('ascii')
+    return processed_data
+
+async def read_part_ib_request(request):
+    """
+    Return the (fields, image) of a Part I.B request.
+
+    A form (multipart/form-data) body carries the fields as JSON under 'data' and
+    the organizational structure chart as a file part named 'organizationalStructure',
+    read as raw bytes. Any other body is the JSON form, with the chart as base64
+    under 'organizationalStructure' (image is then None).
+    """
+    content_type = request.headers.get('content-type', '')
+    if not content_type.startswith(('multipart/form-data', 'application/x-www-form-urlencoded')):
+        return await request.json(), None
+    form = await request.form()
+    try:
+        data = json.loads(form.get('data') or '{}')
+    except ValueError:
+        raise HTTPException(status_code=400, detail="The 'data' field must be JSON")
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=400, detail="The 'data' field must be a JSON object")
+    data.pop('organizationalStructure', None)
+    upload = form.get('organizationalStructure')
+    image = await upload.read() if upload is not None and not isinstance(upload, str) else None
+    return data, image or None
 
 @app.post("/generate-ib-docx/")
 async def generate_ib_docx_endpoint(request: Request):
     try:
-        data = await request.json()
+        data, image = await read_part_ib_request(request)
         year_range = request.headers.get('yearrange', '') or data.get('yearRange', '')
         logger.debug(f"[IB DOCX] Received yearRange: '{year_range}'")
         
-        current_date = data.get('currDate', '')
-        if not current_date:
-            current_date = datetime.now().strftime('%B %d, %Y')
-        data['currDate'] = current_date
+        processed_data = part_ib_data(data, year_range)
         
-        processed_data = process_part_ib_data(data)
-        processed_data['yearRange'] = year_range
-        logger.debug(f"Processed data: {processed_data}")
-        
-        template_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'assets', 'b.docx')
+        template_path = PART_IB_TEMPLATE
         logger.debug(f"Looking for template at: {template_path}")
         
         if not os.path.exists(template_path):
@@ -820,18 +1016,16 @@ async def generate_ib_docx_endpoint(request: Request):
             raise HTTPException(status_code=404, detail=error_msg)
 
         try:
-            docx_bytes = generate_part_ib_docx(processed_data, template_path)
-            logger.debug("Document generated successfully")
+            return await cached_docx_response(
+                request, [template_path], generate_part_ib_docx, processed_data, template_path, image,
+                disposition="attachment; filename=part_ib.docx", part='ib', year_range=year_range,
+            )
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error generating document: {str(e)}")
             logger.error(traceback.format_exc())
             raise HTTPException(status_code=500, detail=f"Error generating document: {str(e)}")
-        
-        return StreamingResponse(
-            io.BytesIO(docx_bytes),
-            media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-            headers={"Content-Disposition": "attachment; filename=part_ib.docx"}
-        )
     except HTTPException:
         raise
     except Exception as e:
@@ -839,6 +1033,28 @@ async def generate_ib_docx_endpoint(request: Request):
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
+def generate_iiic_docx(logframes, year_range, template_path):
+    doc = open_year_range_template(template_path, year_range)
+    logger.debug(f"[IIIC DOCX] Document loaded successfully")
+
+    logger.debug(f"[IIIC DOCX] Processing {len(logframes)} logframes")
+
+    # Process each logframe
+    for i, logframe in enumerate(logframes):
+        logger.debug(f"[IIIC DOCX] Processing logframe {i+1}: {logframe}")
+        if i > 0:
+            # Add spacing between multiple logframes
+            doc.add_paragraph()
+            doc.add_paragraph()
+
+        # Create the logframe table for this project (don't pass output_path when using existing doc)
+        create_iiic_logframe_table(logframe, None, doc=doc)
+
+    output = io.BytesIO()
+    doc.save(output)
+    logger.debug(f"[IIIC DOCX] Document generated ({output.tell()} bytes)")
+    return normalize_docx(output.getvalue())
+
 @app.post("/generate-iiic-docx/")
 async def generate_iiic_docx_endpoint(request: Request):
     try:
@@ -847,10 +1063,6 @@ async def generate_iiic_docx_endpoint(request: Request):
         logger.debug(f"[IIIC DOCX] Received yearRange: '{year_range}'")
         logger.debug(f"[IIIC DOCX] Received data: {data}")
         
-        import tempfile, uuid, os
-        temp_dir = tempfile.gettempdir()
-        filename = f"iiic_{uuid.uuid4().hex}.docx"
-        output_path = os.path.join(temp_dir, filename)
         template_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'assets', 'III_c.docx')
         
         logger.debug(f"[IIIC DOCX] Template path: {template_path}")
@@ -859,47 +1071,16 @@ async def generate_iiic_docx_endpoint(request: Request):
             logger.error(error_msg)
             raise HTTPException(status_code=404, detail=error_msg)
         
-        if year_range:
-            temp_template_path = os.path.join(temp_dir, f"temp_iiic_template_{uuid.uuid4().hex}.docx")
-            replacements = {"${yearRange}": year_range}
-            fill_placeholders_and_bullets(template_path, temp_template_path, replacements)
-            template_path = temp_template_path
-            logger.debug(f"[IIIC DOCX] Using temp template: {template_path}")
-        
-        doc = Document(template_path)
-        logger.debug(f"[IIIC DOCX] Document loaded successfully")
-        
         # Handle the data structure from frontend
         logframes = data.get('logframes', [])
         if not logframes:
             # Fallback for single logframe structure
             logframes = [data]
         
-        logger.debug(f"[IIIC DOCX] Processing {len(logframes)} logframes")
-        
-        # Process each logframe
-        for i, logframe in enumerate(logframes):
-            logger.debug(f"[IIIC DOCX] Processing logframe {i+1}: {logframe}")
-            if i > 0:
-                # Add spacing between multiple logframes
-                doc.add_paragraph()
-                doc.add_paragraph()
-            
-            # Create the logframe table for this project (don't pass output_path when using existing doc)
-            create_iiic_logframe_table(logframe, None, doc=doc)
-        
-        # Save the final document
-        doc.save(output_path)
-        logger.debug(f"[IIIC DOCX] Document saved to: {output_path}")
-        
-        if year_range and os.path.exists(temp_template_path):
-            try:
-                os.remove(temp_template_path)
-            except Exception as e:
-                logger.warning(f"Failed to remove temporary template file: {e}")
-        
-        from fastapi.responses import FileResponse
-        return FileResponse(output_path, filename="document.docx", media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+        return await cached_docx_response(
+            request, [template_path], generate_iiic_docx, logframes, year_range, template_path,
+            filename="document.docx", part='iiic', year_range=year_range,
+        )
     
     except HTTPException:
         raise
@@ -908,6 +1089,126 @@ async def generate_iiic_docx_endpoint(request: Request):
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
+# Whole-plan generation: each Part I-IV group in merge order, by payload key
+PLAN_GROUPS = (
+    ('part_i', ('ia', 'ib', 'ic', 'id', 'ie')),
+    ('part_ii', ('iia', 'iib', 'iic', 'iid')),
+    ('part_iii', ('iiia', 'iiib', 'iiic')),
+    ('part_iv', ('iva', 'ivb')),
+)
+PLAN_PARTS = {key for _, keys in PLAN_GROUPS for key in keys}
+# key -> (template, builder, key of the record list in the payload)
+PLAN_TABLE_PARTS = {
+    'iib': ('II_b.docx', create_iib_docx, 'systems'),
+    'iic': ('II_c.docx', create_iic_docx, 'databases'),
+    'iiia': ('III_a.docx', create_iii_a_docx, None),
+    'iiib': ('III_b.docx', create_iii_b_docx, None),
+}
+# key -> IMAGE_TEMPLATES key
+PLAN_IMAGE_PARTS = {
+    'iia': 'II_a.docx',
+    'iid': 'II_d.docx',
+    'ivb': 'IV_b.docx',
+}
+
+def plan_part_job(key, payload, year_range):
+    """
+    Return the (job, args) that generate plan part `key` from its payload.
+
+    The payloads are those of the matching /generate-*-docx endpoint; image parts take
+    {"images": [<base64>, ...]} in placeholder order.
+
+    Raises:
+        ValueError: If the payload is malformed
+    """
+    if key == 'ia':
+        return generate_part_ia, (part_ia_replacements(payload, year_range),)
+    if key == 'ib':
+        return generate_part_ib_docx, (part_ib_data(payload, year_range), PART_IB_TEMPLATE)
+    if key == 'iiic':
+        logframes = payload.get('logframes', []) or [payload]
+        return generate_iiic_docx, (logframes, year_range, os.path.join(ASSETS_DIR, 'III_c.docx'))
+    if key in PLAN_TABLE_PARTS:
+        template, build, records_key = PLAN_TABLE_PARTS[key]
+        records = payload.get(records_key, []) if records_key and isinstance(payload, dict) else payload
+        return generate_table_part, (build, os.path.join(ASSETS_DIR, template), records, year_range)
+    if key in PLAN_IMAGE_PARTS:
+        template = PLAN_IMAGE_PARTS[key]
+        count = len(IMAGE_TEMPLATES[template].slots)
+        images = [base64.b64decode(image, validate=True) for image in payload.get('images', [])]
+        if len(images) != count:
+            raise ValueError(f"Part {key} requires exactly {count} images")
+        return generate_image_docx, (template, None, images, year_range)
+    raise ValueError(f"Part {key} cannot be generated on the server; send it under 'documents'")
+
+@app.post("/generate-plan")
+async def generate_plan(request: Request):
+    """
+    Generate every part of a plan in one request.
+
+    Body:
+        yearRange: Stamped on every part (the yearrange header is used if absent)
+        parts: Payload per generated part, keyed 'ia', 'ib', 'iia'-'iid', 'iiia'-'iiic', 'ivb'
+        documents: Base64 .docx per part that is not generated here ('ic', 'id', 'ie', 'iva')
+        mergeAll: Also merge Parts I-IV into plan.docx
+        mergeBackend: 'composer' or 'section', see merge_documents
+
+    Parts are generated in parallel on the job runner and each Part I-IV group present
+    is merged. The response is a zip of part_i.docx ... part_iv.docx (and plan.docx),
+    streamed entry by entry. With ?store=1 every part is also kept in the artifact
+    store under yearRange, and artifacts.json in the zip maps part keys to their IDs.
+    """
+    try:
+        data = await request.json()
+        year_range = data.get('yearRange', '') or request.headers.get('yearrange', '')
+        parts = data.get('parts', {})
+        documents = data.get('documents', {})
+        backend = data.get('mergeBackend', MERGE_BACKEND)
+        logger.debug(f"[PLAN] Parts {sorted(parts)}, documents {sorted(documents)}, yearRange '{year_range}'")
+
+        unknown = (set(parts) | set(documents)) - PLAN_PARTS
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown plan parts: {sorted(unknown)}")
+        if backend not in MERGE_BACKENDS:
+            raise HTTPException(status_code=400, detail=f"Unknown merge backend: {backend}")
+        try:
+            jobs = {key: plan_part_job(key, payload, year_range) for key, payload in parts.items()}
+            blobs = {key: base64.b64decode(value, validate=True) for key, value in documents.items()}
+        except (ValueError, TypeError, AttributeError, binascii.Error) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid plan payload: {str(e)}")
+
+        results = await asyncio.gather(*(run_job(job, *args) for job, args in jobs.values()))
+        blobs.update(zip(jobs, results))
+        stored = {}
+        if store_requested(request):
+            for key, blob in blobs.items():
+                stored[key] = await store_artifact(blob, year_range, key)
+
+        groups = [(name, [blobs[key] for key in keys if key in blobs]) for name, keys in PLAN_GROUPS]
+        groups = [(name, group) for name, group in groups if group]
+        if not groups:
+            raise HTTPException(status_code=400, detail="No plan parts provided")
+        merged = await asyncio.gather(*(
+            reduce_nodes(leaf_nodes(group), backend, label='/generate-plan') for _, group in groups
+        ))
+        entries = [(f"{name}.docx", docx_bytes) for (name, _), (_, docx_bytes) in zip(groups, merged)]
+        if data.get('mergeAll'):
+            entries.append(("plan.docx", (await reduce_nodes(list(merged), backend, label='/generate-plan'))[1]))
+        if stored:
+            entries.append(("artifacts.json", json.dumps(stored, sort_keys=True).encode('utf-8')))
+
+        return StreamingResponse(
+            iter_zip(entries),
+            media_type='application/zip',
+            headers={'Content-Disposition': 'attachment; filename="plan.zip"'},
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in generate_plan: {str(e)}")
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--port", type=int, default=8000, help="Port to run the server on")
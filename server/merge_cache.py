@@ -0,0 +1,70 @@
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class MergeCache:
+    """
+    In-memory LRU of merged documents.
+
+    A merge is keyed by its backend and the IDs of its inputs, in order: the SHA-256
+    of an input document, or the key of an input that is itself a merge. Any change
+    to an input or to the order gives a new key, and so does merging the same
+    documents as a differently shaped tree, which gives different bytes. Entries are
+    evicted least-recently-used first once their combined size exceeds ``max_bytes``;
+    a ``max_bytes`` of 0 (MERGE_CACHE_MAX_BYTES=0) disables the cache.
+    """
+
+    def __init__(self, max_bytes=None):
+        if max_bytes is None:
+            max_bytes = int(os.environ.get('MERGE_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    @staticmethod
+    def digest(data):
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def key(backend, node_ids):
+        return hashlib.sha256(f"{backend}:{','.join(node_ids)}".encode()).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        if not self.enabled or len(data) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._total_bytes -= len(previous)
+            self._entries[key] = data
+            self._total_bytes += len(data)
+            while self._total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._total_bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+
+merge_cache = MergeCache()
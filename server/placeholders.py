@@ -0,0 +1,182 @@
+import re
+import copy
+import logging
+from docx.opc.constants import CONTENT_TYPE as CT
+from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph
+from docx.text.run import Run
+from server.template_registry import template_registry
+from server.xml_paths import element_path, resolve_path
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_PATTERN = re.compile(r'\$\{(\w+)\}')
+STORY_KINDS = {
+    CT.WML_DOCUMENT_MAIN: 'body',
+    CT.WML_HEADER: 'header',
+    CT.WML_FOOTER: 'footer',
+}
+XML_SPACE = '{http://www.w3.org/XML/1998/namespace}space'
+
+
+def index_placeholders(doc):
+    """
+    Locate every paragraph of `doc` that contains ${...} tokens.
+
+    The main document, header and footer parts are searched with a single XPath each;
+    tokens split across runs are found because matching is done on the paragraph's
+    concatenated run text.
+
+    Args:
+        doc: The Document to index
+
+    Returns:
+        list: (partname, path, kind, names) tuples, where `path` is the chain of child
+        indexes from the part's root element to the paragraph, `kind` is one of
+        'body', 'table', 'other', 'header' or 'footer' and `names` is a frozenset of
+        placeholder names
+    """
+    index = []
+    for part in doc.part.package.iter_parts():
+        story = STORY_KINDS.get(part.content_type)
+        if story is None:
+            continue
+        root = part.element
+        for p in root.xpath('.//w:p[contains(string(.), "${")]'):
+            names = frozenset(PLACEHOLDER_PATTERN.findall(_paragraph_text(p)))
+            if names:
+                index.append((part.partname, element_path(root, p), _kind_of(story, p), names))
+    return index
+
+
+def fill_placeholders(doc, values, kinds=None, on_fill=None, run_formats=None):
+    """
+    Replace ${name} tokens in `doc` in one pass over the indexed paragraphs.
+
+    The index is built once per template version through the template registry, so
+    only paragraphs known to hold tokens are visited. Replacement text takes the
+    formatting of the run the token starts in; the remaining runs keep theirs.
+
+    Args:
+        doc: The Document to fill
+        values: Mapping of placeholder name (without ``${}``) to replacement value
+        kinds: Optional collection of paragraph kinds to fill (see index_placeholders)
+        on_fill: Optional callable(paragraph, kind, names) run for each filled paragraph
+        run_formats: Optional mapping of name to callable(run); the value of each such
+            placeholder is split into a run of its own and passed to the callable
+
+    Returns:
+        int: Number of paragraphs filled
+    """
+    run_formats = run_formats or {}
+    index = template_registry.derive(doc, 'placeholders', index_placeholders)
+    parts = {part.partname: part for part in doc.part.package.iter_parts()}
+    located = []
+    for partname, path, kind, names in index:
+        if kinds is not None and kind not in kinds:
+            continue
+        names = names & values.keys()
+        if not names:
+            continue
+        part = parts.get(partname)
+        p = resolve_path(part.element, path) if part is not None else None
+        if p is None or p.tag != qn('w:p') or not _holds_any(p, names):
+            logger.debug("[PLACEHOLDERS] Index does not match document, re-indexing")
+            return _fill_unindexed(doc, values, kinds, on_fill, run_formats)
+        located.append((part, p, kind, names))
+
+    for part, p, kind, names in located:
+        _substitute(p, values, run_formats, part)
+        if on_fill is not None:
+            on_fill(Paragraph(p, part), kind, names)
+    return len(located)
+
+
+def _fill_unindexed(doc, values, kinds, on_fill, run_formats):
+    doc._template_key = None
+    return fill_placeholders(doc, values, kinds, on_fill, run_formats)
+
+
+def _paragraph_text(p):
+    return ''.join(t.text or '' for t in p.xpath('./w:r/w:t'))
+
+
+def _holds_any(p, names):
+    # A paragraph moved by edits since the template was indexed lacks its tokens
+    text = _paragraph_text(p)
+    return any(f'${{{name}}}' in text for name in names)
+
+
+def _kind_of(story, p):
+    if story != 'body':
+        return story
+    parent = p.getparent()
+    if parent.tag == qn('w:body'):
+        return 'body'
+    if parent.tag == qn('w:tc'):
+        return 'table'
+    return 'other'
+
+
+def _substitute(p, values, run_formats, part):
+    texts = p.xpath('./w:r/w:t')
+    starts = []
+    offset = 0
+    for t in texts:
+        starts.append(offset)
+        offset += len(t.text or '')
+    full = ''.join(t.text or '' for t in texts)
+
+    def locate(pos):
+        # index of the w:t holding character `pos`
+        lo, hi = 0, len(starts) - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if starts[mid] <= pos:
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
+
+    matches = [m for m in PLACEHOLDER_PATTERN.finditer(full) if m.group(1) in values]
+    for m in reversed(matches):
+        name = m.group(1)
+        value = str(values[name])
+        si = locate(m.start())
+        ei = locate(m.end() - 1)
+        so = m.start() - starts[si]
+        eo = m.end() - starts[ei]
+        first, last = texts[si], texts[ei]
+        if si == ei:
+            prefix, suffix = first.text[:so], first.text[eo:]
+        else:
+            prefix, suffix = first.text[:so], ''
+            for t in texts[si + 1:ei]:
+                t.text = ''
+            last.text = last.text[eo:]
+            last.set(XML_SPACE, 'preserve')
+
+        if name in run_formats:
+            # Earlier tokens in the same w:t only ever look at the prefix, so it stays put
+            r = first.getparent()
+            value_run = _text_run(r, value)
+            if suffix:
+                r.addnext(_text_run(r, suffix))
+            r.addnext(value_run)
+            first.text = prefix
+            run_formats[name](Run(value_run, Paragraph(p, part)))
+        else:
+            first.text = prefix + value + suffix
+        first.set(XML_SPACE, 'preserve')
+
+
+def _text_run(r, text):
+    new_r = r.makeelement(qn('w:r'), {})
+    rPr = r.find(qn('w:rPr'))
+    if rPr is not None:
+        new_r.append(copy.deepcopy(rPr))
+    t = new_r.makeelement(qn('w:t'), {})
+    t.text = text
+    t.set(XML_SPACE, 'preserve')
+    new_r.append(t)
+    return new_r
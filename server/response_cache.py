@@ -0,0 +1,102 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024
+DEFAULT_TTL = 3600
+
+
+def _canonical_default(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {'sha256': hashlib.sha256(value).hexdigest()}
+    if callable(value):
+        return f'{value.__module__}.{value.__qualname__}'
+    raise TypeError(f"Cannot canonicalize {type(value).__name__}")
+
+
+def canonical_json(value):
+    """Serialize `value` so equal payloads give equal bytes (sorted keys, no spacing)."""
+    return json.dumps(
+        value, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=_canonical_default
+    ).encode('utf-8')
+
+
+def etag_matches(if_none_match, etag):
+    """Whether an If-None-Match header value matches `etag`."""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates or f'W/{etag}' in candidates
+
+
+class ResponseCache:
+    """
+    In-memory cache of generated documents, keyed by what they were generated from.
+
+    Keys hash the endpoint, the canonical JSON of the job's inputs (request body and
+    the headers it uses, images by SHA-256) and the versions of the templates involved,
+    so the key doubles as a strong ETag. Entries expire after ``ttl`` seconds and are
+    evicted least-recently-used first beyond ``max_bytes``; a ``max_bytes`` of 0
+    (RESPONSE_CACHE_MAX_BYTES=0) disables storage but ETags still work.
+    """
+
+    def __init__(self, max_bytes=None, ttl=None):
+        if max_bytes is None:
+            max_bytes = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+        if ttl is None:
+            ttl = float(os.environ.get('RESPONSE_CACHE_TTL', DEFAULT_TTL))
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(endpoint, template_versions, inputs):
+        digest = hashlib.sha256()
+        digest.update(endpoint.encode('utf-8'))
+        digest.update(canonical_json(list(template_versions)))
+        digest.update(canonical_json(inputs))
+        return digest.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, data = entry
+            if expires < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        if self.max_bytes <= 0 or len(data) > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, data)
+            self._total_bytes += len(data)
+            while self._total_bytes > self.max_bytes:
+                evicted, _ = next(iter(self._entries.items()))
+                self._remove(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= len(entry[1])
+
+
+response_cache = ResponseCache()
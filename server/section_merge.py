@@ -0,0 +1,410 @@
+import os
+import re
+import copy
+import zlib
+import hashlib
+import logging
+from docx.enum.section import WD_SECTION
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.opc.packuri import PackURI
+from docx.opc.part import XmlPart
+from docx.oxml import OxmlElement, parse_xml
+from docx.oxml.ns import nsdecls, qn
+from docx.parts.image import ImagePart
+from docx.parts.numbering import NumberingPart
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+# 'composer' (docxcompose, page breaks between parts) or 'section' (SectionMerger)
+MERGE_BACKENDS = ('composer', 'section')
+MERGE_BACKEND = os.environ.get('MERGE_BACKEND', 'composer')
+# Documents per merge job when merging as a tree (see main.merge_tree)
+MERGE_FAN_IN = max(2, int(os.environ.get('MERGE_FAN_IN', '2')))
+
+_R_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_PARTNAME_PATTERN = re.compile(r'^(.*?)(\d*)(\.\w+)$')
+
+_W_VAL = qn('w:val')
+_W_ID = qn('w:id')
+_NUM_ID = qn('w:numId')
+_ABSTRACT_NUM = qn('w:abstractNum')
+_ABSTRACT_NUM_ID = qn('w:abstractNumId')
+_NUM = qn('w:num')
+_LVL_OVERRIDE = qn('w:lvlOverride')
+_NUM_FMT = qn('w:numFmt')
+_NSID = qn('w:nsid')
+# Word's per-list identity, which must stay unique; Word assigns one when missing
+_DURABLE_ID = '{http://schemas.microsoft.com/office/word/2016/wordml/cid}durableId'
+_TMPL = qn('w:tmpl')
+_STYLE = qn('w:style')
+_STYLE_ID = qn('w:styleId')
+_P = qn('w:p')
+_PARAGRAPH_SECT_PR = f"{qn('w:pPr')}/{qn('w:sectPr')}"
+_BOOKMARK_TAGS = (qn('w:bookmarkStart'), qn('w:bookmarkEnd'))
+_DRAWING_ID_TAGS = (qn('wp:docPr'), qn('pic:cNvPr'))
+
+
+def _is_blank(p):
+    # Trailing paragraphs with neither text nor graphics are trimmed before a break
+    return not ''.join(p.itertext()).strip() and not p.xpath(
+        './/w:drawing|.//w:pict|.//w:object|.//w:sectPr'
+    )
+
+
+def _is_bullet_list(abstract_num):
+    formats = [fmt.get(_W_VAL) for fmt in abstract_num.iter(_NUM_FMT)]
+    return bool(formats) and all(fmt in ('bullet', 'none') for fmt in formats)
+
+
+def _abstract_num_key(abstract_num):
+    # Identity of a list definition, ignoring its ID and the random nsid/tmpl stamps
+    return hashlib.sha1(b''.join(
+        etree.tostring(child) for child in abstract_num if child.tag not in (_NSID, _TMPL)
+    )).hexdigest()
+
+
+def _num_key(abstract_id, num):
+    return (abstract_id, b''.join(etree.tostring(child) for child in num.iter(_LVL_OVERRIDE)))
+
+
+class SectionMerger:
+    """
+    Appends documents to a master document, each one starting a new section.
+
+    Styles, list definitions, images and parts are looked up in hash indexes built
+    once from the master, so each append costs time proportional to the appended
+    document only; the master is never rescanned and only its last paragraph (which
+    receives the section break) is modified.
+
+    - Styles are matched by styleId; the master's definition wins.
+    - Bullet list definitions identical to one already in the master are reused;
+      numbered lists get their own definition so they restart in every part. Colliding
+      numId/abstractNumId values are remapped.
+    - Each appended section keeps its own page setup, headers and footers. Images are
+      deduplicated by SHA-1 and other related parts are copied under fresh part names.
+    - Drawing and bookmark IDs of appended content are renumbered past the master's.
+
+    Appended documents are consumed: their body elements are moved, not copied.
+    """
+
+    def __init__(self, master):
+        self.doc = master
+        self.part = master.part
+        self.package = self.part.package
+        self._styles = master.styles.element
+        self._style_ids = {style.get(_STYLE_ID) for style in self._styles.iterchildren(_STYLE)}
+        self._rels = {}
+        self._images = None
+
+        self._partnames = set()
+        drawing_ids = [0]
+        for part in self.package.iter_parts():
+            self._partnames.add(str(part.partname))
+            if isinstance(part, XmlPart):
+                drawing_ids.extend(
+                    int(node.get('id', 0)) for tag in _DRAWING_ID_TAGS for node in part.element.iter(tag)
+                )
+        self._next_drawing_id = max(drawing_ids) + 1
+        self._next_bookmark_id = max(
+            [int(node.get(_W_ID, 0)) for node in master.element.body.iter(_BOOKMARK_TAGS[0])] + [-1]
+        ) + 1
+
+        self._numbering = None
+        self._abstract_nums = {}
+        self._nums = {}
+        self._next_abstract_id = 0
+        self._next_num_id = 1
+        self._first_num = None
+        self._last_num = None
+        try:
+            numbering = self.part.part_related_by(RT.NUMBERING).element
+        except KeyError:
+            numbering = None
+        if numbering is not None:
+            self._index_numbering(numbering)
+
+    def append(self, doc):
+        """
+        Append the body of `doc` after a next-page section break.
+
+        Args:
+            doc: The Document to append; it is left without a body
+        """
+        body = self.doc.element.body
+        source = doc.element.body
+        self._index_source_numbering(doc)
+        self._bookmark_map = {}
+        self._copied_parts = {}
+
+        self._merge_styles(doc)
+
+        src_sectPr = source.sectPr
+        if src_sectPr is not None:
+            source.remove(src_sectPr)
+        self._close_section(src_sectPr, doc.part)
+
+        anchor = body.sectPr
+        first_section = anchor
+        added = 0
+        for element in list(source):
+            self._adopt(element, doc.part, self.part)
+            anchor.addprevious(element)
+            if first_section is anchor and element.tag == _P:
+                section = element.find(_PARAGRAPH_SECT_PR)
+                if section is not None:
+                    first_section = section
+            added += 1
+        # The break belongs to the first section of the appended document, which is
+        # its body's own only when it has a single section
+        first_section.start_type = WD_SECTION.NEW_PAGE
+        logger.debug(f"[MERGE] Appended {added} body elements as a new section")
+
+    def save(self, stream):
+        self.doc.save(stream)
+
+    def _close_section(self, src_sectPr, src_part):
+        # Move the master's final section properties into its last paragraph and give
+        # the body the appended document's own, so both keep their layout and headers
+        body = self.doc.element.body
+        sectPr = body.sectPr
+        last = sectPr.getprevious() if sectPr is not None else (body[-1] if len(body) else None)
+        while last is not None and last.tag == _P and _is_blank(last):
+            previous = last.getprevious()
+            body.remove(last)
+            last = previous
+
+        if last is None or last.tag != _P or last.pPr is not None and last.pPr.sectPr is not None:
+            p = OxmlElement('w:p')
+            if sectPr is not None:
+                sectPr.addprevious(p)
+            else:
+                body.append(p)
+            last = p
+
+        closing = copy.deepcopy(sectPr) if sectPr is not None else OxmlElement('w:sectPr')
+        last.get_or_add_pPr()._insert_sectPr(closing)
+
+        if src_sectPr is None:
+            src_sectPr = copy.deepcopy(sectPr) if sectPr is not None else OxmlElement('w:sectPr')
+        else:
+            self._adopt(src_sectPr, src_part, self.part)
+        if sectPr is not None:
+            body.remove(sectPr)
+        body.append(src_sectPr)
+
+    def _merge_styles(self, doc):
+        added = []
+        for style in doc.styles.element.iterchildren(_STYLE):
+            style_id = style.get(_STYLE_ID)
+            if style_id in self._style_ids:
+                continue
+            style = copy.deepcopy(style)
+            for num_id in style.iter(_NUM_ID):
+                self._remap_num_id(num_id)
+            self._styles.append(style)
+            self._style_ids.add(style_id)
+            added.append(style_id)
+        if added:
+            logger.debug(f"[MERGE] Added styles {added}")
+
+    def _adopt(self, element, src_part, dst_part):
+        # Single pass over newly appended XML fixing every cross-reference it carries
+        for node in element.iter():
+            tag = node.tag
+            if not isinstance(tag, str):
+                continue
+            for name, value in node.attrib.items():
+                if name.startswith(_R_NS):
+                    node.set(name, self._import_rel(src_part, dst_part, value))
+            if tag == _NUM_ID:
+                self._remap_num_id(node)
+            elif tag in _DRAWING_ID_TAGS:
+                node.set('id', str(self._next_drawing_id))
+                self._next_drawing_id += 1
+            elif tag in _BOOKMARK_TAGS:
+                source_id = node.get(_W_ID)
+                if source_id not in self._bookmark_map:
+                    self._bookmark_map[source_id] = str(self._next_bookmark_id)
+                    self._next_bookmark_id += 1
+                node.set(_W_ID, self._bookmark_map[source_id])
+
+    def _import_rel(self, src_part, dst_part, rId):
+        rel = src_part.rels.get(rId)
+        if rel is None:
+            return rId
+        if rel.is_external:
+            target = rel.target_ref
+        elif rel.reltype == RT.IMAGE:
+            target = self._import_image(rel.target_part)
+        else:
+            target = self._import_part(rel.target_part)
+        return self._relate(dst_part, rel.reltype, target, rel.is_external)
+
+    def _relate(self, dst_part, reltype, target, is_external=False):
+        index = self._rels.get(id(dst_part))
+        if index is None:
+            numbers = [int(rId[3:]) for rId in dst_part.rels if rId[3:].isdigit()]
+            index = self._rels[id(dst_part)] = {'next': max(numbers + [0]) + 1, 'keys': {}}
+            for rel in dst_part.rels.values():
+                target_key = rel.target_ref if rel.is_external else id(rel.target_part)
+                index['keys'][(rel.reltype, target_key, rel.is_external)] = rel.rId
+        key = (reltype, target if is_external else id(target), is_external)
+        rId = index['keys'].get(key)
+        if rId is None:
+            rId = f"rId{index['next']}"
+            index['next'] += 1
+            dst_part.load_rel(reltype, target, rId, is_external)
+            index['keys'][key] = rId
+        return rId
+
+    def _import_image(self, image_part):
+        if self._images is None:
+            self._images = {
+                part.sha1: part for part in self.package.iter_parts() if isinstance(part, ImagePart)
+            }
+        sha1 = image_part.sha1
+        part = self._images.get(sha1)
+        if part is None:
+            part = ImagePart(self._partname(image_part.partname), image_part.content_type, image_part.blob)
+            self._images[sha1] = part
+        return part
+
+    def _import_part(self, source):
+        part = self._copied_parts.get(id(source))
+        if part is not None:
+            return part
+        partname = self._partname(source.partname)
+        if isinstance(source, XmlPart):
+            part = type(source)(partname, source.content_type, copy.deepcopy(source.element), self.package)
+        else:
+            part = type(source).load(partname, source.content_type, source.blob, self.package)
+        self._copied_parts[id(source)] = part
+        if isinstance(source, XmlPart):
+            self._adopt(part.element, source, part)
+        else:
+            for rel in source.rels.values():
+                part.load_rel(rel.reltype, rel.target_ref if rel.is_external else
+                              self._import_part(rel.target_part), rel.rId, rel.is_external)
+        return part
+
+    def _partname(self, partname):
+        stem, _, ext = _PARTNAME_PATTERN.match(str(partname)).groups()
+        n = 1
+        while f'{stem}{n}{ext}' in self._partnames:
+            n += 1
+        name = f'{stem}{n}{ext}'
+        self._partnames.add(name)
+        return PackURI(name)
+
+    def _index_numbering(self, numbering):
+        self._numbering = numbering
+        abstract_ids = {}
+        for child in numbering:
+            if child.tag == _ABSTRACT_NUM:
+                abstract_id = int(child.get(_ABSTRACT_NUM_ID))
+                self._next_abstract_id = max(self._next_abstract_id, abstract_id + 1)
+                if _is_bullet_list(child):
+                    self._abstract_nums.setdefault(_abstract_num_key(child), abstract_id)
+                    abstract_ids[abstract_id] = True
+            elif child.tag == _NUM:
+                num_id = int(child.get(_NUM_ID))
+                self._next_num_id = max(self._next_num_id, num_id + 1)
+                if self._first_num is None:
+                    self._first_num = child
+                self._last_num = child
+                abstract = child.find(_ABSTRACT_NUM_ID)
+                if abstract is not None and int(abstract.get(_W_VAL)) in abstract_ids:
+                    self._nums.setdefault(_num_key(int(abstract.get(_W_VAL)), child), num_id)
+
+    def _numbering_element(self):
+        if self._numbering is None:
+            part = NumberingPart(
+                self._partname('/word/numbering.xml'),
+                'application/vnd.openxmlformats-officedocument.wordprocessingml.numbering+xml',
+                parse_xml(f'<w:numbering {nsdecls("w")}/>'),
+                self.package,
+            )
+            self._relate(self.part, RT.NUMBERING, part)
+            self._numbering = part.element
+        return self._numbering
+
+    def _index_source_numbering(self, doc):
+        try:
+            source = doc.part.part_related_by(RT.NUMBERING).element
+        except KeyError:
+            source = None
+        self._source_nums = {}
+        self._source_abstract_nums = {}
+        if source is not None:
+            for child in source:
+                if child.tag == _NUM:
+                    self._source_nums[child.get(_NUM_ID)] = child
+                elif child.tag == _ABSTRACT_NUM:
+                    self._source_abstract_nums[child.get(_ABSTRACT_NUM_ID)] = child
+        self._num_map = {}
+        self._abstract_map = {}
+
+    def _map_num(self, source_id):
+        # Master numId for a numId of the document being appended; only definitions
+        # the appended content actually references are brought over
+        num = self._source_nums.get(source_id)
+        abstract_ref = num.find(_ABSTRACT_NUM_ID) if num is not None else None
+        if abstract_ref is None or abstract_ref.get(_W_VAL) not in self._source_abstract_nums:
+            return source_id
+        numbering = self._numbering_element()
+        source_abstract_id = abstract_ref.get(_W_VAL)
+        if source_abstract_id not in self._abstract_map:
+            self._abstract_map[source_abstract_id] = self._add_abstract_num(
+                numbering, self._source_abstract_nums[source_abstract_id]
+            )
+        abstract_id, shared = self._abstract_map[source_abstract_id]
+        key = _num_key(abstract_id, num)
+        if shared and key in self._nums:
+            return str(self._nums[key])
+
+        num_id = self._next_num_id
+        self._next_num_id += 1
+        num = copy.deepcopy(num)
+        num.set(_NUM_ID, str(num_id))
+        num.attrib.pop(_DURABLE_ID, None)
+        num.find(_ABSTRACT_NUM_ID).set(_W_VAL, str(abstract_id))
+        if self._last_num is not None:
+            self._last_num.addnext(num)
+        else:
+            numbering.append(num)
+            self._first_num = num
+        self._last_num = num
+        if shared:
+            self._nums[key] = num_id
+        return str(num_id)
+
+    def _add_abstract_num(self, numbering, abstract_num):
+        shared = _is_bullet_list(abstract_num)
+        key = _abstract_num_key(abstract_num)
+        if shared and key in self._abstract_nums:
+            return self._abstract_nums[key], True
+        abstract_id = self._next_abstract_id
+        self._next_abstract_id += 1
+        abstract_num = copy.deepcopy(abstract_num)
+        abstract_num.set(_ABSTRACT_NUM_ID, str(abstract_id))
+        nsid = abstract_num.find(_NSID)
+        if nsid is not None:
+            # A distinct (but reproducible) nsid keeps Word from joining separate lists
+            nsid.set(_W_VAL, f'{zlib.crc32(f"{key}:{abstract_id}".encode()):08X}')
+        if self._first_num is not None:
+            self._first_num.addprevious(abstract_num)
+        else:
+            numbering.append(abstract_num)
+        if shared:
+            self._abstract_nums[key] = abstract_id
+        return abstract_id, shared
+
+    def _remap_num_id(self, node):
+        value = node.get(_W_VAL)
+        if value == '0':
+            # numId 0 switches numbering off
+            return
+        if value not in self._num_map:
+            self._num_map[value] = self._map_num(value)
+        node.set(_W_VAL, self._num_map[value])
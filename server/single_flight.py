@@ -0,0 +1,56 @@
+import asyncio
+import logging
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent work on the event loop.
+
+    The first caller for a key starts the work as its own task; callers arriving while
+    it runs await that same task and receive the same result (or exception). The task
+    is shielded, so a caller that goes away (e.g. a closed connection) does not cancel
+    it for the others. Counts are kept per label, normally the endpoint path; they only
+    see work that reached this point, not requests answered from a cache.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self._stats = defaultdict(lambda: {'computations': 0, 'executed': 0, 'coalesced': 0})
+
+    async def run(self, label, key, work):
+        """
+        Return the result of `work()`, shared with concurrent callers using `key`.
+
+        Args:
+            label: Name the call is counted under
+            key: Identity of the work; equal keys must mean equal results
+            work: Zero-argument callable returning an awaitable
+        """
+        stats = self._stats[label]
+        stats['computations'] += 1
+        task = self._inflight.get(key)
+        if task is None:
+            stats['executed'] += 1
+            task = asyncio.ensure_future(work())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            stats['coalesced'] += 1
+            logger.debug(f"[SINGLEFLIGHT] {label}: joined in-flight work")
+        return await asyncio.shield(task)
+
+    def metrics(self):
+        return {label: dict(stats) for label, stats in self._stats.items()}
+
+    def _finish(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Retrieved here so a failure nobody awaited any more is not reported as lost
+            task.exception()
+
+
+single_flight = SingleFlight()
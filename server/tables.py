@@ -1,366 +1,342 @@
+import copy
 from docx import Document
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
 from docx.shared import Pt, Inches
+from server.template_registry import open_template, clone_document, template_registry
+from server.doc_styles import (
+    ensure_styles, style_run, BULLET_STYLE, COLUMN_HEADER_STYLE, LABEL_STYLE, STYLES,
+)
+
+# (label, key, kind) rows of the 8x3 register cards; rows 5-6 hold the USERS block
+IIB_CARD = (
+    ('NAME OF INFORMATION SYSTEM/ SUB-SYSTEM', 'name_of_system', 'text'),
+    ('DESCRIPTION', 'description', 'bullets'),
+    ('STATUS', 'status', 'text'),
+    ('DEVELOPMENT STRATEGY', 'development_strategy', 'text'),
+    ('COMPUTING SCHEME', 'computing_scheme', 'text'),
+    ('OWNER', 'owner', 'text'),
+)
+IIC_CARD = (
+    ('NAME OF DATABASE', 'name_of_database', 'text'),
+    ('GENERAL CONTENTS/DESCRIPTION', 'general_contents', 'bullets'),
+    ('STATUS', 'status', 'text'),
+    ('INFORMATION SYSTEMS SERVED', 'info_systems_served', 'text'),
+    ('DATA ARCHIVING/STORAGE MEDIA', 'data_archiving', 'text'),
+    ('OWNER', 'owner', 'text'),
+)
+# (label, key, kind) rows of the Nx2 project cards
+III_A_CARD = (
+    ('A.1 NAME/TITLE', 'name', 'text'),
+    ('A.2 OBJECTIVES', 'objectives', 'text'),
+    ('A.3 DURATION', 'duration', 'text'),
+    ('A.4 DELIVERABLES', 'deliverables', 'bullets'),
+)
+III_B_CARD = III_A_CARD + (
+    ('A.5 LEAD AGENCY', 'lead_agency', 'text'),
+    ('A.6 IMPLEMENTING AGENCIES', 'implementing_agencies', 'text'),
+)
+
+
+def _format_label_runs(cell):
+    for paragraph in cell.paragraphs:
+        for run in paragraph.runs:
+            style_run(run, LABEL_STYLE)
+
+
+def _bullet_prototype(cell):
+    # Bullet paragraph with one run, detached for cloning. The indent stays direct:
+    # the list level's own indent would win over one set in the paragraph style.
+    p = cell.add_paragraph('', style=STYLES[BULLET_STYLE][0])
+    p.paragraph_format.left_indent = Pt(0)
+    p.add_run('')
+    p._p.getparent().remove(p._p)
+    return p._p
+
+
+def _clear_cell(cell):
+    for para in list(cell.paragraphs):
+        p = para._element
+        p.getparent().remove(p)
+
+
+def _build_register_card(doc, rows):
+    """
+    Build one empty 8x3 II.B/II.C card with python-docx: labels, merges, fonts and
+    widths in place, value cells left blank.
+    """
+    table = doc.add_table(rows=8, cols=3)
+    table.style = 'Table Grid'
+    table.autofit = False
+    table.allow_autofit = False
+
+    label_rows = (0, 1, 2, 3, 4, 7)
+    for i, (label, _, _) in zip(label_rows, rows):
+        table.cell(i, 0).merge(table.cell(i, 1))
+        table.cell(i, 0).text = label
+        table.cell(i, 2).text = ''
+    table.cell(5, 0).merge(table.cell(6, 0))
+    table.cell(5, 0).text = 'USERS'
+    table.cell(5, 1).text = 'INTERNAL'
+    table.cell(5, 2).text = ''
+    table.cell(6, 1).text = 'EXTERNAL'
+    table.cell(6, 2).text = ''
+    bullet = _bullet_prototype(table.cell(1, 2))
+    _clear_cell(table.cell(1, 2))
+
+    for i in range(8):
+        _format_label_runs(table.cell(i, 0))
+    _format_label_runs(table.cell(0, 2))
+
+    col1_width = Inches(0.75)
+    col2_width = Inches(1)
+    col3_width = Inches(7.19)
+    for i, row in enumerate(table.rows):
+        if i == 5:
+            row.cells[0].width = Inches(0.5)
+        else:
+            row.cells[0].width = col1_width
+        row.cells[1].width = col2_width
+        row.cells[2].width = col3_width
+
+    cells = [(i, 2, key, kind) for i, (_, key, kind) in zip(label_rows, rows)]
+    cells += [(5, 2, 'users_internal', 'lines'), (6, 2, 'users_external', 'text')]
+    cells.sort()
+    return table, cells, bullet
+
+
+def _build_project_card(doc, rows):
+    """Build one empty Nx2 III.A/III.B card with python-docx."""
+    table = doc.add_table(rows=len(rows), cols=2)
+    table.style = 'Table Grid'
+    table.autofit = False
+    table.allow_autofit = False
+    bullet = None
+    for i, (label, _, kind) in enumerate(rows):
+        table.cell(i, 0).text = label
+        if kind == 'bullets':
+            bullet = _bullet_prototype(table.cell(i, 1))
+            _clear_cell(table.cell(i, 1))
+        else:
+            table.cell(i, 1).text = ''
+
+    for i in range(len(rows)):
+        _format_label_runs(table.cell(i, 0))
+    _format_label_runs(table.cell(0, 1))
+    for row in table.rows:
+        row.cells[0].width = Inches(1.77165)
+        row.cells[1].width = Inches(7.19)
+    cells = [(i, 1, key, kind) for i, (_, key, kind) in enumerate(rows)]
+    return table, cells, bullet
+
+
+def _build_card_fragment(doc, build, rows, ranked=False):
+    """
+    Run `build` once on a scratch copy of `doc` and keep the result as lxml fragments.
 
-def create_iib_docx(systems, output_path, template_path=None):
-    if template_path is None:
-        template_path = r'C:/Users/User/Documents/SOIDProject/assets/II_b.docx'
-    doc = Document(template_path)
-    for sys in systems:
-        table = doc.add_table(rows=8, cols=3)
-        table.style = 'Table Grid'
-        table.autofit = False
-        table.allow_autofit = False
-
-        table.cell(0, 0).merge(table.cell(0, 1))
-        table.cell(0, 0).text = 'NAME OF INFORMATION SYSTEM/ SUB-SYSTEM'
-        table.cell(0, 2).text = sys.get('name_of_system', '')
-
-        table.cell(1, 0).merge(table.cell(1, 1))
-        table.cell(1, 0).text = 'DESCRIPTION'
-        cell = table.cell(1, 2)
-        for para in list(cell.paragraphs):
-            p = para._element
-            p.getparent().remove(p)
-        value = sys.get('description', [])
-        if isinstance(value, str):
-            value = [v.strip() for v in value.split('\n') if v.strip()]
-        for item in value:
-            p = cell.add_paragraph(item, style='List Bullet')
-            p.paragraph_format.left_indent = Pt(0)
-            cell.add_paragraph('')
-
-        table.cell(2, 0).merge(table.cell(2, 1))
-        table.cell(2, 0).text = 'STATUS'
-        table.cell(2, 2).text = sys.get('status', '')
-
-        table.cell(3, 0).merge(table.cell(3, 1))
-        table.cell(3, 0).text = 'DEVELOPMENT STRATEGY'
-        table.cell(3, 2).text = sys.get('development_strategy', '')
-
-        table.cell(4, 0).merge(table.cell(4, 1))
-        table.cell(4, 0).text = 'COMPUTING SCHEME'
-        table.cell(4, 2).text = sys.get('computing_scheme', '')
-
-        table.cell(5, 0).merge(table.cell(6, 0))
-        table.cell(5, 0).text = 'USERS'
-        table.cell(5, 1).text = 'INTERNAL'
-        internal_users = sys.get('users_internal', [])
-        if isinstance(internal_users, str):
-            internal_users = [internal_users]
-        table.cell(5, 2).text = '\n'.join(internal_users)
-
-        table.cell(6, 1).text = 'EXTERNAL'
-        table.cell(6, 2).text = sys.get('users_external', '')
-
-        table.cell(7, 0).merge(table.cell(7, 1))
-        table.cell(7, 0).text = 'OWNER'
-        table.cell(7, 2).text = sys.get('owner', '')
-
-        for i in range(8):
-            cell = table.cell(i, 0)
-            for paragraph in cell.paragraphs:
-                for run in paragraph.runs:
-                    run.bold = True
-                    run.font.name = 'Palatino Linotype'
-                    run.font.size = Pt(12)
-            if i == 0:
-                cell = table.cell(i, 2)
-                for paragraph in cell.paragraphs:
-                    for run in paragraph.runs:
-                        run.bold = True
-                        run.font.name = 'Palatino Linotype'
-                        run.font.size = Pt(12)
-
-        col1_width = Inches(0.75)   
-        col2_width = Inches(1)    
-        col3_width = Inches(7.19)   
-        for i, row in enumerate(table.rows):
-            if i == 5:
-                row.cells[0].width = Inches(0.5)
+    Returns:
+        dict: 'blocks' (the optional RANK paragraph, the table and the spacer paragraph
+        that follows each card), 'slots' ((tc ordinal, key, kind) for every value cell)
+        and 'bullet' (the paragraph cloned for each bullet item)
+    """
+    scratch = clone_document(doc)
+    ensure_styles(scratch)
+    blocks = []
+    if ranked:
+        rank_para = scratch.add_paragraph()
+        rank_run = rank_para.add_run('')
+        style_run(rank_run, LABEL_STYLE)
+        rank_para.paragraph_format.space_after = Pt(0)
+        blocks.append(rank_para._p)
+    table, cells, bullet = build(scratch, rows)
+    blocks.append(table._tbl)
+    blocks.append(scratch.add_paragraph()._p)
+
+    tcs = list(table._tbl.iter(qn('w:tc')))
+    slots = [(tcs.index(table.cell(i, j)._tc), key, kind) for i, j, key, kind in cells]
+    for block in blocks:
+        block.getparent().remove(block)
+    return {'blocks': blocks, 'slots': slots, 'bullet': bullet}
+
+
+def _append_cards(doc, records, name, build, rows, ranked=False):
+    """
+    Append one card per record by cloning a fragment prepared once per template.
+
+    The styled table is built with python-docx a single time (per template version for
+    registry documents); every record then costs one deepcopy plus direct writes into
+    its value cells, so no cell grid is rebuilt and no runs are re-formatted per record.
+    Fonts come from the SOID styles, which are added to `doc` if missing.
+    """
+    ensure_styles(doc)
+    fragment = template_registry.derive(
+        doc, ('card', name), lambda template: _build_card_fragment(template, build, rows, ranked)
+    )
+    body = doc.element.body
+    anchor = body.sectPr
+    slots = fragment['slots']
+    for idx, record in enumerate(records):
+        blocks = [copy.deepcopy(block) for block in fragment['blocks']]
+        if ranked:
+            blocks[0].find(qn('w:r')).text = f'RANK {idx + 1}'
+        tcs = list(blocks[-2].iter(qn('w:tc')))
+        for ordinal, key, kind in slots:
+            _fill_slot(tcs[ordinal], record, key, kind, fragment['bullet'])
+        for block in blocks:
+            if anchor is not None:
+                anchor.addprevious(block)
             else:
-                row.cells[0].width = col1_width
-            row.cells[1].width = col2_width
-            row.cells[2].width = col3_width
+                body.append(block)
 
-        doc.add_paragraph()
-    doc.save(output_path)
 
-def create_iic_docx(databases, output_path, template_path=None):
-    if template_path is None:
-        template_path = r'C:/Users/User/Documents/SOIDProject/assets/II_c.docx'
-    doc = Document(template_path)
-    for db in databases:
-        table = doc.add_table(rows=8, cols=3)
-        table.style = 'Table Grid'
-        table.autofit = False
-        table.allow_autofit = False
-
-        table.cell(0, 0).merge(table.cell(0, 1))
-        table.cell(0, 0).text = 'NAME OF DATABASE'
-        table.cell(0, 2).text = db.get('name_of_database', '')
-
-        table.cell(1, 0).merge(table.cell(1, 1))
-        table.cell(1, 0).text = 'GENERAL CONTENTS/DESCRIPTION'
-        cell = table.cell(1, 2)
-        for para in list(cell.paragraphs):
-            p = para._element
-            p.getparent().remove(p)
-        value = db.get('general_contents', [])
+def _fill_slot(tc, record, key, kind, bullet):
+    if kind == 'bullets':
+        value = record.get(key, [])
         if isinstance(value, str):
             value = [v.strip() for v in value.split('\n') if v.strip()]
         for item in value:
-            p = cell.add_paragraph(item, style='List Bullet')
-            p.paragraph_format.left_indent = Pt(0)
-            cell.add_paragraph('')
-
-        table.cell(2, 0).merge(table.cell(2, 1))
-        table.cell(2, 0).text = 'STATUS'
-        table.cell(2, 2).text = db.get('status', '')
-
-        table.cell(3, 0).merge(table.cell(3, 1))
-        table.cell(3, 0).text = 'INFORMATION SYSTEMS SERVED'
-        table.cell(3, 2).text = db.get('info_systems_served', '')
-
-        table.cell(4, 0).merge(table.cell(4, 1))
-        table.cell(4, 0).text = 'DATA ARCHIVING/STORAGE MEDIA'
-        table.cell(4, 2).text = db.get('data_archiving', '')
-
-        table.cell(5, 0).merge(table.cell(6, 0))
-        table.cell(5, 0).text = 'USERS'
-        table.cell(5, 1).text = 'INTERNAL'
-        internal_users = db.get('users_internal', [])
-        if isinstance(internal_users, str):
-            internal_users = [internal_users]
-        table.cell(5, 2).text = '\n'.join(internal_users)
-
-        table.cell(6, 1).text = 'EXTERNAL'
-        table.cell(6, 2).text = db.get('users_external', '')
-
-        table.cell(7, 0).merge(table.cell(7, 1))
-        table.cell(7, 0).text = 'OWNER'
-        table.cell(7, 2).text = db.get('owner', '')
-
-        for i in range(8):
-            cell = table.cell(i, 0)
-            for paragraph in cell.paragraphs:
-                for run in paragraph.runs:
-                    run.bold = True
-                    run.font.name = 'Palatino Linotype'
-                    run.font.size = Pt(12)
-            if i == 0:
-                cell = table.cell(i, 2)
-                for paragraph in cell.paragraphs:
-                    for run in paragraph.runs:
-                        run.bold = True
-                        run.font.name = 'Palatino Linotype'
-                        run.font.size = Pt(12)
-        col1_width = Inches(0.75)   
-        col2_width = Inches(1)    
-        col3_width = Inches(7.19)   
-        for i, row in enumerate(table.rows):
-            if i == 5:
-                row.cells[0].width = Inches(0.5)
-            else:
-                row.cells[0].width = col1_width
-            row.cells[1].width = col2_width
-            row.cells[2].width = col3_width
+            p = copy.deepcopy(bullet)
+            p.find(qn('w:r')).text = item
+            tc.append(p)
+        return
+    value = record.get(key, '')
+    if kind == 'lines':
+        value = [value] if isinstance(value, str) else value
+        value = '\n'.join(value)
+    tc.find(qn('w:p')).find(qn('w:r')).text = value
+
+
+def create_iib_docx(systems, output_path, template_path=None, doc=None):
+    if template_path is None:
+        template_path = r'C:/Users/User/Documents/SOIDProject/assets/II_b.docx'
+    if doc is None:
+        doc = open_template(template_path)
+    _append_cards(doc, systems, 'iib', _build_register_card, IIB_CARD)
+    doc.save(output_path)
 
-        doc.add_paragraph()
+def create_iic_docx(databases, output_path, template_path=None, doc=None):
+    if template_path is None:
+        template_path = r'C:/Users/User/Documents/SOIDProject/assets/II_c.docx'
+    if doc is None:
+        doc = open_template(template_path)
+    _append_cards(doc, databases, 'iic', _build_register_card, IIC_CARD)
     doc.save(output_path)
 
-def create_iii_a_docx(projects, output_path, template_path=None):
+def create_iii_a_docx(projects, output_path, template_path=None, doc=None):
     if template_path is None:
         template_path = r'C:/Users/User/Documents/SOIDProject/assets/III_a.docx'
-    doc = Document(template_path)
-    for idx, project in enumerate(projects):
-        rank_para = doc.add_paragraph()
-        rank_run = rank_para.add_run(f'RANK {idx + 1}')
-        rank_run.bold = True
-        rank_run.font.name = 'Palatino Linotype'
-        rank_run.font.size = Pt(12)
-        rank_para.paragraph_format.space_after = Pt(0)
-        table = doc.add_table(rows=4, cols=2)
-        table.style = 'Table Grid'
-        table.autofit = False
-        table.allow_autofit = False
-        fields = [
-            ('A.1 NAME/TITLE', project.get('name', '')),
-            ('A.2 OBJECTIVES', project.get('objectives', '')),
-            ('A.3 DURATION', project.get('duration', '')),
-            ('A.4 DELIVERABLES', project.get('deliverables', [])),
-        ]
-        for i, (label, value) in enumerate(fields):
-            table.cell(i, 0).text = label
-            if label == 'A.4 DELIVERABLES':
-                cell = table.cell(i, 1)
-                for para in list(cell.paragraphs):
-                    p = para._element
-                    p.getparent().remove(p)
-                if isinstance(value, str):
-                    value = [v.strip() for v in value.split('\n') if v.strip()]
-                for deliverable in value:
-                    p = cell.add_paragraph(deliverable, style='List Bullet')
-                    p.paragraph_format.left_indent = Pt(0)
-                    cell.add_paragraph('')
-            else:
-                cell = table.cell(i, 1)
-                cell.text = value
-
-        for i in range(4):
-            cell = table.cell(i, 0)
-            for paragraph in cell.paragraphs:
-                for run in paragraph.runs:
-                    run.bold = True
-                    run.font.name = 'Palatino Linotype'
-                    run.font.size = Pt(12)
-            if i == 0:
-                cell = table.cell(i, 1)
-                for paragraph in cell.paragraphs:
-                    for run in paragraph.runs:
-                        run.bold = True
-                        run.font.name = 'Palatino Linotype'
-                        run.font.size = Pt(12)
-        for row in table.rows:
-            row.cells[0].width = Inches(1.77165)
-            row.cells[1].width = Inches(7.19)
-        doc.add_paragraph()
+    if doc is None:
+        doc = open_template(template_path)
+    _append_cards(doc, projects, 'iii_a', _build_project_card, III_A_CARD, ranked=True)
     doc.save(output_path)
 
-def create_iii_b_docx(projects, output_path, template_path=None):
+def create_iii_b_docx(projects, output_path, template_path=None, doc=None):
     if template_path is None:
         template_path = r'C:/Users/User/Documents/SOIDProject/assets/III_b.docx'
-    doc = Document(template_path)
-    for project in projects:
-        table = doc.add_table(rows=6, cols=2)
-        table.style = 'Table Grid'
-        table.autofit = False
-        table.allow_autofit = False
-        fields = [
-            ('A.1 NAME/TITLE', project.get('name', '')),
-            ('A.2 OBJECTIVES', project.get('objectives', '')),
-            ('A.3 DURATION', project.get('duration', '')),
-            ('A.4 DELIVERABLES', project.get('deliverables', [])),
-            ('A.5 LEAD AGENCY', project.get('lead_agency', '')),
-            ('A.6 IMPLEMENTING AGENCIES', project.get('implementing_agencies', '')),
-        ]
-        for i, (label, value) in enumerate(fields):
-            table.cell(i, 0).text = label
-            if label == 'A.4 DELIVERABLES':
-                cell = table.cell(i, 1)
-                for para in list(cell.paragraphs):
-                    p = para._element
-                    p.getparent().remove(p)
-                if isinstance(value, str):
-                    value = [v.strip() for v in value.split('\n') if v.strip()]
-                for deliverable in value:
-                    p = cell.add_paragraph(deliverable, style='List Bullet')
-                    p.paragraph_format.left_indent = Pt(0)
-                    cell.add_paragraph('')
-            else:
-                cell = table.cell(i, 1)
-                cell.text = value
-
-        for i in range(6):
-            cell = table.cell(i, 0)
-            for paragraph in cell.paragraphs:
-                for run in paragraph.runs:
-                    run.bold = True
-                    run.font.name = 'Palatino Linotype'
-                    run.font.size = Pt(12)
-            if i == 0:
-                cell = table.cell(i, 1)
-                for paragraph in cell.paragraphs:
-                    for run in paragraph.runs:
-                        run.bold = True
-                        run.font.name = 'Palatino Linotype'
-                        run.font.size = Pt(12)
-        for row in table.rows:
-            row.cells[0].width = Inches(1.77165)
-            row.cells[1].width = Inches(7.19)
-        doc.add_paragraph()
+    if doc is None:
+        doc = open_template(template_path)
+    _append_cards(doc, projects, 'iii_b', _build_project_card, III_B_CARD)
     doc.save(output_path)
 
+LOGFRAME_HEADERS = (
+    "Hierarchy of targeted results",
+    "Objectively verifiable indicators (OVI)",
+    "Baseline data",
+    "Targets",
+    "Data collection methods",
+    "Responsibility to collect data",
+)
+LOGFRAME_WIDTHS = (2.11, 1.97, 0.98, 1.28, 1.05, 1.55)
+LOGFRAME_COLUMNS = ("hierarchy", "ovi", "baseline", "targets", "methods", "responsibility")
+LOGFRAME_SECTIONS = (
+    ('Intermediate Outcome:', 'intermediate'),
+    ('Immediate Outcome:', 'immediate'),
+    ('Outputs:', 'outputs'),
+)
+
+
+def _build_logframe_fragment(doc):
+    """
+    Build the III.C logframe skeleton once: a header-only table with its grid widths
+    set in tblGrid, and an empty body row to clone for every indicator row.
+    """
+    scratch = clone_document(doc)
+    ensure_styles(scratch)
+    table = scratch.add_table(rows=2, cols=len(LOGFRAME_HEADERS))
+    table.style = 'Table Grid'
+    table.autofit = False
+    table.allow_autofit = False
+
+    for col_idx, width in enumerate(LOGFRAME_WIDTHS):
+        table.columns[col_idx].width = Inches(width)
+        for row in table.rows:
+            row.cells[col_idx].width = Inches(width)
+
+    for i, header in enumerate(LOGFRAME_HEADERS):
+        cell = table.cell(0, i)
+        cell.text = header
+        for paragraph in cell.paragraphs:
+            for run in paragraph.runs:
+                style_run(run, COLUMN_HEADER_STYLE)
+    for i in range(len(LOGFRAME_HEADERS)):
+        table.cell(1, i).text = ""
+
+    tbl = table._tbl
+    row = tbl.tr_lst[1]
+    tbl.remove(row)
+    tbl.getparent().remove(tbl)
+    return {'tbl': tbl, 'row': row}
+
+
+def _logframe_row(prototype, row_data, label):
+    tr = copy.deepcopy(prototype)
+    for tc, key in zip(tr.iterchildren(qn('w:tc')), LOGFRAME_COLUMNS):
+        if label is not None:
+            if key == 'hierarchy':
+                tc.find(qn('w:p')).find(qn('w:r')).text = label
+            tc.append(OxmlElement('w:p'))
+        value = row_data.get(key, "")
+        if value:
+            for line in value.splitlines():
+                if line.strip():
+                    p = OxmlElement('w:p')
+                    p.append(OxmlElement('w:r'))
+                    p[0].text = line.strip()
+                    tc.append(p)
+    return tr
+
+
 def create_iiic_logframe_table(data, output_path, doc=None):
     """
     data: dict with keys 'intermediate' (list of dicts), 'immediate', 'outputs'
     doc: optional, an existing Document object to add the table to
+
+    Rows are appended to the tbl element by cloning a prepared row, so a logframe
+    costs time linear in its number of rows. Each section label heads the first cell
+    of its section, above that row's hierarchy text.
     """
     try:
+        save = doc is None and output_path
         if doc is None:
             doc = Document()
-        
-        # Handle the data structure - data should be a single logframe
-        intermediate_rows = data.get("intermediate", [])
-        immediate_rows = data.get("immediate", [])
-        outputs_rows = data.get("outputs", [])
-
-        if not isinstance(intermediate_rows, list):
-            intermediate_rows = [intermediate_rows] if intermediate_rows else []
-        if not isinstance(immediate_rows, list):
-            immediate_rows = [immediate_rows] if immediate_rows else []
-        if not isinstance(outputs_rows, list):
-            outputs_rows = [outputs_rows] if outputs_rows else []
-
-        total_rows = 1 + len(intermediate_rows) + len(immediate_rows) + len(outputs_rows)
-        table = doc.add_table(rows=total_rows, cols=6)
-        table.style = 'Table Grid'
-        table.autofit = False
-        table.allow_autofit = False
-
-        col_widths = [2.11, 1.97, 0.98, 1.28, 1.05, 1.55]
-        for col_idx, width in enumerate(col_widths):
-            for row in table.rows:
-                row.cells[col_idx].width = Inches(width)
-
-        headers = [
-            "Hierarchy of targeted results",
-            "Objectively verifiable indicators (OVI)",
-            "Baseline data",
-            "Targets",
-            "Data collection methods",
-            "Responsibility to collect data"
-        ]
-        for i, header in enumerate(headers):
-            cell = table.cell(0, i)
-            cell.text = header
-            for paragraph in cell.paragraphs:
-                for run in paragraph.runs:
-                    run.bold = True
-                    run.font.size = Pt(11)
-
-        sections = [
-            ('Intermediate Outcome:', intermediate_rows),
-            ('Immediate Outcome:', immediate_rows),
-            ('Outputs:', outputs_rows),
-        ]
-        row_idx = 1
-        for label, rows in sections:
+        ensure_styles(doc)
+        fragment = template_registry.derive(doc, 'logframe', _build_logframe_fragment)
+
+        tbl = copy.deepcopy(fragment['tbl'])
+        for label, key in LOGFRAME_SECTIONS:
+            rows = data.get(key, [])
+            if not isinstance(rows, list):
+                rows = [rows] if rows else []
             for idx, row_data in enumerate(rows):
-                cell = table.cell(row_idx, 0)
-                if idx == 0:
-                    cell.text = label
-                    cell.add_paragraph("")
-                else:
-                    cell.text = ""
-                user_value = row_data.get("hierarchy", "")
-                if user_value:
-                    for line in user_value.splitlines():
-                        if line.strip():
-                            cell.add_paragraph(line.strip())
-                for col, col_key in enumerate(["ovi", "baseline", "targets", "methods", "responsibility"], start=1):
-                    value = row_data.get(col_key, "")
-                    cell = table.cell(row_idx, col)
-                    cell.text = ""
-                    if idx == 0:
-                        cell.add_paragraph("")
-                    if value:
-                        for line in value.splitlines():
-                            if line.strip():
-                                cell.add_paragraph(line.strip())
-                row_idx += 1
-
-        # Only save if no existing document was passed
-        if doc is None and output_path:
+                tbl.append(_logframe_row(fragment['row'], row_data, label if idx == 0 else None))
+
+        body = doc.element.body
+        if body.sectPr is not None:
+            body.sectPr.addprevious(tbl)
+        else:
+            body.append(tbl)
+
+        if save:
             doc.save(output_path)
     
     except Exception as e:
@@ -368,5 +344,3 @@ def create_iiic_logframe_table(data, output_path, doc=None):
         import traceback
         traceback.print_exc()
         raise
-
-    
\ No newline at end of file
@@ -0,0 +1,312 @@
+import os
+import io
+import copy
+import hashlib
+import logging
+import threading
+import zipfile
+from collections import OrderedDict
+from docx import Document
+from docx.opc.part import XmlPart
+from docx.package import Package
+
+logger = logging.getLogger(__name__)
+
+ASSETS_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'assets'))
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_VARIANTS = 32
+
+
+def clone_document(prototype):
+    """
+    Return an independent copy of a parsed python-docx Document.
+
+    XML parts are deep-copied at the lxml level and binary parts (images, embedded
+    objects) share their immutable blobs, so no zip or XML parsing takes place.
+
+    Args:
+        prototype: The Document to copy. It is never modified.
+
+    Returns:
+        Document: A new Document backed by its own Package.
+    """
+    source_package = prototype.part.package
+    source_parts = list(source_package.iter_parts())
+    package = Package()
+    parts = {}
+    for part in source_parts:
+        if isinstance(part, XmlPart):
+            parts[part.partname] = type(part)(
+                part.partname, part.content_type, copy.deepcopy(part._element), package
+            )
+        else:
+            parts[part.partname] = type(part).load(
+                part.partname, part.content_type, part.blob, package
+            )
+
+    sources = [(source_package, package)] + [(part, parts[part.partname]) for part in source_parts]
+    for source, target in sources:
+        for rel in source.rels.values():
+            if rel.is_external:
+                target.load_rel(rel.reltype, rel.target_ref, rel.rId, True)
+            else:
+                target.load_rel(rel.reltype, parts[rel.target_part.partname], rel.rId)
+
+    for part in parts.values():
+        part.after_unmarshal()
+    package.after_unmarshal()
+    return package.main_document_part.document
+
+
+class TemplateRegistry:
+    """
+    In-memory pool of parsed .docx templates.
+
+    Each template is read and parsed once; callers receive a clone of the cached
+    prototype so requests never share XML trees. An entry is revalidated against the
+    file's mtime and size on every lookup and, when those change, against the SHA-256
+    of its contents, so touching a file without editing it does not force a re-parse.
+    Entries are evicted least-recently-used first once the combined uncompressed size
+    of the cached packages exceeds ``max_bytes``.
+
+    Uploaded templates opened with :meth:`open_bytes` share the same LRU, keyed by the
+    SHA-256 of their contents.
+
+    Derived templates (for example a template with its ``${yearRange}`` header already
+    stamped) are kept in a second LRU of at most ``max_variants`` prototypes, keyed by
+    template path, template SHA-256 and a caller-supplied variant key, so editing the
+    template on disk retires every variant built from the old contents.
+    """
+
+    def __init__(self, max_bytes=None, max_variants=None, root=ASSETS_DIR):
+        if max_bytes is None:
+            max_bytes = int(os.environ.get('TEMPLATE_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+        if max_variants is None:
+            max_variants = int(os.environ.get('TEMPLATE_VARIANT_CACHE_SIZE', DEFAULT_MAX_VARIANTS))
+        self.max_bytes = max_bytes
+        self.max_variants = max_variants
+        self.root = root
+        self._entries = OrderedDict()
+        self._variants = OrderedDict()
+        self._versions = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def is_cacheable(self, template_path):
+        path = os.path.abspath(template_path)
+        return os.path.commonpath([path, self.root]) == self.root
+
+    def open(self, template_path):
+        """
+        Return a fresh Document for `template_path`.
+
+        Paths outside the registry root (uploads, scratch files) are opened directly
+        and never cached.
+        """
+        if not self.is_cacheable(template_path):
+            return Document(template_path)
+        path = os.path.abspath(template_path)
+        entry = self._get_entry(path)
+        return self._clone(entry, (path, entry['sha256'], None))
+
+    def open_bytes(self, data):
+        """
+        Return a fresh Document for an uploaded template, parsed once per content.
+
+        Args:
+            data: The .docx file as bytes
+        """
+        sha256 = hashlib.sha256(data).hexdigest()
+        key = f'sha256:{sha256}'
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            logger.debug(f"[TEMPLATES] Parsing uploaded template {sha256[:12]}")
+            entry = self._insert(key, self._parse(data, sha256))
+        return self._clone(entry, (key, sha256, None))
+
+    def open_variant(self, template_path, variant, build):
+        """
+        Return a fresh Document for a derived version of `template_path`.
+
+        Args:
+            template_path: Path to the base template
+            variant: Hashable key identifying the derivation, e.g. ('yearRange', '2025-2027')
+            build: Callable that mutates a Document into the variant; it runs once per
+                template version and variant key
+
+        Returns:
+            Document: A clone of the cached variant prototype
+        """
+        if not self.is_cacheable(template_path):
+            doc = Document(template_path)
+            build(doc)
+            return doc
+
+        path = os.path.abspath(template_path)
+        entry = self._get_entry(path)
+        key = (path, entry['sha256'], variant)
+        with self._lock:
+            variant_entry = self._variants.get(key)
+            if variant_entry is not None:
+                self._variants.move_to_end(key)
+        if variant_entry is None:
+            logger.debug(f"[TEMPLATES] Building variant {variant} of {path}")
+            prototype = clone_document(entry['prototype'])
+            build(prototype)
+            variant_entry = {'prototype': prototype, 'derived': {}}
+            with self._lock:
+                self._variants[key] = variant_entry
+                while len(self._variants) > self.max_variants:
+                    self._variants.popitem(last=False)
+        return self._clone(variant_entry, key)
+
+    def derive(self, doc, name, build):
+        """
+        Return `build(doc)`, computed once per template version for registry documents.
+
+        For a Document handed out by :meth:`open` or :meth:`open_variant`, `build` runs
+        on the cached prototype and its result is memoized under `name`, so it must only
+        depend on the unmodified template (e.g. an index of element positions). Any
+        other Document is passed to `build` directly.
+        """
+        key = getattr(doc, '_template_key', None)
+        if key is None:
+            return build(doc)
+        with self._lock:
+            if key[2] is None:
+                entry = self._entries.get(key[0])
+                if entry is not None and entry['sha256'] != key[1]:
+                    entry = None
+            else:
+                entry = self._variants.get(key)
+            if entry is not None and name in entry['derived']:
+                return entry['derived'][name]
+        if entry is None:
+            return build(doc)
+        result = build(entry['prototype'])
+        with self._lock:
+            entry['derived'][name] = result
+        return result
+
+    def memoize(self, template_path, name, build):
+        """
+        Return `build()`, computed once per version of `template_path` and kept until the
+        template changes or is evicted.
+        """
+        entry = self._get_entry(template_path)
+        with self._lock:
+            if name in entry['derived']:
+                return entry['derived'][name]
+        result = build()
+        with self._lock:
+            entry['derived'][name] = result
+        return result
+
+    def version(self, template_path):
+        """
+        Return the SHA-256 hex digest of the current contents of `template_path`.
+
+        The digest is revalidated against the file's mtime and size like cache entries
+        are, but computing it never parses the template, so it is cheap enough to call
+        on the event loop.
+        """
+        path = os.path.abspath(template_path)
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry['mtime'] == stat.st_mtime_ns and entry['file_size'] == stat.st_size:
+                return entry['sha256']
+            known = self._versions.get(path)
+            if known is not None and known[:2] == (stat.st_mtime_ns, stat.st_size):
+                return known[2]
+        with open(path, 'rb') as f:
+            sha256 = hashlib.sha256(f.read()).hexdigest()
+        with self._lock:
+            self._versions[path] = (stat.st_mtime_ns, stat.st_size, sha256)
+        return sha256
+
+    def preload(self, template_path):
+        """Parse `template_path` into the cache unless its current version is there."""
+        self._get_entry(template_path)
+
+    def discard(self, template_path):
+        with self._lock:
+            entry = self._entries.pop(os.path.abspath(template_path), None)
+            if entry is not None:
+                self._total_bytes -= entry['size']
+            self._discard_variants(os.path.abspath(template_path))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._variants.clear()
+            self._versions.clear()
+            self._total_bytes = 0
+
+    def _get_entry(self, template_path):
+        path = os.path.abspath(template_path)
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry['mtime'] == stat.st_mtime_ns and entry['file_size'] == stat.st_size:
+                self._entries.move_to_end(path)
+                return entry
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        sha256 = hashlib.sha256(data).hexdigest()
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry['sha256'] == sha256:
+                entry['mtime'] = stat.st_mtime_ns
+                entry['file_size'] = stat.st_size
+                self._entries.move_to_end(path)
+                return entry
+
+        logger.debug(f"[TEMPLATES] Parsing template {path}")
+        entry = self._parse(data, sha256)
+        entry['mtime'] = stat.st_mtime_ns
+        entry['file_size'] = stat.st_size
+        return self._insert(path, entry)
+
+    def _parse(self, data, sha256):
+        stream = io.BytesIO(data)
+        with zipfile.ZipFile(stream) as zf:
+            size = sum(info.file_size for info in zf.infolist())
+        return {'prototype': Document(stream), 'derived': {}, 'sha256': sha256, 'size': size}
+
+    def _insert(self, key, entry):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._total_bytes -= previous['size']
+                self._discard_variants(key)
+            self._entries[key] = entry
+            self._total_bytes += entry['size']
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                evicted_path, evicted = self._entries.popitem(last=False)
+                self._total_bytes -= evicted['size']
+                self._discard_variants(evicted_path)
+                logger.debug(f"[TEMPLATES] Evicted {evicted_path}")
+        return entry
+
+    def _clone(self, entry, key):
+        doc = clone_document(entry['prototype'])
+        doc._template_key = key
+        return doc
+
+    def _discard_variants(self, path):
+        for key in [key for key in self._variants if key[0] == path]:
+            del self._variants[key]
+
+
+template_registry = TemplateRegistry()
+
+
+def open_template(template_path):
+    """Return a fresh Document for `template_path` from the shared registry."""
+    return template_registry.open(template_path)
@@ -0,0 +1,8 @@
+import pytest
+from server.jobs import job_runner
+
+
+@pytest.fixture
+def inline_jobs(monkeypatch):
+    """Run the app's document jobs on the calling thread."""
+    monkeypatch.setattr(job_runner, 'kind', 'inline')
@@ -0,0 +1,73 @@
+import os
+import time
+import hashlib
+import pytest
+from fastapi.testclient import TestClient
+from server import main
+from server.artifact_store import ArtifactStore, ArtifactTooLarge, year_range_key
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ArtifactStore(str(tmp_path), cache_max_bytes=0, ttl=3600, max_object_bytes=100, max_bytes=250)
+
+
+def age(store, artifact_id, seconds):
+    then = time.time() - seconds
+    os.utime(store._object_path(artifact_id), (then, then))
+
+
+def test_put_get_by_content_hash(store):
+    artifact_id = store.put(b'document')
+    assert artifact_id == hashlib.sha256(b'document').hexdigest()
+    assert store.put(b'document') == artifact_id
+    assert store.get(artifact_id) == b'document'
+    assert store.get('0' * 64) is None
+    assert store.get('../etc/passwd') is None
+
+
+def test_missing(store):
+    stored = store.put(b'stored')
+    absent = hashlib.sha256(b'absent').hexdigest()
+    assert store.missing([absent, stored, 'not-an-id']) == [absent, 'not-an-id']
+
+
+def test_resolve_plan_parts(store):
+    first = store.put(b'first', year_range='2729', part='ia')
+    assert year_range_key('2027 - 2029') == '2027-2029'
+    assert store.resolve('2027 - 2029', 'ia') == first
+    second = store.put(b'second', year_range='2027-2029', part='ia')
+    assert store.resolve('2729', 'ia') == second
+    assert store.resolve('2729', 'iib') is None
+    with pytest.raises(ValueError):
+        store.put(b'third', year_range='2729', part='../ia')
+
+
+def test_expired_artifacts_and_refs_are_gone(store):
+    artifact_id = store.put(b'old', year_range='2729', part='ia')
+    age(store, artifact_id, store.ttl + 1)
+    assert store.get(artifact_id) is None
+    assert store.resolve('2729', 'ia') is None
+    assert store.missing([artifact_id]) == [artifact_id]
+    assert not os.path.exists(store._object_path(artifact_id))
+
+
+def test_size_limits(store):
+    with pytest.raises(ArtifactTooLarge):
+        store.put(b'x' * 101)
+    ids = [store.put(bytes([i]) * 100) for i in range(2)]
+    age(store, ids[0], 60)
+    age(store, ids[1], 30)
+    store.missing([ids[0]])  # Counts as stored again, so ids[1] is now the oldest
+    newest = store.put(b'y' * 100)
+    assert [store.get(artifact_id) is not None for artifact_id in ids + [newest]] == [True, False, True]
+
+
+def test_get_artifact_revalidation(store, monkeypatch):
+    monkeypatch.setattr(main, 'artifact_store', store)
+    client = TestClient(main.app)
+    stored = store.put(b'stored')
+    absent = hashlib.sha256(b'absent').hexdigest()
+    assert client.get(f'/artifacts/{stored}', headers={'if-none-match': f'"{stored}"'}).status_code == 304
+    assert client.get(f'/artifacts/{absent}', headers={'if-none-match': f'"{absent}"'}).status_code == 404
+    assert client.get(f'/artifacts/{absent}', headers={'if-none-match': '*'}).status_code == 404
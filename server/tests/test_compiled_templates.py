@@ -0,0 +1,49 @@
+import io
+import pytest
+from server import compiled_templates
+from server.compiled_templates import compile_template, render_compiled_template
+from server.main import (
+    PART_IA_SLOT_TYPES, PART_IA_TEMPLATE, PART_IB_TEMPLATE,
+    fill_part_ia, generate_part_ia, part_ia_replacements, part_ib_data,
+)
+from server.part_ib_handler import fill_part_ib_docx, generate_part_ib_docx
+
+Image = pytest.importorskip('PIL.Image')
+
+
+def org_chart():
+    buffer = io.BytesIO()
+    Image.effect_noise((400, 300), 64).convert('RGB').save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def test_part_ia_matches_python_docx(monkeypatch):
+    replacements = part_ia_replacements({
+        'documentName': 'Plan & <Programs>',
+        'legalBasis': 'RA 1\tRA 2\nEO 3',
+        'visionStatement': '\tA vision\n with a break',
+        'missionStatement': ' A mission ',
+        'framework': 'Framework\t',
+        'pillar': 'Pillar',
+    }, '2027 - 2029')
+    values = {ph[2:-1]: value for ph, value in replacements.items()}
+    assert render_compiled_template(
+        PART_IA_TEMPLATE, 'part_ia', fill_part_ia, values, slot_types=PART_IA_SLOT_TYPES,
+    ) is not None
+    compiled = generate_part_ia(replacements)
+    monkeypatch.setattr(compiled_templates, 'COMPILED_TEMPLATES_ENABLED', False)
+    assert generate_part_ia(replacements) == compiled
+
+
+def test_part_ib_matches_python_docx(monkeypatch):
+    slots = compile_template(PART_IB_TEMPLATE, fill_part_ib_docx, image_slot='organizationalStructure').slots
+    data = part_ib_data({name: f'{name} & more' for name in slots} | {'mooe': '1500000'}, '2027 - 2029')
+    image = org_chart()
+    values = {key: value for key, value in data.items() if key != 'organizationalStructure'}
+    assert render_compiled_template(
+        PART_IB_TEMPLATE, 'part_ib', fill_part_ib_docx, values,
+        image_slot='organizationalStructure', image=image,
+    ) is not None
+    compiled = generate_part_ib_docx(data, PART_IB_TEMPLATE, image)
+    monkeypatch.setattr(compiled_templates, 'COMPILED_TEMPLATES_ENABLED', False)
+    assert generate_part_ib_docx(data, PART_IB_TEMPLATE, image) == compiled
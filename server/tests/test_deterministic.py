@@ -0,0 +1,57 @@
+import io
+import os
+import asyncio
+import zipfile
+from datetime import datetime
+import pytest
+from docx import Document
+from server.deterministic import ZIP_DATE_TIME, normalize_docx
+from server.main import merge_documents, merge_tree
+from server.merge_cache import merge_cache
+from server.section_merge import MERGE_BACKENDS
+from server.template_registry import ASSETS_DIR
+
+PARTS = ('II_b.docx', 'III_a.docx', 'IV_b.docx', 'II_a.docx')
+
+
+def read_asset(name):
+    with open(os.path.join(ASSETS_DIR, name), 'rb') as f:
+        return f.read()
+
+
+def saved(doc):
+    output = io.BytesIO()
+    doc.save(output)
+    return output.getvalue()
+
+
+def test_normalize_docx_ignores_save_time():
+    first = Document(os.path.join(ASSETS_DIR, 'II_a.docx'))
+    second = Document(os.path.join(ASSETS_DIR, 'II_a.docx'))
+    first.core_properties.modified = datetime(2024, 1, 1)
+    second.core_properties.modified = datetime(2025, 6, 30, 12, 0, 0)
+    normalized = normalize_docx(saved(first))
+    assert normalized == normalize_docx(saved(second))
+    assert normalize_docx(normalized) == normalized
+    with zipfile.ZipFile(io.BytesIO(normalized)) as zf:
+        assert zf.namelist()[0] == '[Content_Types].xml'
+        assert {info.date_time for info in zf.infolist()} == {ZIP_DATE_TIME}
+
+
+@pytest.mark.parametrize('backend', MERGE_BACKENDS)
+def test_merge_is_byte_identical_across_runs(backend):
+    blobs = [read_asset(name) for name in PARTS]
+    assert merge_documents(blobs, backend) == merge_documents(blobs, backend)
+
+
+@pytest.mark.parametrize('backend', MERGE_BACKENDS)
+def test_merge_bytes_do_not_depend_on_cache_history(backend, inline_jobs):
+    blobs = [read_asset(name) for name in PARTS]
+    merge_cache.clear()
+    tree = asyncio.run(merge_tree(blobs, backend, fan_in=2))
+    flat = asyncio.run(merge_tree(blobs, backend, fan_in=len(blobs)))
+    merge_cache.clear()
+    assert asyncio.run(merge_tree(blobs, backend, fan_in=len(blobs))) == flat
+    assert asyncio.run(merge_tree(blobs, backend, fan_in=2)) == tree
+    assert flat == merge_documents(blobs, backend)
+    merge_cache.clear()
@@ -0,0 +1,43 @@
+import os
+from docx import Document
+from docx.oxml import parse_xml
+from docxcompose.properties import CustomProperties
+from server.doc_properties import index_docprop_fields, set_document_properties
+from server.main import fill_placeholders
+from server.template_registry import ASSETS_DIR, TemplateRegistry
+
+W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+
+
+def field_template(path):
+    # A DOCPROPERTY yearRange field in the body and a legacy ${yearRange} token in the header
+    doc = Document(os.path.join(ASSETS_DIR, 'II_a.docx'))
+    doc.add_paragraph()._p.append(parse_xml(
+        f'<w:fldSimple {W} w:instr=" DOCPROPERTY &quot;yearRange&quot; \\* MERGEFORMAT ">'
+        '<w:r><w:t>old</w:t></w:r></w:fldSimple>'
+    ))
+    doc.sections[0].header.add_paragraph('Plan ${yearRange}')
+    doc.save(path)
+    return path
+
+
+def texts(element):
+    return [t.text for t in element.iter('{http://schemas.openxmlformats.org/wordprocessingml/2006/main}t')]
+
+
+def test_field_and_token_for_the_same_name_are_both_filled(tmp_path):
+    doc = Document(field_template(str(tmp_path / 'fields.docx')))
+    fill_placeholders(doc, {'${yearRange}': '2027-2029'})
+    assert CustomProperties(doc)['yearRange'] == '2027-2029'
+    assert '2027-2029' in texts(doc.element.body)
+    header = ''.join(texts(doc.sections[0].header._element))
+    assert 'Plan 2027-2029' in header and '${yearRange}' not in header
+
+
+def test_field_index_is_memoized_per_template(tmp_path):
+    registry = TemplateRegistry(root=str(tmp_path))
+    path = field_template(str(tmp_path / 'fields.docx'))
+    doc = registry.open(path)
+    assert registry.derive(doc, 'docprops', index_docprop_fields) == index_docprop_fields(doc)
+    assert index_docprop_fields(Document(os.path.join(ASSETS_DIR, 'II_a.docx'))) == []
+    assert set_document_properties(Document(os.path.join(ASSETS_DIR, 'II_a.docx')), {'yearRange': 'x'}) == set()
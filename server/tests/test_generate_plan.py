@@ -0,0 +1,84 @@
+import io
+import os
+import json
+import base64
+import zipfile
+import pytest
+from docx import Document
+from fastapi.testclient import TestClient
+from server import main
+from server.artifact_store import ArtifactStore
+from server.template_registry import ASSETS_DIR
+
+PARTS = {
+    'ia': {'visionStatement': 'Plan vision', 'framework': 'A framework'},
+    'ib': {'plannerName': 'Ana Cruz'},
+    'iib': {'systems': [{'name_of_system': 'Payroll System'}]},
+    'iiia': [{'name': 'Records Project'}],
+    'iiic': {'intermediate': [{'hierarchy': 'Better services'}]},
+}
+
+
+@pytest.fixture
+def client(inline_jobs):
+    return TestClient(main.app)
+
+
+def read_asset(name):
+    with open(os.path.join(ASSETS_DIR, name), 'rb') as f:
+        return base64.b64encode(f.read()).decode('ascii')
+
+
+def text(data):
+    doc = Document(io.BytesIO(data))
+    cells = [cell.text for table in doc.tables for row in table.rows for cell in row.cells]
+    return '\n'.join([p.text for p in doc.paragraphs] + cells)
+
+
+@pytest.mark.parametrize('backend', main.MERGE_BACKENDS)
+def test_plan_parts_are_generated_and_merged(client, backend):
+    response = client.post('/generate-plan', json={
+        'yearRange': '2027-2029',
+        'parts': PARTS,
+        'documents': {'iva': read_asset('IV_a.docx')},
+        'mergeAll': True,
+        'mergeBackend': backend,
+    })
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.content)) as zf:
+        assert zf.namelist() == ['part_i.docx', 'part_ii.docx', 'part_iii.docx', 'part_iv.docx', 'plan.docx']
+        entries = {name: zf.read(name) for name in zf.namelist()}
+    part_i = text(entries['part_i.docx'])
+    assert 'Plan vision' in part_i and 'Ana Cruz' in part_i
+    assert 'Payroll System' in text(entries['part_ii.docx'])
+    part_iii = text(entries['part_iii.docx'])
+    assert 'Records Project' in part_iii and 'Better services' in part_iii
+    plan = text(entries['plan.docx'])
+    order = [plan.index(value) for value in ('Plan vision', 'Payroll System', 'Records Project')]
+    assert order == sorted(order)
+
+
+def test_plan_parts_are_stored(client, tmp_path, monkeypatch):
+    store = ArtifactStore(str(tmp_path), cache_max_bytes=0)
+    monkeypatch.setattr(main, 'artifact_store', store)
+    response = client.post('/generate-plan?store=1', json={'yearRange': '2027-2029', 'parts': {'ia': PARTS['ia']}})
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.content)) as zf:
+        stored = json.loads(zf.read('artifacts.json'))
+        part_i = zf.read('part_i.docx')
+    assert set(stored) == {'ia'}
+    assert store.resolve('2027-2029', 'ia') == stored['ia']
+    # A single-part group is the part itself
+    assert store.get(stored['ia']) == part_i
+
+
+@pytest.mark.parametrize('body', [
+    {'parts': {'v': {}}},
+    {'parts': {'ic': {}}},
+    {'parts': {'iia': {'images': []}}},
+    {'documents': {'ic': 'not base64!'}},
+    {'parts': {'ia': {}}, 'mergeBackend': 'other'},
+    {},
+])
+def test_invalid_plans(client, body):
+    assert client.post('/generate-plan', json=body).status_code == 400
@@ -0,0 +1,42 @@
+import io
+import asyncio
+import pytest
+from docx.shared import Inches
+from server import images
+from server.images import normalize_image
+from server.jobs import JobRunner, SHARED_MEMORY_MIN_BYTES
+
+Image = pytest.importorskip('PIL.Image')
+
+
+def noisy_jpeg(size=(1200, 800)):
+    # Noise does not compress, so the file is large enough for shared memory
+    buffer = io.BytesIO()
+    Image.effect_noise(size, 64).convert('RGB').save(buffer, 'JPEG', quality=95)
+    return buffer.getvalue()
+
+
+def test_memo_does_not_keep_the_callers_buffer():
+    data = b'not an image' * 10
+    images._cache.clear()
+    view = memoryview(bytearray(data))
+    first = normalize_image(view, Inches(6))
+    view.release()
+    assert type(first) is bytes
+    assert normalize_image(data, Inches(6)) == first == data
+
+
+def test_normalized_image_is_stable():
+    normalized = normalize_image(noisy_jpeg(), Inches(2))
+    assert normalize_image(normalized, Inches(2)) == normalized
+
+
+def test_repeated_image_through_process_worker():
+    data = noisy_jpeg()
+    assert len(data) >= SHARED_MEMORY_MIN_BYTES
+    runner = JobRunner(kind='process', workers=1)
+    try:
+        results = [asyncio.run(runner.run(normalize_image, data, Inches(8))) for _ in range(3)]
+    finally:
+        runner.shutdown()
+    assert results[0] == results[1] == results[2]
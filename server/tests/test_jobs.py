@@ -0,0 +1,49 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from server.jobs import JobError, JobRunner, SHARED_MEMORY_MIN_BYTES
+
+# Large enough to travel through shared memory with a process runner
+PAYLOAD = bytes(range(256)) * (SHARED_MEMORY_MIN_BYTES // 256 + 1)
+
+_kept = []
+
+
+def echo(*args):
+    return args
+
+
+def keep_first(data):
+    # Holds on to its input across jobs, as a memoizing job does
+    _kept.append(data)
+    return bytes(_kept[0])
+
+
+def fail(status_code):
+    raise JobError(status_code, "failed")
+
+
+@pytest.fixture(params=['inline', 'thread', 'process'])
+def runner(request):
+    runner = JobRunner(kind=request.param, workers=1)
+    yield runner
+    runner.shutdown()
+
+
+def test_round_trips_large_and_nested_payloads(runner):
+    args = (PAYLOAD, [PAYLOAD, b'small'], {'image': PAYLOAD}, 'text')
+    result = asyncio.run(runner.run(echo, *args))
+    assert result == args
+
+
+def test_jobs_may_keep_their_inputs(runner):
+    _kept.clear()
+    first = asyncio.run(runner.run(keep_first, PAYLOAD))
+    second = asyncio.run(runner.run(keep_first, PAYLOAD[::-1]))
+    assert first == second == PAYLOAD
+
+
+def test_job_error_becomes_http_exception(runner):
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(runner.run(fail, 422))
+    assert excinfo.value.status_code == 422
@@ -0,0 +1,65 @@
+import io
+import json
+import base64
+import zipfile
+import pytest
+from fastapi.testclient import TestClient
+from server.main import app
+
+Image = pytest.importorskip('PIL.Image')
+
+FIELDS = {'plannerName': 'Ana Cruz', 'organizationalUnit': 'ICT Division', 'mooe': '1500000'}
+
+
+@pytest.fixture
+def client(inline_jobs):
+    return TestClient(app)
+
+
+@pytest.fixture(scope='module')
+def chart():
+    buffer = io.BytesIO()
+    Image.effect_noise((600, 400), 64).convert('RGB').save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def members(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        return {name: zf.read(name) for name in zf.namelist()}
+
+
+def media(data):
+    return [name for name in members(data) if name.startswith('word/media/')]
+
+
+def test_multipart_upload_matches_base64_json(client, chart):
+    headers = {'yearrange': '2027-2029'}
+    multipart = client.post(
+        '/generate-ib-docx/',
+        data={'data': json.dumps(FIELDS)},
+        files={'organizationalStructure': ('chart.jpg', chart, 'image/jpeg')},
+        headers=headers,
+    )
+    assert multipart.status_code == 200
+    document = members(multipart.content)
+    assert b'Ana Cruz' in document['word/document.xml']
+    assert b'1,500,000' in document['word/document.xml']
+    assert len(media(multipart.content)) == 2
+
+    body = dict(FIELDS, organizationalStructure=base64.b64encode(chart).decode('ascii'))
+    as_json = client.post('/generate-ib-docx/', json=body, headers=headers)
+    assert as_json.status_code == 200
+    assert as_json.content == multipart.content
+
+
+def test_multipart_without_chart(client):
+    response = client.post('/generate-ib-docx/', data={'data': json.dumps(FIELDS)})
+    assert response.status_code == 200
+    # Only the template's own image
+    assert len(media(response.content)) == 1
+
+
+@pytest.mark.parametrize('data', ['not json', '["a list"]'])
+def test_multipart_data_must_be_a_json_object(client, data):
+    response = client.post('/generate-ib-docx/', data={'data': data})
+    assert response.status_code == 400
@@ -0,0 +1,80 @@
+import pytest
+from docx import Document
+from server.placeholders import fill_placeholders, index_placeholders
+from server.template_registry import template_registry
+from server.main import PART_IA_TEMPLATE
+
+
+def paragraph(doc, *texts):
+    para = doc.add_paragraph()
+    for text in texts:
+        para.add_run(text)
+    return para
+
+
+def test_tokens_split_across_runs():
+    doc = Document()
+    para = paragraph(doc, 'Dear ${first', 'Name} ${last', '', 'Name}, ${unknown}')
+    para.runs[0].bold = True
+    assert fill_placeholders(doc, {'firstName': 'Ana', 'lastName': 'Cruz'}) == 1
+    assert para.text == 'Dear Ana Cruz, ${unknown}'
+    # The value takes the formatting of the run its token starts in
+    assert para.runs[0].text == 'Dear Ana' and para.runs[0].bold
+
+
+def test_run_formats_put_the_value_in_its_own_run():
+    doc = Document()
+    para = paragraph(doc, 'Year: ${year} (${note})')
+    fill_placeholders(doc, {'year': '2027', 'note': 'draft'}, run_formats={'year': lambda run: setattr(run, 'bold', True)})
+    assert para.text == 'Year: 2027 (draft)'
+    assert [(run.text, bool(run.bold)) for run in para.runs] == [('Year: ', False), ('2027', True), (' (draft)', False)]
+
+
+def test_kinds_and_on_fill():
+    doc = Document()
+    body = paragraph(doc, '${name}')
+    cell = doc.add_table(rows=1, cols=1).cell(0, 0).paragraphs[0]
+    cell.add_run('${name}')
+    header = doc.sections[0].header.paragraphs[0]
+    header.add_run('${name}')
+
+    assert sorted(kind for _, _, kind, _ in index_placeholders(doc)) == ['body', 'header', 'table']
+
+    filled = []
+    count = fill_placeholders(
+        doc, {'name': 'X'}, kinds=('body', 'header'),
+        on_fill=lambda para, kind, names: filled.append((para.text, kind, names)),
+    )
+    assert count == 2
+    assert sorted(filled) == [('X', 'body', {'name'}), ('X', 'header', {'name'})]
+    assert (body.text, cell.text, header.text) == ('X', '${name}', 'X')
+
+
+def test_registry_documents_reuse_the_template_index():
+    first = template_registry.open(PART_IA_TEMPLATE)
+    second = template_registry.open(PART_IA_TEMPLATE)
+    names = {name for _, _, _, found in index_placeholders(first) for name in found}
+    assert names
+    values = {name: f'<{name}>' for name in names}
+    assert fill_placeholders(first, values) == fill_placeholders(second, values) > 0
+    texts = [p.text for p in first.paragraphs]
+    assert texts == [p.text for p in second.paragraphs]
+    assert not any('${' in text for text in texts)
+
+
+def test_stale_index_falls_back_to_reindexing():
+    doc = template_registry.open(PART_IA_TEMPLATE)
+    # Shift every body paragraph so the indexed paths point elsewhere
+    body = doc.element.body
+    body.insert(0, body.makeelement(body[0].tag, {}))
+    names = {name for _, _, _, found in index_placeholders(doc) for name in found}
+    fill_placeholders(doc, {name: 'v' for name in names})
+    assert not any('${' in p.text for p in doc.paragraphs)
+
+
+@pytest.mark.parametrize('value', [0, 12.5])
+def test_non_string_values(value):
+    doc = Document()
+    para = paragraph(doc, '${n}')
+    fill_placeholders(doc, {'n': value})
+    assert para.text == str(value)
@@ -0,0 +1,66 @@
+import os
+import pytest
+from fastapi.testclient import TestClient
+from server.main import app
+from server.response_cache import ResponseCache, etag_matches
+from server.template_registry import ASSETS_DIR
+
+PART_IA = {
+    'documentName': 'Plan',
+    'legalBasis': 'Basis',
+    'visionStatement': 'Vision',
+    'missionStatement': 'Mission',
+    'framework': 'Framework',
+    'pillar': 'Pillar',
+}
+
+
+@pytest.fixture
+def client(inline_jobs):
+    return TestClient(app)
+
+
+def generate(client, body, **headers):
+    return client.post('/generate-ia-docx/', json=body, headers={'yearrange': '2027-2029', **headers})
+
+
+def test_etag_round_trip(client):
+    first = generate(client, PART_IA)
+    assert first.status_code == 200
+    etag = first.headers['etag']
+
+    revalidated = generate(client, PART_IA, **{'if-none-match': etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers['etag'] == etag
+    assert revalidated.content == b''
+
+    repeated = generate(client, PART_IA)
+    assert repeated.headers['etag'] == etag
+    assert repeated.content == first.content
+
+    changed = generate(client, dict(PART_IA, pillar='Other'), **{'if-none-match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['etag'] != etag
+
+
+def test_convert_docx_etag_round_trip(client):
+    with open(os.path.join(ASSETS_DIR, 'II_a.docx'), 'rb') as f:
+        files = {'file': ('II_a.docx', f.read())}
+    first = client.post('/convert-docx', files=files)
+    assert first.status_code == 200
+    revalidated = client.post('/convert-docx', files=files, headers={'if-none-match': first.headers['etag']})
+    assert revalidated.status_code == 304
+
+
+def test_etag_matches():
+    assert etag_matches('"a", "b"', '"b"')
+    assert etag_matches('W/"b"', '"b"')
+    assert etag_matches('*', '"b"')
+    assert not etag_matches('"a"', '"b"')
+    assert not etag_matches(None, '"b"')
+
+
+def test_key_ignores_payload_key_order():
+    first = ResponseCache.key('/x', ['v1'], [{'a': 1, 'b': b'image'}])
+    assert first == ResponseCache.key('/x', ['v1'], [{'b': b'image', 'a': 1}])
+    assert first != ResponseCache.key('/x', ['v2'], [{'a': 1, 'b': b'image'}])
@@ -0,0 +1,124 @@
+import io
+import asyncio
+import zipfile
+import pytest
+from docx import Document
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+from docx.shared import Inches
+from server.main import merge_tree
+from server.section_merge import SectionMerger
+
+Image = pytest.importorskip('PIL.Image')
+
+BULLET = 1
+NUMBERED = 2
+
+
+def png(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def numbering(nsid):
+    # Every part defines the same two lists under the same IDs, with its own nsids
+    return parse_xml(
+        f'<w:numbering {nsdecls("w")}>'
+        f'<w:abstractNum w:abstractNumId="0"><w:nsid w:val="{nsid:08X}"/>'
+        '<w:lvl w:ilvl="0"><w:numFmt w:val="bullet"/><w:lvlText w:val="-"/></w:lvl></w:abstractNum>'
+        f'<w:abstractNum w:abstractNumId="1"><w:nsid w:val="{nsid + 1:08X}"/>'
+        '<w:lvl w:ilvl="0"><w:start w:val="1"/><w:numFmt w:val="decimal"/><w:lvlText w:val="%1."/></w:lvl>'
+        '</w:abstractNum>'
+        f'<w:num w:numId="{BULLET}"><w:abstractNumId w:val="0"/></w:num>'
+        f'<w:num w:numId="{NUMBERED}"><w:abstractNumId w:val="1"/></w:num>'
+        '</w:numbering>'
+    )
+
+
+def part(title, image, seed):
+    doc = Document()
+    doc.part.numbering_part._element = numbering(seed * 16)
+    heading = doc.add_paragraph(title)
+    heading._p.insert(0, parse_xml(f'<w:bookmarkStart {nsdecls("w")} w:id="0" w:name="{title}"/>'))
+    heading._p.append(parse_xml(f'<w:bookmarkEnd {nsdecls("w")} w:id="0"/>'))
+    for num_id in (BULLET, NUMBERED):
+        p = doc.add_paragraph(f'{title} item')
+        p._p.get_or_add_pPr().get_or_add_numPr().get_or_add_numId().val = num_id
+    doc.add_picture(io.BytesIO(image), width=Inches(1))
+    return doc
+
+
+def saved(doc):
+    output = io.BytesIO()
+    doc.save(output)
+    return output.getvalue()
+
+
+def check_ids(doc):
+    """Assert the merged document's numbering, drawing and bookmark IDs are unique."""
+    numbering = doc.part.numbering_part.element
+    num_ids = [num.get(qn('w:numId')) for num in numbering.iter(qn('w:num'))]
+    abstract_nums = list(numbering.iter(qn('w:abstractNum')))
+    assert len(set(num_ids)) == len(num_ids)
+    assert len({a.get(qn('w:abstractNumId')) for a in abstract_nums}) == len(abstract_nums)
+    nsids = [nsid.get(qn('w:val')) for nsid in numbering.iter(qn('w:nsid'))]
+    assert len(set(nsids)) == len(nsids)
+    used = {node.get(qn('w:val')) for node in doc.element.body.iter(qn('w:numId'))}
+    assert used <= set(num_ids)
+
+    body = doc.element.body
+    doc_pr_ids = [node.get('id') for node in body.iter(qn('wp:docPr'))]
+    assert len(set(doc_pr_ids)) == len(doc_pr_ids)
+    starts = [node.get(qn('w:id')) for node in body.iter(qn('w:bookmarkStart'))]
+    ends = [node.get(qn('w:id')) for node in body.iter(qn('w:bookmarkEnd'))]
+    assert len(set(starts)) == len(starts)
+    assert sorted(starts) == sorted(ends)
+    return numbering
+
+
+def media(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        return [name for name in zf.namelist() if name.startswith('word/media/')]
+
+
+def list_items(doc):
+    # (text, numId) of every numbered paragraph, in document order
+    return [
+        (p.text, p._p.pPr.numPr.numId.val)
+        for p in doc.paragraphs if p._p.pPr is not None and p._p.pPr.numPr is not None
+    ]
+
+
+def test_appended_parts_get_unique_ids_and_shared_images():
+    red, blue = png('red'), png('blue')
+    merger = SectionMerger(part('A', red, 1))
+    merger.append(part('B', red, 2))
+    merger.append(part('C', blue, 3))
+    merged = saved(merger.doc)
+    doc = Document(io.BytesIO(merged))
+
+    assert len(doc.sections) == 3
+    assert len(media(merged)) == 2
+    numbering = check_ids(doc)
+
+    # Identical bullet lists share one definition; numbered lists restart in each part
+    bullets = [num for _, num in list_items(doc)[0::2]]
+    numbers = [num for _, num in list_items(doc)[1::2]]
+    assert len(set(bullets)) == 1
+    assert len(set(numbers)) == 3
+    abstract_of = {num.numId: num.abstractNumId.val for num in numbering.iter(qn('w:num'))}
+    assert len({abstract_of[num] for num in numbers}) == 3
+
+
+def test_tree_merge_keeps_ids_unique(inline_jobs):
+    images = [png('red'), png('red'), png('blue'), png('red'), png('blue')]
+    blobs = [saved(part(title, image, i + 1)) for i, (title, image) in enumerate(zip('ABCDE', images))]
+    merged = asyncio.run(merge_tree(blobs, 'section', fan_in=2))
+    doc = Document(io.BytesIO(merged))
+    assert len(doc.sections) == 5
+    assert len(media(merged)) == 2
+    check_ids(doc)
+    assert len({num for _, num in list_items(doc)[0::2]}) == 1
+    assert len({num for _, num in list_items(doc)[1::2]}) == 5
+    assert [p.text for p in doc.paragraphs if len(p.text) == 1] == list('ABCDE')
@@ -0,0 +1,103 @@
+import io
+import os
+from docx import Document
+from server.tables import (
+    IIB_CARD, III_B_CARD, LOGFRAME_HEADERS,
+    create_iib_docx, create_iii_a_docx, create_iii_b_docx, create_iiic_logframe_table,
+)
+from server.template_registry import ASSETS_DIR, open_template, template_registry
+
+SYSTEMS = [
+    {
+        'name_of_system': 'Payroll',
+        'description': 'Computes pay\n\nPrints slips',
+        'status': 'Operational',
+        'users_internal': ['HR', 'Finance'],
+        'users_external': 'None',
+        'owner': 'HR',
+    },
+    {'name_of_system': 'Records', 'description': ['Archive']},
+]
+
+
+def build(create, records, name):
+    output = io.BytesIO()
+    create(records, output, template_path=os.path.join(ASSETS_DIR, name))
+    return Document(output)
+
+
+def cell_lines(cell):
+    return [p.text for p in cell.paragraphs]
+
+
+def test_register_cards_are_filled_from_one_fragment():
+    doc = build(create_iib_docx, SYSTEMS, 'II_b.docx')
+    assert len(doc.tables) == 2
+    first, second = doc.tables
+    assert first.cell(0, 0).text == IIB_CARD[0][0]
+    assert first.cell(0, 2).text == 'Payroll'
+    assert cell_lines(first.cell(1, 2)) == ['Computes pay', 'Prints slips']
+    assert first.cell(5, 2).text == 'HR\nFinance'
+    assert first.cell(6, 2).text == 'None'
+    # Values written into one clone never leak into the next
+    assert second.cell(0, 2).text == 'Records'
+    assert cell_lines(second.cell(1, 2)) == ['Archive']
+    assert second.cell(2, 2).text == second.cell(5, 2).text == ''
+
+
+def test_project_cards():
+    projects = [{'name': 'One', 'deliverables': ['D1', 'D2']}, {'name': 'Two', 'lead_agency': 'DICT'}]
+    doc = build(create_iii_a_docx, projects, 'III_a.docx')
+    assert [p.text for p in doc.paragraphs if p.text.startswith('RANK')] == ['RANK 1', 'RANK 2']
+    assert [t.cell(0, 1).text for t in doc.tables] == ['One', 'Two']
+    assert cell_lines(doc.tables[0].cell(3, 1)) == ['D1', 'D2']
+
+    doc = build(create_iii_b_docx, projects, 'III_b.docx')
+    assert not any(p.text.startswith('RANK') for p in doc.paragraphs)
+    assert [len(t.rows) for t in doc.tables] == [len(III_B_CARD)] * 2
+    assert doc.tables[1].cell(4, 1).text == 'DICT'
+
+
+def test_card_fragment_is_built_once_per_template(monkeypatch):
+    path = os.path.join(ASSETS_DIR, 'II_c.docx')
+    fragments = []
+    derive = template_registry.derive
+
+    def recording_derive(doc, name, build):
+        fragments.append(derive(doc, name, build))
+        return fragments[-1]
+
+    monkeypatch.setattr(template_registry, 'derive', recording_derive)
+    for _ in range(2):
+        create_iib_docx(SYSTEMS, io.BytesIO(), doc=open_template(path))
+    assert len(fragments) == 2 and fragments[0] is fragments[1]
+
+
+def test_logframe_rows():
+    data = {
+        'intermediate': [{'hierarchy': 'Better services', 'ovi': 'Rating\n\n  90%  '}],
+        'immediate': {'hierarchy': 'Faster processing', 'targets': '2 days'},
+        'outputs': [{'hierarchy': 'System A'}, {'hierarchy': 'System B', 'responsibility': 'IT'}],
+    }
+    output = io.BytesIO()
+    create_iiic_logframe_table(data, output)
+    table, = Document(output).tables
+    assert [cell.text for cell in table.rows[0].cells] == list(LOGFRAME_HEADERS)
+    assert len(table.rows) == 5
+    # Each section's label heads the first cell of its first row only, and every cell
+    # of that row leaves a blank line under it
+    assert cell_lines(table.cell(1, 0)) == ['Intermediate Outcome:', '', 'Better services']
+    assert cell_lines(table.cell(1, 1)) == ['', '', 'Rating', '90%']
+    assert cell_lines(table.cell(2, 0)) == ['Immediate Outcome:', '', 'Faster processing']
+    assert cell_lines(table.cell(3, 0)) == ['Outputs:', '', 'System A']
+    assert cell_lines(table.cell(4, 0)) == ['', 'System B']
+    assert table.cell(4, 5).text.endswith('IT')
+
+
+def test_logframe_appends_before_the_section_properties():
+    doc = open_template(os.path.join(ASSETS_DIR, 'III_c.docx'))
+    create_iiic_logframe_table({'outputs': [{'hierarchy': 'Only'}]}, None, doc=doc)
+    body = doc.element.body
+    assert body[-1] is body.sectPr
+    assert body[-2].tag == doc.tables[-1]._tbl.tag
+    assert len(doc.tables[-1].rows) == 2
@@ -0,0 +1,38 @@
+import os
+import shutil
+from lxml import etree
+from server.template_registry import ASSETS_DIR, TemplateRegistry, clone_document
+
+
+def serialized(doc):
+    return {part.partname: etree.tostring(part.element) for part in doc.part.package.iter_parts()
+            if hasattr(part, 'element')}
+
+
+def test_clone_is_independent_of_prototype(tmp_path):
+    registry = TemplateRegistry(root=str(tmp_path))
+    path = shutil.copy(os.path.join(ASSETS_DIR, 'II_a.docx'), tmp_path)
+    prototype = registry.open(path)
+    before = serialized(prototype)
+
+    clone = clone_document(prototype)
+    clone.paragraphs[0].text = 'changed'
+    clone.add_paragraph('added')
+    clone.sections[0].header.add_paragraph('header')
+    clone.save(str(tmp_path / 'clone.docx'))
+
+    assert serialized(prototype) == before
+    assert serialized(clone_document(prototype)) == before
+    assert serialized(registry.open(path)) == before
+
+
+def test_version_follows_file_contents_without_parsing(tmp_path):
+    registry = TemplateRegistry(root=str(tmp_path))
+    path = shutil.copy(os.path.join(ASSETS_DIR, 'II_a.docx'), tmp_path)
+    version = registry.version(path)
+    assert not registry._entries
+    registry.preload(path)
+    assert registry.version(path) == version
+    with open(path, 'ab') as f:
+        f.write(b'\0')
+    assert registry.version(path) != version
@@ -0,0 +1,24 @@
+def element_path(root, element):
+    """
+    Return the chain of child indexes leading from `root` to `element`.
+
+    Indexes built on a template prototype store these paths, so they can be applied
+    to any clone of it with resolve_path.
+    """
+    path = []
+    while element is not root:
+        parent = element.getparent()
+        path.append(parent.index(element))
+        element = parent
+    return tuple(reversed(path))
+
+
+def resolve_path(root, path):
+    """Return the element at `path` below `root`, or None if there is none."""
+    element = root
+    try:
+        for i in path:
+            element = element[i]
+    except IndexError:
+        return None
+    return element